@@ -23,6 +23,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'rest_framework_simplejwt.token_blacklist',
@@ -33,7 +34,6 @@ INSTALLED_APPS = [
 ]
 # Report file paths configuration
 REPORT_PATHS = {
-    'EXCEL_SUBDIR': 'delivery_reports_excel',
     'PDF_SUBDIR': 'delivery_reports_pdf',
     'TEMPLATE_PATH': 'delivery_report_template.xlsx',
 }
@@ -94,6 +94,106 @@ IMAGE_CONFIG = {
     'MAX_WIDTH': 700,
 }
 
+# Normalization applied to report images before they are stored
+IMAGE_INGEST = {
+    'ENABLED': True,
+    'MAX_EDGE': 2560,
+    'FORMAT': 'JPEG',  # JPEG or WEBP; images with transparency are kept as PNG when JPEG is used
+    'QUALITY': 82,
+    'KEEP_ORIGINAL': False,  # also store the untouched upload under <dir>/originals/
+    'THUMBNAIL_SIZES': (160, 480),  # long edge in px, stored under <dir>/thumbs/<size>/
+    'THUMBNAIL_QUALITY': 75,
+    'MAX_PIXELS': 50_000_000,  # larger images are stored as they come instead of being decoded
+    'MEMORY_PER_FILE': 4 * 1024 * 1024,  # re-encoded images beyond this are buffered on disk
+    # Store thumbnails while the upload is decoded anyway, at the cost of two more PUTs per image
+    # in the create request. Off: they are rendered on first request instead.
+    'THUMBNAILS_AT_UPLOAD': os.getenv('IMAGE_THUMBNAILS_AT_UPLOAD', 'false').lower() == 'true',
+}
+
+# Resumable (chunked) upload configuration
+UPLOAD_CONFIG = {
+    'SPOOL_DIR': os.getenv('UPLOAD_SPOOL_DIR', os.path.join(BASE_DIR, 'media', 'upload_spool')),
+    'MAX_FILE_SIZE': 20 * 1024 * 1024,  # same limit as validate_image_file
+    'MAX_CHUNK_SIZE': 5 * 1024 * 1024,
+    'EXPIRY_HOURS': 24,
+    'WRITE_WORKERS': 6,  # parallel storage writes per report
+}
+
+# Write-behind mode for PrivateMediaStorage: uploads land in a local spool and
+# `manage.py replicate_media` pushes them to S3 in the background.
+MEDIA_WRITE_BEHIND = {
+    'ENABLED': os.getenv('MEDIA_WRITE_BEHIND', 'false').lower() == 'true',
+    'SPOOL_DIR': os.getenv('MEDIA_SPOOL_DIR', os.path.join(BASE_DIR, 'media', 'write_behind')),
+    'TARGET_DIR': os.getenv('MEDIA_WRITE_BEHIND_TARGET_DIR'),  # local directory standing in for S3
+    'BATCH_SIZE': 50,
+    'POLL_SECONDS': 5,
+    'RETRY_BACKOFF_SECONDS': 30,
+    'URL_EXPIRY_SECONDS': 3600,
+}
+
+# Largest count returned by report lists with ?pagination=cursor&count=capped
+REPORT_LIST_COUNT_CAP = 1000
+
+# Incremental report sync (/api/delivery-reports/sync/)
+REPORT_SYNC = {
+    'PAGE_SIZE': 100,
+    'MAX_PAGE_SIZE': 500,
+    # Changes younger than this are held back until concurrent transactions have committed
+    'SETTLE_SECONDS': 5,
+}
+
+# Excel/PDF generation. With LAZY, files are generated on first download instead of on create,
+# except for reports of EAGER_LOCATIONS.
+REPORT_GENERATION = {
+    'LAZY': os.getenv('REPORT_GENERATION_LAZY', 'false').lower() == 'true',
+    'EAGER_LOCATIONS': [
+        int(location_id) for location_id in os.getenv('REPORT_GENERATION_EAGER_LOCATIONS', '').split(',')
+        if location_id.strip()
+    ],
+    # Coalescing lock of a lazy generation; use a shared cache so it holds across workers
+    'LOCK_SECONDS': int(os.getenv('REPORT_GENERATION_LOCK_SECONDS', '300')),
+    'RETRY_AFTER_SECONDS': 5,
+}
+
+# Excel/PDF downloads: 'redirect' to a presigned URL or 'proxy' through the API
+REPORT_DOWNLOADS = {
+    'DEFAULT_MODE': 'redirect',
+    'URL_EXPIRY_SECONDS': 300,
+}
+
+# CSV/XLSX export of report data
+REPORT_TABLE_EXPORT = {
+    'CHUNK_SIZE': 1000,  # reports fetched per server-side cursor round trip
+}
+
+# Daily per-location digest PDF
+REPORT_DIGEST = {
+    'DPI': 110,
+    'THUMBNAILS_PER_REPORT': 12,
+    # First font found is used; Pillow's built-in font otherwise
+    'FONT_PATHS': [
+        '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+        '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
+    ],
+    'BOLD_FONT_PATHS': [
+        '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf',
+        '/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf',
+    ],
+}
+
+# PNG preview of a report's first page
+REPORT_PREVIEW = {
+    'DPI': 60,
+}
+
+# Streaming ZIP downloads of report media
+MEDIA_ARCHIVE = {
+    'FETCH_WORKERS': 4,  # parallel storage reads per download
+    'MAX_BUFFERED_FILES': 8,  # fetched ahead of the client at most
+    'MEMORY_PER_FILE': 1024 * 1024,  # larger files are buffered on disk
+    'CHUNK_SIZE': 64 * 1024,
+}
+
 REST_FRAMEWORK = {
     'EXCEPTION_HANDLER': 'reports.utils.exception_handler.custom_exception_handler',
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
@@ -1,11 +1,18 @@
+import logging
+
 from django import forms
 from django.contrib import admin
-from .models import DeliveryReport, DeliveryReportImage, Item, DeliveryReportItem, DeliveryReportDamageImage, Location, Supplier, DeliveryReportGSCProofImage
+from django.db.models import JSONField, OuterRef, Subquery
+from .models import DeliveryReport, DeliveryReportImage, Item, DeliveryReportItem, DeliveryReportDamageImage, Location, Supplier, DeliveryReportGSCProofImage, MediaObject
 from django.utils.html import format_html
 from django.urls import reverse
 from django.core.exceptions import ValidationError
 from .services import ReportFileService, ReportDataService, ReportUpdateService
 from django.forms.models import BaseInlineFormSet
+from .utils import search_utils
+from .utils.image_ingest import thumbnail_name_for
+
+logger = logging.getLogger(__name__)
 
 class GSCProofInlineFormSet(BaseInlineFormSet):
     def clean(self):
@@ -24,7 +31,32 @@ class GSCProofInlineFormSet(BaseInlineFormSet):
         if count < 1 or count > 3:
             raise ValidationError("Моля качете между 1 и 3 снимки за Goods/Seal/Container proof.")
 
-class GSCProofInline(admin.TabularInline):
+class ThumbnailPreviewMixin:
+    """
+    Inline preview from the smallest stored thumbnail. Nothing is rendered or read from storage
+    while the page is built, so images without a thumbnail yet show "-".
+    """
+
+    def get_queryset(self, request):
+        stored = MediaObject.objects.filter(name=OuterRef('image')).values('thumbnails')[:1]
+        return super().get_queryset(request).annotate(
+            stored_thumbnails=Subquery(stored, output_field=JSONField()),
+        )
+
+    def preview(self, obj):
+        stored = getattr(obj, "stored_thumbnails", None) if obj else None
+        if stored and obj.image:
+            name = thumbnail_name_for(obj.image.name, min(stored))
+            try:
+                # Signing is local, so this costs no request to S3
+                url = obj.image.storage.presign(name)
+                return format_html('<img src="{}" style="max-height:100px;"/>', url)
+            except Exception:
+                logger.warning(f"Could not sign the preview {name}", exc_info=True)
+        return "-"
+
+
+class GSCProofInline(ThumbnailPreviewMixin, admin.TabularInline):
     model = DeliveryReportGSCProofImage
     formset = GSCProofInlineFormSet
     extra = 0
@@ -32,14 +64,6 @@ class GSCProofInline(admin.TabularInline):
     readonly_fields = ("preview", "uploaded_at")
     verbose_name_plural = "Goods / Seal / Container proof (1–3 снимки)"
 
-    def preview(self, obj):
-        if obj and getattr(obj, "image", None):
-            try:
-                return format_html('<img src="{}" style="max-height:100px;"/>', obj.image.url)
-            except Exception:
-                pass
-        return "-"
-
 
 class NoExtraButtonsAdmin(admin.ModelAdmin):
     def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
@@ -84,9 +108,11 @@ class ReadOnlyItemInline(admin.TabularInline):
     def has_change_permission(self, request, obj=None):
         return False
 
-class DeliveryReportImageInline(admin.TabularInline):
+class DeliveryReportImageInline(ThumbnailPreviewMixin, admin.TabularInline):
     model = DeliveryReportImage
     extra = 0
+    fields = ("preview", "image")
+    readonly_fields = ("preview",)
 
 
 class DeliveryReportItemInline(admin.TabularInline):
@@ -96,9 +122,11 @@ class DeliveryReportItemInline(admin.TabularInline):
     fields = ['item', 'quantity']
     show_change_link = True
 
-class DeliveryReportDamageImageInline(admin.TabularInline):
+class DeliveryReportDamageImageInline(ThumbnailPreviewMixin, admin.TabularInline):
     model = DeliveryReportDamageImage
     extra = 0
+    fields = ("preview", "image")
+    readonly_fields = ("preview",)
     verbose_name = 'Damage Image'
     verbose_name_plural = 'Damage Images'
 
@@ -131,6 +159,14 @@ class DeliveryReportAdmin(NoExtraButtonsAdmin):
     list_filter = ('created_at', 'checking_company', 'logistic_company')
     readonly_fields = ('excel_report_file', 'pdf_report_file', 'damage_description')
 
+    def get_search_results(self, request, queryset, search_term):
+        # Use the GIN-indexed search vector instead of unindexed icontains scans
+        if search_term and search_utils.is_supported():
+            query = search_utils.build_search_query(search_term)
+            if query is not None:
+                return queryset.filter(search_vector=query), False
+        return super().get_search_results(request, queryset, search_term)
+
     @admin.display(description='DeliveryReport ID')
     def deliveryreport_link(self, obj):
         url = reverse('admin:reports_deliveryreport_change', args=[obj.id])
@@ -151,9 +187,8 @@ class DeliveryReportAdmin(NoExtraButtonsAdmin):
             data_service = ReportDataService()
             update_service = ReportUpdateService()
 
-            # Generate filenames and paths
-            filenames = file_service.generate_filenames()
-            excel_path = file_service.generate_excel_path(filenames['excel'])
+            # Reserve unique storage keys for this version of the report
+            filenames = file_service.generate_filenames(obj.id)
 
             # Prepare report data (you might need to use a serializer or manually collect the data)
             from .serializers import DeliveryReportSerializer
@@ -161,14 +196,10 @@ class DeliveryReportAdmin(NoExtraButtonsAdmin):
             prepared_data = data_service.prepare_report_data(serializer.data)
 
             # Generate files
-            file_service.generate_files(prepared_data, excel_path)
+            file_service.generate_files(prepared_data, filenames['excel'], filenames['pdf'])
 
             # Update file fields in DB
-            update_service.update_report_files(
-                obj.id,
-                filenames['excel'],
-                filenames['pdf']
-            )
+            update_service.update_report_files(obj.id, filenames)
         except Exception as e:
             logger.error(f"Admin file generation failed for DeliveryReport {obj.id}: {e}")
 
@@ -181,17 +212,14 @@ class DeliveryReportAdmin(NoExtraButtonsAdmin):
             data_service = ReportDataService()
             update_service = ReportUpdateService()
 
-            filenames = file_service.generate_filenames()
-            excel_path = file_service.generate_excel_path(filenames['excel'])
+            filenames = file_service.generate_filenames(instance.id)
 
             serializer = DeliveryReportSerializer(instance)
             prepared_data = data_service.prepare_report_data(serializer.data)
 
-            file_service.generate_files(prepared_data, excel_path)
+            file_service.generate_files(prepared_data, filenames['excel'], filenames['pdf'])
 
-            update_service.update_report_files(
-                instance.id, filenames['excel'], filenames['pdf']
-            )
+            update_service.update_report_files(instance.id, filenames)
         except Exception as e:
             logger.error(f"Admin file generation failed for DeliveryReport {instance.id}: {e}")
 
@@ -0,0 +1,51 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from reports.views import DeliveryReportViewSet
+
+
+class Command(BaseCommand):
+    help = "Compare the full and summary representations of the delivery report list."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True, help="User the requests are made as.")
+        parser.add_argument('--page-sizes', default='5,100', help="Comma separated page sizes (default: 5,100).")
+        parser.add_argument('--repeat', type=int, default=5, help="Requests per combination (default: 5).")
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['username'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['username']} does not exist.")
+
+        page_sizes = [int(size) for size in options['page_sizes'].split(',')]
+        view = DeliveryReportViewSet.as_view({'get': 'list'})
+        # Pagination builds absolute next/previous links, so use a host this deployment accepts
+        hosts = [host for host in settings.ALLOWED_HOSTS if host not in ('*',) and not host.startswith('.')]
+        factory = APIRequestFactory(SERVER_NAME=hosts[0] if hosts else 'localhost')
+
+        self.stdout.write(f"{'view':<8} {'page':>5} {'rows':>5} {'queries':>8} {'bytes':>9} {'median ms':>10}")
+        for page_size in page_sizes:
+            for mode in ('full', 'summary'):
+                timings = []
+                for _ in range(options['repeat']):
+                    request = factory.get('/api/delivery-reports/', {'page_size': page_size, 'view': mode})
+                    force_authenticate(request, user=user)
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        response = view(request)
+                        body = JSONRenderer().render(response.data)
+                        timings.append((time.perf_counter() - started) * 1000)
+
+                self.stdout.write(
+                    f"{mode:<8} {page_size:>5} {len(response.data['results']):>5} {len(queries):>8} "
+                    f"{len(body):>9} {statistics.median(timings):>10.1f}"
+                )
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from reports.models import ChunkedUpload
+from reports.utils.chunked_upload_utils import discard_spooled_file
+
+
+class Command(BaseCommand):
+    help = "Delete expired or already consumed chunked uploads and their spooled files."
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=settings.UPLOAD_CONFIG['EXPIRY_HOURS'])
+        stale = ChunkedUpload.objects.filter(
+            Q(created_at__lt=cutoff) | Q(status=ChunkedUpload.STATUS_CONSUMED)
+        )
+
+        removed = 0
+        for upload in stale.iterator():
+            discard_spooled_file(upload)
+            upload.delete()
+            removed += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} chunked upload(s)."))
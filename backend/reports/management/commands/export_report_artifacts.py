@@ -0,0 +1,67 @@
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.models import DeliveryReport, Location
+from reports.serializers import ReportExportSerializer
+from reports.services import ReportExportService, ReportGenerationPending, ReportGenerationService
+from reports.utils.zip_stream import stream_zip
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the PDF (and optionally Excel) reports of one location over a date range to a ZIP "
+        "archive. Reports without generated files are skipped, or generated first with --generate-missing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--location', type=int, required=True, help="Location ID.")
+        parser.add_argument('--from', dest='created_from', required=True, help="First day (YYYY-MM-DD).")
+        parser.add_argument('--to', dest='created_to', required=True, help="Last day (YYYY-MM-DD).")
+        parser.add_argument('--output', required=True, help="Path of the ZIP file to write.")
+        parser.add_argument('--include-excel', action='store_true', help="Add the Excel files.")
+        parser.add_argument('--generate-missing', action='store_true',
+                            help="Generate missing files before exporting instead of skipping those reports.")
+
+    def handle(self, *args, **options):
+        params = ReportExportSerializer(data={
+            'location': options['location'],
+            'created_from': options['created_from'],
+            'created_to': options['created_to'],
+            'include_excel': options['include_excel'],
+        })
+        if not params.is_valid():
+            raise CommandError(params.errors)
+        if not Location.objects.filter(id=options['location']).exists():
+            raise CommandError(f"Location {options['location']} does not exist.")
+
+        queryset = params.filter(DeliveryReport.objects.filter(location_id=options['location']))
+        include_excel = params.validated_data['include_excel']
+        if options['generate_missing']:
+            self._generate_missing(queryset, include_excel)
+
+        written = 0
+        with open(options['output'], 'wb') as f:
+            for chunk in stream_zip(ReportExportService.archive_entries(queryset, include_excel=include_excel)):
+                f.write(chunk)
+                written += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} bytes to {options['output']}."))
+
+    def _generate_missing(self, queryset, include_excel):
+        missing = ReportExportService.missing_artifacts(queryset, include_excel)
+        generated = pending = failed = 0
+        for report_id in missing.order_by('id').values_list('id', flat=True):
+            try:
+                # Coalesces with a download generating the same report
+                ReportGenerationService.ensure_generated(report_id)
+                generated += 1
+            except ReportGenerationPending:
+                logger.info(f"Files of report {report_id} are being generated elsewhere, skipping")
+                pending += 1
+            except Exception as e:
+                logger.error(f"Could not generate files of report {report_id}: {e}")
+                failed += 1
+        self.stdout.write(f"Generated files of {generated} report(s), {pending} in progress elsewhere, {failed} failed.")
@@ -0,0 +1,45 @@
+import os
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from reports.models import Location
+from reports.services import ReportDigestService
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the daily digest PDF (summary table and a thumbnail page per report) of one or "
+        "all locations. The day defaults to yesterday."
+    )
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--location', type=int, help="Location ID.")
+        target.add_argument('--all', action='store_true', help="Every location with deliveries on the day.")
+        parser.add_argument('--date', help="Day of the digest (YYYY-MM-DD).")
+        parser.add_argument('--output-dir', default='.', help="Directory the PDFs are written to.")
+
+    def handle(self, *args, **options):
+        try:
+            day = date.fromisoformat(options['date']) if options['date'] else timezone.localdate() - timedelta(days=1)
+        except ValueError:
+            raise CommandError(f"Invalid date {options['date']}, expected YYYY-MM-DD.")
+
+        if options['all']:
+            start, end = ReportDigestService.day_bounds(day)
+            locations = Location.objects.filter(
+                delivery_reports__created_at__gte=start, delivery_reports__created_at__lt=end
+            ).distinct().order_by('id')
+        else:
+            locations = Location.objects.filter(id=options['location'])
+            if not locations.exists():
+                raise CommandError(f"Location {options['location']} does not exist.")
+
+        os.makedirs(options['output_dir'], exist_ok=True)
+        for location in locations:
+            path = os.path.join(options['output_dir'], ReportDigestService.filename(location, day))
+            with open(path, 'w+b') as f:
+                pages = ReportDigestService.write(location, day, f)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {pages} page(s) to {path}."))
@@ -0,0 +1,146 @@
+import re
+import logging
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from reports.models import (
+    DeliveryReport,
+    DeliveryReportDamageImage,
+    DeliveryReportGSCProofImage,
+    DeliveryReportImage,
+    DeliveryReportSlipImage,
+)
+from reports.utils import media_spool
+from reports.utils.storage_keys import ShardedUploadTo, report_artifact_keys, sharded_media_key
+
+logger = logging.getLogger(__name__)
+
+SHARDED_KEY_RE = re.compile(r'^[0-9a-f]{2}/')
+
+REPORT_IMAGE_FIELDS = [
+    'truck_license_plate_image',
+    'trailer_license_plate_image',
+    'proof_of_delivery_image',
+    'cmr_image',
+]
+CHILD_IMAGE_MODELS = [
+    DeliveryReportGSCProofImage,
+    DeliveryReportSlipImage,
+    DeliveryReportImage,
+    DeliveryReportDamageImage,
+]
+
+
+def copy_object(storage, old_name, new_name):
+    """Server-side copy on S3, read/write for anything else (or objects still in the spool)."""
+    if hasattr(storage, 'bucket') and not media_spool.contains(old_name):
+        storage.bucket.Object(new_name).copy_from(
+            CopySource={'Bucket': storage.bucket_name, 'Key': old_name}
+        )
+    else:
+        with storage.open(old_name, 'rb') as f:
+            storage.save(new_name, f)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move report images and generated artifacts stored under the old flat prefixes "
+        "to the hash-sharded key layout and update the database references."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only print what would be moved.")
+        parser.add_argument('--delete-old', action='store_true', help="Delete the old objects after copying.")
+        parser.add_argument('--limit', type=int, default=None,
+                            help="Stop after processing this many objects (moved, failed or, with --dry-run, listed).")
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.delete_old = options['delete_old']
+        self.limit = options['limit']
+        self.moved = 0
+        self.would_move = 0
+        self.failed = 0
+
+        for report in DeliveryReport.objects.order_by('id').iterator():
+            if self._limit_reached():
+                break
+            for field_name in REPORT_IMAGE_FIELDS:
+                field = DeliveryReport._meta.get_field(field_name)
+                self._move_image(DeliveryReport, report.pk, report.pk, field, getattr(report, field_name).name)
+            self._move_artifacts(report)
+
+        for model in CHILD_IMAGE_MODELS:
+            field = model._meta.get_field('image')
+            rows = model.objects.order_by('id').values_list('id', 'delivery_report_id', 'image')
+            for pk, report_id, name in rows.iterator():
+                if self._limit_reached():
+                    break
+                self._move_image(model, pk, report_id, field, name)
+
+        if self.dry_run:
+            self.stdout.write(self.style.SUCCESS(f"Would move {self.would_move} object(s)."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Moved {self.moved} object(s), {self.failed} failed."))
+
+    def _limit_reached(self):
+        processed = self.moved + self.failed + self.would_move
+        return self.limit is not None and processed >= self.limit
+
+    def _move_image(self, model, pk, report_id, field, old_name):
+        if not old_name or SHARDED_KEY_RE.match(old_name) or self._limit_reached():
+            return
+        category = field.upload_to.category if isinstance(field.upload_to, ShardedUploadTo) else 'media'
+        new_name = sharded_media_key(category, old_name)
+        if self._copy(field.storage, old_name, new_name):
+            model.objects.filter(pk=pk).update(**{field.name: new_name})
+            # Image URLs in synced reports change with the key
+            DeliveryReport.objects.filter(pk=report_id).touch()
+            self._delete_old(field.storage, old_name)
+
+    def _move_artifacts(self, report):
+        excel_name = report.excel_report_file.name
+        pdf_name = report.pdf_report_file.name
+        if not (excel_name or pdf_name) or report.artifact_prefix or self._limit_reached():
+            return
+
+        version = report.artifact_version or 1
+        keys = report_artifact_keys(report.pk, version)
+        storage = report.excel_report_file.storage
+        updates = {'artifact_prefix': keys['prefix'], 'artifact_version': version}
+        moves = [(name, keys[kind], field) for name, kind, field in [
+            (excel_name, 'excel', 'excel_report_file'),
+            (pdf_name, 'pdf', 'pdf_report_file'),
+        ] if name]
+
+        copied = [self._copy(storage, old_name, new_name) for old_name, new_name, _ in moves]
+        if not all(copied):
+            return
+        for old_name, new_name, field in moves:
+            updates[field] = new_name
+        DeliveryReport.objects.filter(pk=report.pk).update(**updates, updated_at=timezone.now())
+        for old_name, _, _ in moves:
+            self._delete_old(storage, old_name)
+
+    def _copy(self, storage, old_name, new_name):
+        self.stdout.write(f"{old_name} -> {new_name}")
+        if self.dry_run:
+            self.would_move += 1
+            return False
+        try:
+            copy_object(storage, old_name, new_name)
+        except Exception as e:
+            logger.error(f"Could not copy {old_name} to {new_name}: {e}")
+            self.failed += 1
+            return False
+        self.moved += 1
+        return True
+
+    def _delete_old(self, storage, old_name):
+        if not self.delete_old:
+            return
+        try:
+            storage.delete(old_name)
+        except Exception as e:
+            logger.warning(f"Could not delete {old_name}: {e}")
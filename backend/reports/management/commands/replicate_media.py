@@ -0,0 +1,45 @@
+import time
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from reports.utils import media_spool
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Replicate media from the write-behind spool to S3 and report the backlog."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Replicate one batch and exit.")
+        parser.add_argument('--stats', action='store_true', help="Only print backlog and lag, then exit.")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self._print_stats()
+            return
+
+        replicator = media_spool.Replicator()
+        while True:
+            replicated, failed = replicator.run_once()
+            if replicated or failed:
+                stats = media_spool.replication_stats()
+                logger.info(
+                    f"Replicated {replicated}, failed {failed}; backlog {stats['backlog_objects']} objects "
+                    f"({stats['backlog_bytes']} bytes), lag {stats['lag_seconds']}s"
+                )
+            if options['once']:
+                self._print_stats()
+                return
+            if not replicated:
+                time.sleep(settings.MEDIA_WRITE_BEHIND['POLL_SECONDS'])
+
+    def _print_stats(self):
+        stats = media_spool.replication_stats()
+        self.stdout.write(
+            f"backlog_objects={stats['backlog_objects']} "
+            f"backlog_bytes={stats['backlog_bytes']} "
+            f"lag_seconds={stats['lag_seconds']}"
+        )
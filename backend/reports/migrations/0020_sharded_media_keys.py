@@ -0,0 +1,65 @@
+# Generated by Django 5.2.1 on 2026-10-19 02:56
+
+import reports.utils.private_storage
+import reports.utils.storage_keys
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0019_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deliveryreport',
+            name='artifact_prefix',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='deliveryreport',
+            name='artifact_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='deliveryreport',
+            name='cmr_image',
+            field=models.ImageField(blank=True, null=True, storage=reports.utils.private_storage.PrivateMediaStorage(), upload_to=reports.utils.storage_keys.ShardedUploadTo('cmr')),
+        ),
+        migrations.AlterField(
+            model_name='deliveryreport',
+            name='proof_of_delivery_image',
+            field=models.ImageField(blank=True, null=True, storage=reports.utils.private_storage.PrivateMediaStorage(), upload_to=reports.utils.storage_keys.ShardedUploadTo('proof_of_delivery')),
+        ),
+        migrations.AlterField(
+            model_name='deliveryreport',
+            name='trailer_license_plate_image',
+            field=models.ImageField(blank=True, null=True, storage=reports.utils.private_storage.PrivateMediaStorage(), upload_to=reports.utils.storage_keys.ShardedUploadTo('license_plates/trailer')),
+        ),
+        migrations.AlterField(
+            model_name='deliveryreport',
+            name='truck_license_plate_image',
+            field=models.ImageField(blank=True, null=True, storage=reports.utils.private_storage.PrivateMediaStorage(), upload_to=reports.utils.storage_keys.ShardedUploadTo('license_plates/truck')),
+        ),
+        migrations.AlterField(
+            model_name='deliveryreportdamageimage',
+            name='image',
+            field=models.ImageField(storage=reports.utils.private_storage.PrivateMediaStorage(), upload_to=reports.utils.storage_keys.ShardedUploadTo('damage_images')),
+        ),
+        migrations.AlterField(
+            model_name='deliveryreportgscproofimage',
+            name='image',
+            field=models.ImageField(storage=reports.utils.private_storage.PrivateMediaStorage(), upload_to=reports.utils.storage_keys.ShardedUploadTo('proof_of_delivery/gsc')),
+        ),
+        migrations.AlterField(
+            model_name='deliveryreportimage',
+            name='image',
+            field=models.ImageField(storage=reports.utils.private_storage.PrivateMediaStorage(), upload_to=reports.utils.storage_keys.ShardedUploadTo('additional_images')),
+        ),
+        migrations.AlterField(
+            model_name='deliveryreportslipimage',
+            name='image',
+            field=models.ImageField(storage=reports.utils.private_storage.PrivateMediaStorage(), upload_to=reports.utils.storage_keys.ShardedUploadTo('delivery_slip')),
+        ),
+    ]
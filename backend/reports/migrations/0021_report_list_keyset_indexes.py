@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0020_sharded_media_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='deliveryreport',
+            index=models.Index(fields=['-created_at', '-id'], name='report_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryreport',
+            index=models.Index(fields=['location', '-id'], name='report_location_id_idx'),
+        ),
+    ]
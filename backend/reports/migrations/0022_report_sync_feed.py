@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0021_report_list_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryReportTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_id', models.BigIntegerField()),
+                ('location_id', models.BigIntegerField(blank=True, null=True)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='deliveryreport',
+            index=models.Index(fields=['updated_at', 'id'], name='report_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryreport',
+            index=models.Index(fields=['location', 'updated_at', 'id'], name='report_loc_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryreporttombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_id_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:09
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_has_damages(apps, schema_editor):
+    DeliveryReport = apps.get_model('reports', 'DeliveryReport')
+    DeliveryReportDamageImage = apps.get_model('reports', 'DeliveryReportDamageImage')
+
+    damage_images = DeliveryReportDamageImage.objects.filter(delivery_report=models.OuterRef('pk'))
+    DeliveryReport.objects.update(has_damages=models.Case(
+        models.When(models.Q(delivery_without_damages_status=False) | models.Exists(damage_images), then=True),
+        default=False,
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0022_report_sync_feed'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deliveryreport',
+            name='has_damages',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(backfill_has_damages, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='deliveryreport',
+            index=models.Index(fields=['supplier_fk', '-created_at'], name='report_supplier_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryreport',
+            index=models.Index(django.db.models.functions.text.Upper('licence_plate_truck'), models.OrderBy(models.F('created_at'), descending=True), name='report_truck_plate_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryreport',
+            index=models.Index(django.db.models.functions.text.Upper('licence_plate_trailer'), models.OrderBy(models.F('created_at'), descending=True), name='report_trailer_plate_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryreport',
+            index=models.Index(django.db.models.functions.text.Upper('container_number'), models.OrderBy(models.F('created_at'), descending=True), name='report_container_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryreport',
+            index=models.Index(django.db.models.functions.text.Upper('delivery_slip_number'), models.OrderBy(models.F('created_at'), descending=True), name='report_slip_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryreport',
+            index=models.Index(django.db.models.functions.text.Upper('checking_company'), models.OrderBy(models.F('created_at'), descending=True), name='report_checking_company_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryreport',
+            index=models.Index(django.db.models.functions.text.Upper('logistic_company'), models.OrderBy(models.F('created_at'), descending=True), name='report_logistic_company_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryreport',
+            index=models.Index(condition=models.Q(('has_damages', True)), fields=['location', '-created_at'], name='report_damaged_idx'),
+        ),
+    ]
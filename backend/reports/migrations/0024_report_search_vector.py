@@ -0,0 +1,65 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:11
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+CREATE_TRIGGER = """
+CREATE OR REPLACE FUNCTION reports_deliveryreport_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', concat_ws(' ',
+            NEW.container_number, NEW.delivery_slip_number,
+            NEW.licence_plate_truck, NEW.licence_plate_trailer)), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.damage_description, '')), 'B') ||
+        setweight(to_tsvector('simple', concat_ws(' ',
+            NEW.comments, NEW.load_secured_comment, NEW.goods_according_comment,
+            NEW.packaging_comment, NEW.delivery_without_damages_comment,
+            NEW.suitable_machines_comment, NEW.delivery_slip_comment,
+            NEW.inspection_report_comment)), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS reports_deliveryreport_search_vector_trigger ON reports_deliveryreport;
+CREATE TRIGGER reports_deliveryreport_search_vector_trigger
+    BEFORE INSERT OR UPDATE ON reports_deliveryreport
+    FOR EACH ROW EXECUTE FUNCTION reports_deliveryreport_search_vector_update();
+
+-- Fill the column for existing rows through the trigger
+UPDATE reports_deliveryreport SET container_number = container_number;
+
+CREATE INDEX IF NOT EXISTS report_search_idx ON reports_deliveryreport USING gin (search_vector);
+"""
+
+DROP_TRIGGER = """
+DROP INDEX IF EXISTS report_search_idx;
+DROP TRIGGER IF EXISTS reports_deliveryreport_search_vector_trigger ON reports_deliveryreport;
+DROP FUNCTION IF EXISTS reports_deliveryreport_search_vector_update();
+"""
+
+
+def create_search_trigger(apps, schema_editor):
+    # Full-text search is PostgreSQL only; other backends just keep an empty column
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_TRIGGER)
+
+
+def drop_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_TRIGGER)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0023_report_list_filters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deliveryreport',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_trigger, drop_search_trigger),
+    ]
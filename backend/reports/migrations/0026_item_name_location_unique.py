@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:32
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_items(apps, schema_editor):
+    """Point report rows of duplicate items at the oldest one, then drop the duplicates"""
+    Item = apps.get_model('reports', 'Item')
+    DeliveryReportItem = apps.get_model('reports', 'DeliveryReportItem')
+
+    duplicates = (
+        Item.objects.filter(location__isnull=False)
+        .values('name', 'location')
+        .annotate(keep=Min('id'), copies=Count('id'))
+        .filter(copies__gt=1)
+    )
+    for group in duplicates:
+        extra = Item.objects.filter(name=group['name'], location=group['location']).exclude(id=group['keep'])
+        DeliveryReportItem.objects.filter(item__in=extra).update(item_id=group['keep'])
+        extra.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0025_media_object'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='item',
+            constraint=models.UniqueConstraint(fields=('name', 'location'), name='item_name_location_uniq'),
+        ),
+    ]
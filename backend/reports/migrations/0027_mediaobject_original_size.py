@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0026_item_name_location_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediaobject',
+            name='original_size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -1,6 +1,12 @@
+import uuid
+
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Upper
+from django.utils import timezone
 from .utils.private_storage import PrivateMediaStorage
+from .utils.storage_keys import ShardedUploadTo
 
 class Item(models.Model):
     name = models.CharField(max_length=255)
@@ -12,6 +18,12 @@ class Item(models.Model):
         blank=True
     )
 
+    class Meta:
+        constraints = [
+            # Lets report creation insert new items with ON CONFLICT DO NOTHING
+            models.UniqueConstraint(fields=['name', 'location'], name='item_name_location_uniq'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -37,6 +49,65 @@ class Supplier(models.Model):
     def __str__(self):
         return self.name
 
+class DeliveryReportQuerySet(models.QuerySet):
+    RELATIONS = ('location', 'supplier', 'items', 'gsc_proof_images', 'slip_images',
+                 'additional_images', 'damage_images')
+
+    def with_related(self, relations=None):
+        """
+        Load everything DeliveryReportSerializer renders in a fixed number of queries.
+        Pass `relations` (names from RELATIONS) to load only what a sparse response needs.
+        """
+        relations = self.RELATIONS if relations is None else relations
+        joins = {'location': 'location', 'supplier': 'supplier_fk'}
+        prefetches = {
+            'items': models.Prefetch(
+                'deliveryreportitem_set',
+                queryset=DeliveryReportItem.objects.select_related('item').order_by('id'),
+            ),
+            'gsc_proof_images': models.Prefetch(
+                'gsc_proof_images',
+                queryset=DeliveryReportGSCProofImage.objects.order_by('id'),
+            ),
+            'slip_images': 'slip_images',
+            'additional_images': 'additional_images',
+            'damage_images': 'damage_images',
+        }
+        queryset = self
+        select = [field for name, field in joins.items() if name in relations]
+        if select:
+            queryset = queryset.select_related(*select)
+        return queryset.prefetch_related(*[lookup for name, lookup in prefetches.items() if name in relations])
+
+    def summary(self):
+        """
+        Plain dicts with just what list screens show. No model instances are built and no
+        image URLs are signed.
+        """
+        return self.prefetch_related(None).values(
+            'id',
+            'delivery_slip_number',
+            'supplier_fk_id',
+            'supplier_fk__name',
+            'location_id',
+            'location__name',
+            'created_at',
+            'has_damages',
+        )
+
+    def refresh_has_damages(self):
+        """Recompute the denormalized `has_damages` flag in one UPDATE."""
+        damage_images = DeliveryReportDamageImage.objects.filter(delivery_report=models.OuterRef('pk'))
+        return self.update(has_damages=models.Case(
+            models.When(models.Q(delivery_without_damages_status=False) | models.Exists(damage_images), then=True),
+            default=False,
+        ), updated_at=timezone.now())
+
+    def touch(self):
+        """Bump `updated_at` after a change made around save(), so sync and validators see it."""
+        return self.update(updated_at=timezone.now())
+
+
 class DeliveryReport(models.Model):
     location = models.ForeignKey(
         Location,
@@ -67,24 +138,24 @@ class DeliveryReport(models.Model):
 
     truck_license_plate_image = models.ImageField(
         storage=PrivateMediaStorage(),
-        upload_to='license_plates/truck/',
+        upload_to=ShardedUploadTo('license_plates/truck'),
         null=True,
         blank=True)
     trailer_license_plate_image = models.ImageField(
         storage=PrivateMediaStorage(),
-        upload_to='license_plates/trailer/',
+        upload_to=ShardedUploadTo('license_plates/trailer'),
         null=True,
         blank=True)
 
     proof_of_delivery_image = models.ImageField(
         storage=PrivateMediaStorage(),
-        upload_to='proof_of_delivery/',
+        upload_to=ShardedUploadTo('proof_of_delivery'),
         null=True,
         blank=True)
 
     cmr_image = models.ImageField(
         storage=PrivateMediaStorage(),
-        upload_to='cmr/',
+        upload_to=ShardedUploadTo('cmr'),
         null=True,
         blank=True)
 
@@ -102,7 +173,9 @@ class DeliveryReport(models.Model):
         blank=True,
         # editable=False
     )
-
+    # Generated artifacts live under `<artifact_prefix>/v<artifact_version>/`
+    artifact_prefix = models.CharField(max_length=255, blank=True, editable=False)
+    artifact_version = models.PositiveIntegerField(default=0, editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -132,6 +205,11 @@ class DeliveryReport(models.Model):
     items = models.ManyToManyField(Item, through='DeliveryReportItem')
 
     damage_description = models.TextField(null=True, blank=True)
+    # Denormalized for filtering: damages reported or damage images attached (see save() and signals)
+    has_damages = models.BooleanField(default=False, editable=False)
+    # Weighted tsvector over numbers, plates and comments, maintained by a database trigger
+    # and GIN-indexed on PostgreSQL (migration 0024)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     User = get_user_model()
     user = models.ForeignKey(
@@ -141,16 +219,63 @@ class DeliveryReport(models.Model):
         blank=True
     )
 
+    objects = DeliveryReportQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the report list and of reports per location
+            models.Index(fields=['-created_at', '-id'], name='report_created_id_idx'),
+            models.Index(fields=['location', '-id'], name='report_location_id_idx'),
+            # Incremental sync ("changes since")
+            models.Index(fields=['updated_at', 'id'], name='report_updated_id_idx'),
+            models.Index(fields=['location', 'updated_at', 'id'], name='report_loc_updated_id_idx'),
+            # List filters: case-insensitive exact matches, newest first
+            models.Index(fields=['supplier_fk', '-created_at'], name='report_supplier_created_idx'),
+            models.Index(Upper('licence_plate_truck'), models.F('created_at').desc(), name='report_truck_plate_idx'),
+            models.Index(Upper('licence_plate_trailer'), models.F('created_at').desc(), name='report_trailer_plate_idx'),
+            models.Index(Upper('container_number'), models.F('created_at').desc(), name='report_container_idx'),
+            models.Index(Upper('delivery_slip_number'), models.F('created_at').desc(), name='report_slip_number_idx'),
+            models.Index(Upper('checking_company'), models.F('created_at').desc(), name='report_checking_company_idx'),
+            models.Index(Upper('logistic_company'), models.F('created_at').desc(), name='report_logistic_company_idx'),
+            models.Index(
+                fields=['location', '-created_at'],
+                condition=models.Q(has_damages=True),
+                name='report_damaged_idx',
+            ),
+        ]
+
     def __str__(self):
         return f"Delivery Report {self.id}"
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        # Saves that don't touch the damage status (e.g. artifact paths) leave the flag alone
+        if update_fields is None or 'delivery_without_damages_status' in update_fields:
+            self.has_damages = self.delivery_without_damages_status is False or (
+                self.pk is not None and self.damage_images.exists()
+            )
+            if update_fields is not None:
+                update_fields = kwargs['update_fields'] = {*update_fields, 'has_damages'}
+        if update_fields is not None:
+            # auto_now only applies to the fields being saved
+            kwargs['update_fields'] = {*update_fields, 'updated_at'}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets a save notice a move to another location, which sync reports as a removal there
+        if 'location_id' in instance.__dict__:
+            instance._stored_location_id = instance.location_id
+        return instance
+
 class DeliveryReportDamageImage(models.Model):
     delivery_report = models.ForeignKey(
         DeliveryReport,
         on_delete=models.CASCADE,
         related_name='damage_images'
     )
-    image = models.ImageField(storage=PrivateMediaStorage(), upload_to='damage_images/')
+    image = models.ImageField(storage=PrivateMediaStorage(), upload_to=ShardedUploadTo('damage_images'))
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
 class DeliveryReportSlipImage(models.Model):
@@ -159,13 +284,13 @@ class DeliveryReportSlipImage(models.Model):
         on_delete=models.CASCADE,
         related_name='slip_images'
     )
-    image = models.ImageField(storage=PrivateMediaStorage(), upload_to='delivery_slip/')
+    image = models.ImageField(storage=PrivateMediaStorage(), upload_to=ShardedUploadTo('delivery_slip'))
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
 
 class DeliveryReportImage(models.Model):
     delivery_report = models.ForeignKey(DeliveryReport, on_delete=models.CASCADE, related_name='additional_images')
-    image = models.ImageField(storage=PrivateMediaStorage(), upload_to='additional_images/')
+    image = models.ImageField(storage=PrivateMediaStorage(), upload_to=ShardedUploadTo('additional_images'))
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
 class DeliveryReportItem(models.Model):
@@ -184,6 +309,70 @@ class DeliveryReportGSCProofImage(models.Model):
     )
     image = models.ImageField(
         storage=PrivateMediaStorage(),
-        upload_to='proof_of_delivery/gsc/',
+        upload_to=ShardedUploadTo('proof_of_delivery/gsc'),
     )
     uploaded_at = models.DateTimeField(auto_now_add=True)
+
+
+class ChunkedUpload(models.Model):
+    """A resumable upload assembled chunk by chunk in the local upload spool."""
+    STATUS_PENDING = 'pending'
+    STATUS_COMPLETE = 'complete'
+    STATUS_CONSUMED = 'consumed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_COMPLETE, 'Complete'),
+        (STATUS_CONSUMED, 'Consumed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.CASCADE,
+        related_name='chunked_uploads'
+    )
+    filename = models.CharField(max_length=255)
+    total_size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Upload {self.id} ({self.filename})"
+
+
+class DeliveryReportTombstone(models.Model):
+    """Marks a deleted report so incremental sync can tell clients to drop it."""
+    report_id = models.BigIntegerField()
+    location_id = models.BigIntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"Deleted report {self.report_id}"
+
+
+class MediaObject(models.Model):
+    """Metadata of a stored media object, so media manifests need no storage requests."""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    etag = models.CharField(max_length=100, blank=True)
+    content_type = models.CharField(max_length=100)
+    # Thumbnail sizes stored next to the object, see image_ingest.thumbnail_name_for()
+    thumbnails = models.JSONField(default=list, blank=True)
+    # Size of the upload before image normalization, null when it was stored as it came
+    original_size = models.PositiveBigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def saved_bytes(self):
+        """Bytes image normalization saved on this object, None when it was not normalized."""
+        return None if self.original_size is None else self.original_size - self.size
@@ -1,6 +1,301 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from functools import partial
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+class KnownPagePaginator(Paginator):
+    """
+    Paginator for a page whose row count and report ids were already read along with the
+    conditional request validators: no COUNT, and the page is a primary key lookup instead of
+    a second OFFSET scan over the filtered rows.
+    """
+
+    def __init__(self, object_list, per_page, count, page_ids=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count = count
+        self.page_ids = page_ids
+
+    def _get_page(self, object_list, number, paginator):
+        if self.page_ids is not None:
+            object_list = self.object_list.filter(pk__in=self.page_ids)
+        return super()._get_page(object_list, number, paginator)
+
 
 class ReportsResultsSetPagination(PageNumberPagination):
     page_size = 5
     page_size_query_param = "page_size"
-    max_page_size = 100
\ No newline at end of file
+    max_page_size = 100
+    # (report ids, count) of the page, when a conditional request already read them
+    known_page = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.known_page is not None:
+            ids, count = self.known_page
+            # 'last' pages were validated against every row, so only their count is reused
+            page_ids = ids if self._page_number(request) is not None else None
+            self.django_paginator_class = partial(KnownPagePaginator, count=count, page_ids=page_ids)
+        return super().paginate_queryset(queryset, request, view)
+
+    def page_rows(self, queryset, request):
+        """
+        (rows, total) for a conditional request, without evaluating anything: the slice of the
+        ordered `queryset` this page shows and the queryset behind its `count`.
+        """
+        number = self._page_number(request)
+        if number is None:
+            # 'last' needs the count first, so such pages are validated against every row
+            return queryset, queryset
+        size = self.get_page_size(request)
+        start = max(number - 1, 0) * size
+        return queryset[start:start + size], queryset
+
+    def _page_number(self, request):
+        try:
+            return int(request.query_params.get(self.page_query_param) or 1)
+        except ValueError:
+            return None
+
+
+class ReportsKeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over `ordering`, e.g. ('-created_at', '-id'). Each page is an index
+    range scan starting after the last row of the previous one, so there is no OFFSET and, unless
+    asked for with `?count=exact|capped`, no COUNT(*).
+    """
+    page_size = ReportsResultsSetPagination.page_size
+    page_size_query_param = "page_size"
+    max_page_size = ReportsResultsSetPagination.max_page_size
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    count_modes = ('none', 'capped', 'exact')
+    invalid_cursor_message = "Invalid cursor."
+    known_page = ReportsResultsSetPagination.known_page
+
+    def __init__(self, ordering):
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.descending = self.ordering[0].startswith('-')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.count, self.count_capped = self.get_count(queryset, request)
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['reverse'])
+        if self.known_page is not None:
+            # The same rows page_rows read, now looked up by primary key
+            queryset = queryset.filter(pk__in=self.known_page[0])
+        rows = list(self._page(queryset, cursor, self.page_size))
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.page = rows
+        return rows
+
+    def page_rows(self, queryset, request):
+        """
+        (rows, total) for a conditional request, without evaluating anything: the rows
+        paginate_queryset reads, including the one telling whether there is a next page, and the
+        queryset behind `count` when one was asked for.
+        """
+        rows = self._page(queryset, self.decode_cursor(request), self.get_page_size(request))
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return rows, queryset
+        if mode == 'capped':
+            return rows, queryset.filter(pk__in=queryset.order_by().values('pk')[:settings.REPORT_LIST_COUNT_CAP + 1])
+        return rows, None
+
+    def _page(self, queryset, cursor, page_size):
+        """The page after (or before) `cursor` plus one extra row, in the pagination order if forward."""
+        reverse = bool(cursor and cursor['reverse'])
+        if cursor:
+            queryset = queryset.filter(self._seek(cursor['values'], forward=not reverse))
+        ordering = self.ordering if not reverse else [self._flip(name) for name in self.ordering]
+        return queryset.order_by(*ordering)[:page_size + 1]
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param, 'none')
+        if mode not in self.count_modes:
+            mode = 'none'
+        known = self.known_page[1] if self.known_page is not None else None
+        if mode == 'exact':
+            return (queryset.count() if known is None else known), False
+        if mode == 'capped':
+            cap = settings.REPORT_LIST_COUNT_CAP
+            # COUNT over a LIMITed subquery stops scanning after cap + 1 rows
+            count = queryset.order_by()[:cap + 1].count() if known is None else known
+            return min(count, cap), count > cap
+        return None, False
+
+    def get_paginated_response(self, data):
+        payload = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'count': self.count,
+        }
+        if self.count_capped:
+            payload['count_capped'] = True
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {
+                    'type': 'integer',
+                    'nullable': True,
+                    'description': "Only with count=exact or count=capped.",
+                },
+                'count_capped': {
+                    'type': 'boolean',
+                    'description': "Present when count=capped stopped at the cap.",
+                },
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self._link(self.page[0], reverse=True)
+
+    def _link(self, row, reverse):
+        values = [_encode_value(_row_value(row, name)) for name in self.fields]
+        payload = json.dumps({'v': values, 'r': int(reverse)}, separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+            values = payload['v']
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError
+            return {'values': values, 'reverse': bool(payload.get('r'))}
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _seek(self, values, forward):
+        """Rows strictly after `values` in the pagination order (before it when not `forward`)."""
+        after = 'lt' if self.descending == forward else 'gt'
+        bound = 'lte' if after == 'lt' else 'gte'
+        # The leading bound lets the database use the (field1, field2, ...) index as a range scan
+        condition = Q(**{f'{self.fields[0]}__{bound}': values[0]})
+        ties = Q()
+        for i, name in enumerate(self.fields):
+            equal = {field: value for field, value in zip(self.fields[:i], values[:i])}
+            ties |= Q(**equal, **{f'{name}__{after}': values[i]})
+        return condition & ties
+
+    @staticmethod
+    def _flip(name):
+        return name[1:] if name.startswith('-') else f'-{name}'
+
+
+class ReportsPagination(BasePagination):
+    """
+    Page numbers by default, for existing clients. `?pagination=cursor` (or any `cursor`)
+    switches to keyset pagination over the view's `cursor_ordering`.
+    """
+    mode_query_param = "pagination"
+
+    known_page = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.paginator_for(request, view)
+        self.paginator.known_page = self.known_page
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def page_rows(self, queryset, request, view=None):
+        return self.paginator_for(request, view).page_rows(queryset, request)
+
+    def reuse_page(self, ids, count):
+        """Build the next page from the report ids and count that page_rows' stats returned."""
+        self.known_page = (ids, count)
+
+    def paginator_for(self, request, view):
+        if self.uses_cursor(request):
+            return ReportsKeysetPagination(getattr(view, 'cursor_ordering', ('-id',)))
+        return ReportsResultsSetPagination()
+
+    def uses_cursor(self, request):
+        return (request.query_params.get(self.mode_query_param) == 'cursor'
+                or ReportsKeysetPagination.cursor_query_param in request.query_params)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return ReportsResultsSetPagination().get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return ReportsResultsSetPagination().get_schema_operation_parameters(view) + [
+            {
+                'name': self.mode_query_param,
+                'required': False,
+                'in': 'query',
+                'description': "'cursor' for keyset pagination: next/previous links, no page numbers.",
+                'schema': {'type': 'string', 'enum': ['page', 'cursor']},
+            },
+            {
+                'name': ReportsKeysetPagination.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': "Opaque cursor from a previous next/previous link.",
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': ReportsKeysetPagination.count_query_param,
+                'required': False,
+                'in': 'query',
+                'description': "Cursor mode only: 'none' (default), 'capped' or 'exact' count.",
+                'schema': {'type': 'string', 'enum': list(ReportsKeysetPagination.count_modes)},
+            },
+        ]
+
+
+def _row_value(row, name):
+    # Rows are model instances, or dicts in the summary view
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
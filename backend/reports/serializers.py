@@ -1,10 +1,24 @@
 import json
-
+import uuid
+from datetime import datetime, time, timedelta
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.http import QueryDict
+from django.urls import reverse
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.fields import empty
+from rest_framework.permissions import SAFE_METHODS
 
 from .models import DeliveryReport, Item, DeliveryReportItem, DeliveryReportImage, Location, DeliveryReportDamageImage, \
-    DeliveryReportSlipImage, Supplier, DeliveryReportGSCProofImage
+    DeliveryReportSlipImage, Supplier, DeliveryReportGSCProofImage, ChunkedUpload
+from .utils.chunked_upload_utils import open_spooled_file, discard_spooled_file, is_expired
 from .utils.file_validators import FileValidationError, validate_image_file
+from .utils.storage_utils import StorageWriteBatch
+from .utils import media_keys, thumbnails
 import logging
 
 logger = logging.getLogger(__name__)
@@ -34,26 +48,103 @@ class DeliveryReportItemSerializer(serializers.ModelSerializer):
 
 # End Delivery Report Item serializer
 
+def is_read_request(request):
+    """GETs, and the POST of a bulk retrieve, whose body only carries report ids."""
+    view = getattr(request, 'parser_context', {}).get('view')
+    return request.method in SAFE_METHODS or getattr(view, 'action', None) == 'bulk_retrieve'
+
+
+def wants_media_keys(context):
+    """True when a read asked for opaque media keys (`?media=keys`) instead of presigned URLs."""
+    request = context.get('request')
+    return (request is not None and is_read_request(request)
+            and request.query_params.get('media') == 'keys')
+
+
+def media_representation(field_file, context):
+    """
+    Key or URL of a report image: a media key with `?media=keys`, a URL from the batch's
+    `presigned_urls` cache when the view provides one, else the storage URL.
+    """
+    if wants_media_keys(context):
+        return media_keys.make_key(field_file)
+    presigned_urls = context.get('presigned_urls')
+    if presigned_urls is not None:
+        return presigned_urls.get(field_file.name)
+    return field_file.url
+
+
+class MediaImageField(serializers.ImageField):
+    """Renders a presigned URL, or an opaque media key with `?media=keys`."""
+
+    def to_representation(self, value):
+        if value and (wants_media_keys(self.context) or 'presigned_urls' in self.context):
+            return media_representation(value, self.context)
+        return super().to_representation(value)
+
+
+class ThumbnailLinkField(serializers.Field):
+    """
+    Link to the thumbnail endpoint for an image. Nothing is signed or rendered here; the
+    endpoint renders the thumbnail on first use and redirects to it.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        url = f"{reverse('media-thumbnail')}?{urlencode({'key': media_keys.make_key(value)})}"
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+
 # Delivery Report Images Serializer
 class DeliveryReportImageSerializer(serializers.ModelSerializer):
+    image = MediaImageField(read_only=True)
+    thumbnail = ThumbnailLinkField(source='image')
+
     class Meta:
         model = DeliveryReportImage
-        fields = ['image', 'uploaded_at']
+        fields = ['image', 'thumbnail', 'uploaded_at']
 # End Delivery Report Images Serializer
 
 # Serializer for damage images
 class DeliveryReportDamageImageSerializer(serializers.ModelSerializer):
+    image = MediaImageField(read_only=True)
+    thumbnail = ThumbnailLinkField(source='image')
+
     class Meta:
         model = DeliveryReportDamageImage
-        fields = ['image', 'uploaded_at']
+        fields = ['image', 'thumbnail', 'uploaded_at']
 
 class DeliveryReportSlipImageSerializer(serializers.ModelSerializer):
+    image = MediaImageField(read_only=True)
+    thumbnail = ThumbnailLinkField(source='image')
+
     class Meta:
         model = DeliveryReportSlipImage
-        fields = ['image', 'uploaded_at']
+        fields = ['image', 'thumbnail', 'uploaded_at']
+
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChunkedUpload
+        fields = ['id', 'filename', 'total_size', 'offset', 'status', 'created_at']
+        read_only_fields = ['id', 'offset', 'status', 'created_at']
 
+    def validate_total_size(self, value):
+        max_size = settings.UPLOAD_CONFIG['MAX_FILE_SIZE']
+        if value <= 0:
+            raise serializers.ValidationError("Size must be a positive number of bytes.")
+        if value > max_size:
+            raise serializers.ValidationError(f"File too large. Maximum size is {max_size // (1024*1024)}MB")
+        return value
 
-class CustomImageField(serializers.ImageField):
+
+class CustomImageField(MediaImageField):
     def to_internal_value(self, data):
         # Skip Django's default image validation and use our custom one
         try:
@@ -84,6 +175,12 @@ class OptionalImageListField(serializers.ListField):
         # now validate the real files list
         return super().to_internal_value(files)
 
+def _split_param(value):
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
 class DeliveryReportSerializer(serializers.ModelSerializer):
     # Override single image fields to use custom validation
     truck_license_plate_image = CustomImageField(required=False, allow_null=True)
@@ -198,6 +295,53 @@ class DeliveryReportSerializer(serializers.ModelSerializer):
         help_text="Name of the linked Supplier"
     )
 
+    upload_ids = serializers.CharField(
+        write_only=True,
+        required=False,
+        help_text='JSON object mapping image fields to completed chunked upload ids, '
+                  'e.g. {"cmr_image": "<id>", "damage_images_input": ["<id>", "<id>"]}.'
+    )
+
+    # Image fields that can be filled from completed chunked uploads
+    SINGLE_UPLOAD_FIELDS = (
+        'truck_license_plate_image',
+        'trailer_license_plate_image',
+        'proof_of_delivery_image',
+        'cmr_image',
+    )
+    LIST_UPLOAD_FIELDS = (
+        'goods_seal_container_proof',
+        'delivery_slip_images_input',
+        'additional_images_input',
+        'damage_images_input',
+    )
+
+    # Fields that cost queries or presigned URLs. Once a read uses `?fields=` or `?expand=`,
+    # they are only rendered when named explicitly.
+    EXPANDABLE_FIELDS = (
+        'items',
+        'goods_seal_container_proof_urls',
+        'delivery_slip_images_urls',
+        'additional_images_urls',
+        'damage_images_urls',
+        'truck_license_plate_image',
+        'trailer_license_plate_image',
+        'proof_of_delivery_image',
+        'cmr_image',
+    )
+    # Relations (see DeliveryReportQuerySet.with_related) each rendered field needs
+    RELATIONS_BY_FIELD = {
+        'location_name': 'location',
+        'location_client_name': 'location',
+        'supplier': 'supplier',
+        'supplier_name': 'supplier',
+        'items': 'items',
+        'goods_seal_container_proof_urls': 'gsc_proof_images',
+        'delivery_slip_images_urls': 'slip_images',
+        'additional_images_urls': 'additional_images',
+        'damage_images_urls': 'damage_images',
+    }
+
     class Meta:
         model = DeliveryReport
         fields = [
@@ -249,38 +393,165 @@ class DeliveryReportSerializer(serializers.ModelSerializer):
             'damage_description',
             'damage_images_input',
             'damage_images_urls',
+            'upload_ids',
             'user',
         ]
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or not is_read_request(request):
+            return
+        selected = self.selected_fields(request.query_params)
+        if selected is not None:
+            # Dropped fields are never evaluated: no method calls, queries or presigns
+            for name in set(self.fields) - selected:
+                self.fields.pop(name)
+
+    @classmethod
+    def selected_fields(cls, query_params):
+        """
+        Names of the fields a read should render according to `?fields=` and `?expand=`,
+        or None when neither is given and the full representation is wanted.
+        """
+        fields = _split_param(query_params.get('fields'))
+        expand = _split_param(query_params.get('expand'))
+        if fields is None and expand is None:
+            return None
+
+        unknown = sorted((fields or set()) - set(cls.Meta.fields))
+        if unknown:
+            raise serializers.ValidationError({'fields': f"Unknown fields: {', '.join(unknown)}."})
+        unknown = sorted((expand or set()) - set(cls.EXPANDABLE_FIELDS))
+        if unknown:
+            raise serializers.ValidationError({'expand': f"Fields that cannot be expanded: {', '.join(unknown)}."})
+
+        if fields is None:
+            fields = set(cls.Meta.fields) - set(cls.EXPANDABLE_FIELDS)
+        return fields | (expand or set()) | {'id'}
+
+    @classmethod
+    def relations_for(cls, selected):
+        """Relations to load for `selected_fields()`; None means all of them."""
+        if selected is None:
+            return None
+        return {cls.RELATIONS_BY_FIELD[name] for name in selected if name in cls.RELATIONS_BY_FIELD}
+
+    def run_validation(self, data=empty):
+        try:
+            data = self._attach_chunked_uploads(data)
+            return super().run_validation(data)
+        except Exception:
+            self._close_chunked_files()
+            raise
+
+    def save(self, **kwargs):
+        try:
+            return super().save(**kwargs)
+        finally:
+            self._close_chunked_files()
+
+    def _attach_chunked_uploads(self, data):
+        """
+        Replace the ids in `upload_ids` with the spooled files of the referenced
+        completed uploads, so the rest of validation sees them as regular files.
+        """
+        if data is empty or not hasattr(data, 'getlist') or not data.get('upload_ids'):
+            return data
+
+        try:
+            refs = json.loads(data.get('upload_ids'))
+        except json.JSONDecodeError:
+            raise serializers.ValidationError({'upload_ids': "Must be valid JSON."})
+        if not isinstance(refs, dict):
+            raise serializers.ValidationError({'upload_ids': "Must be an object keyed by image field."})
+
+        allowed = self.SINGLE_UPLOAD_FIELDS + self.LIST_UPLOAD_FIELDS
+        wanted = {}
+        for field, ids in refs.items():
+            if field not in allowed:
+                raise serializers.ValidationError({'upload_ids': f"'{field}' does not accept uploads."})
+            ids = ids if isinstance(ids, list) else [ids]
+            if field in self.SINGLE_UPLOAD_FIELDS and len(ids) != 1:
+                raise serializers.ValidationError({'upload_ids': f"'{field}' takes exactly one upload."})
+            try:
+                wanted[field] = [str(uuid.UUID(str(upload_id))) for upload_id in ids]
+            except ValueError:
+                raise serializers.ValidationError({'upload_ids': f"'{field}' contains an invalid upload id."})
+
+        all_ids = [upload_id for ids in wanted.values() for upload_id in ids]
+        if len(set(all_ids)) != len(all_ids):
+            # One file object can't be read by several storage writers at once
+            raise serializers.ValidationError({'upload_ids': "Each upload can only be used once."})
+        uploads = ChunkedUpload.objects.filter(
+            id__in=all_ids,
+            user=self.context['request'].user,
+            status=ChunkedUpload.STATUS_COMPLETE,
+        ).in_bulk()
+        uploads = {str(pk): upload for pk, upload in uploads.items()}
+
+        merged = QueryDict(mutable=True)
+        for key, values in data.lists():
+            merged.setlist(key, values)
+
+        self._chunked_uploads = []
+        self._chunked_files = []
+        for field, ids in wanted.items():
+            files = []
+            for upload_id in ids:
+                upload = uploads.get(upload_id)
+                if upload is None or is_expired(upload):
+                    raise serializers.ValidationError({
+                        'upload_ids': f"Upload {upload_id} does not exist, is not complete or has expired."
+                    })
+                spooled = open_spooled_file(upload)
+                self._chunked_files.append(spooled)
+                files.append(spooled)
+                self._chunked_uploads.append(upload)
+            if field in self.LIST_UPLOAD_FIELDS:
+                files = [f for f in merged.getlist(field) if hasattr(f, 'read')] + files
+            merged.setlist(field, files)
+
+        self.initial_data = merged
+        return merged
+
+    def _close_chunked_files(self):
+        for f in getattr(self, '_chunked_files', []):
+            f.close()
+        self._chunked_files = []
+
+    def _release_chunked_uploads(self):
+        uploads = getattr(self, '_chunked_uploads', [])
+        if not uploads:
+            return
+        # Conditional on the status, so of two creates racing for an upload only one consumes it
+        consumed = ChunkedUpload.objects.filter(
+            id__in=[u.id for u in uploads], status=ChunkedUpload.STATUS_COMPLETE,
+        ).update(status=ChunkedUpload.STATUS_CONSUMED)
+        if consumed != len(uploads):
+            raise serializers.ValidationError({'upload_ids': "Upload was already used by another report."})
+
+        def discard():
+            for upload in uploads:
+                discard_spooled_file(upload)
+
+        transaction.on_commit(discard)
+
     def get_items(self, obj):
-        # This returns a list of items with quantity
-        report_items = DeliveryReportItem.objects.filter(delivery_report=obj)
+        # This returns a list of items with quantity (prefetched by DeliveryReport.objects.with_related())
+        report_items = obj.deliveryreportitem_set.all()
         return DeliveryReportItemSerializer(report_items, many=True).data
 
     def get_goods_seal_container_proof_urls(self, obj):
         out = []
-        for im in obj.gsc_proof_images.all().order_by("id")[:3]:
+        # Sorting in Python keeps the prefetched rows usable
+        for im in sorted(obj.gsc_proof_images.all(), key=lambda im: im.id)[:3]:
             try:
-                out.append(im.image.url)
+                out.append(media_representation(im.image, self.context))
             except Exception:
                 out.append(None)
         return out
 
-    def _save_gsc_files(self, instance, files):
-        if files is None:
-            return
-        if not (1 <= len(files) <= 3):
-            raise serializers.ValidationError({
-                "goods_seal_container_proof": "Upload between 1 and 3 images."
-            })
-        instance.gsc_proof_images.all().delete()
-        for f in files:
-            DeliveryReportGSCProofImage.objects.create(
-                delivery_report=instance,
-                image=f
-            )
-
-
     def validate_delivery_slip_images_input(self, files):
         if not files:
             raise serializers.ValidationError("At least one image file is required.")
@@ -383,58 +654,110 @@ class DeliveryReportSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         raw = validated_data.pop('supplier_input').strip()
-        supplier_obj = Supplier.objects.filter(name__iexact=raw).first()
-        if not supplier_obj:
-            supplier_obj = Supplier.objects.create(name=raw)
-
-        location = validated_data.get('location')
-        if location:
-            supplier_obj.locations.add(location)
-
-        validated_data['supplier_fk'] = supplier_obj
+        validated_data.pop('upload_ids', None)
 
         gsc_files = validated_data.pop('goods_seal_container_proof', None)
 
         items_data = validated_data.pop('items_input', [])
         additional_images_files = validated_data.pop('additional_images_input', [])
         damage_images = validated_data.pop('damage_images_input', [])
-        damage_desc = validated_data.get('damage_description', None)
         slips = validated_data.pop('delivery_slip_images_input', [])
 
-        # Create DeliveryReport without extra fields
-        report = super().create(validated_data)
+        if gsc_files is not None and not (1 <= len(gsc_files) <= 3):
+            raise serializers.ValidationError({
+                "goods_seal_container_proof": "Upload between 1 and 3 images."
+            })
 
-        self._save_gsc_files(report, gsc_files)
+        # Upload every file of the report concurrently before any row is inserted
+        storage_batch = StorageWriteBatch()
+        single_images = {
+            field: storage_batch.add(DeliveryReport._meta.get_field(field), validated_data[field])
+            for field in self.SINGLE_UPLOAD_FIELDS
+            if validated_data.get(field)
+        }
+        gsc_staged = self._stage_images(storage_batch, DeliveryReportGSCProofImage, gsc_files or [])
+        slip_staged = self._stage_images(storage_batch, DeliveryReportSlipImage, slips)
+        additional_staged = self._stage_images(storage_batch, DeliveryReportImage, additional_images_files)
+        damage_staged = self._stage_images(storage_batch, DeliveryReportDamageImage, damage_images)
+        storage_batch.write()
 
-        # Create related items
-        for item in items_data:
-            item_obj, _ = Item.objects.get_or_create(name=item['name'], location=location)
-            DeliveryReportItem.objects.create(
-                delivery_report=report,
-                item=item_obj,
-                quantity=item['quantity']
-            )
+        try:
+            with transaction.atomic():
+                report = self._create_rows(
+                    validated_data, raw, items_data, single_images,
+                    gsc_staged if gsc_files is not None else None,
+                    slip_staged, additional_staged, damage_staged,
+                )
+                storage_batch.record_metadata()
+        except Exception:
+            storage_batch.discard()
+            raise
 
-        for img in slips:
-            DeliveryReportSlipImage.objects.create(
-                delivery_report=report,
-                image=img
-            )
+        return report
 
-        # Create DeliveryReportImage instances for additional images
-        for uploaded_file in additional_images_files:
-            DeliveryReportImage.objects.create(
-                delivery_report=report,
-                image=uploaded_file
-            )
+    @staticmethod
+    def _stage_images(storage_batch, model, files):
+        field = model._meta.get_field('image')
+        return [storage_batch.add(field, f) for f in files]
+
+    @staticmethod
+    def _resolve_items(location, names):
+        """
+        {name: Item} of the location for `names`: one query for the existing items and one
+        INSERT ... ON CONFLICT DO NOTHING for new ones, which the (name, location) constraint
+        makes safe against a concurrent report adding the same item.
+        """
+        names = set(names)
+        if not names:
+            return {}
+        items = {item.name: item for item in Item.objects.filter(location=location, name__in=names)}
+        missing = names - set(items)
+        if missing:
+            Item.objects.bulk_create([Item(name=name, location=location) for name in missing], ignore_conflicts=True)
+            # Conflicting rows get no primary key back, so read the new items once more
+            items.update({item.name: item for item in Item.objects.filter(location=location, name__in=missing)})
+        return items
+
+    def _create_rows(self, validated_data, raw_supplier, items_data, single_images,
+                     gsc_staged, slip_staged, additional_staged, damage_staged):
+        supplier_obj = Supplier.objects.filter(name__iexact=raw_supplier).first()
+        if not supplier_obj:
+            supplier_obj = Supplier.objects.create(name=raw_supplier)
+
+        location = validated_data.get('location')
+        if location:
+            supplier_obj.locations.add(location)
 
-        # Process damage section
-        if damage_desc:
-            report.damage_description = damage_desc
-            report.save()
-        for img in damage_images:
-            DeliveryReportDamageImage.objects.create(delivery_report=report, image=img)
+        validated_data['supplier_fk'] = supplier_obj
+
+        # Files are already in storage, the rows only reference their names
+        for field, staged in single_images.items():
+            validated_data[field] = staged.name
+
+        # Create DeliveryReport without extra fields; damage_description is part of validated_data
+        report = super().create(validated_data)
 
+        items = self._resolve_items(location, [item['name'] for item in items_data])
+        DeliveryReportItem.objects.bulk_create([
+            DeliveryReportItem(delivery_report=report, item=items[item['name']], quantity=item['quantity'])
+            for item in items_data
+        ])
+
+        # Files are already in storage, so every image table takes a single INSERT
+        for model, staged_files in (
+            (DeliveryReportGSCProofImage, gsc_staged or []),
+            (DeliveryReportSlipImage, slip_staged),
+            (DeliveryReportImage, additional_staged),
+            (DeliveryReportDamageImage, damage_staged),
+        ):
+            model.objects.bulk_create([model(delivery_report=report, image=staged.name) for staged in staged_files])
+
+        if damage_staged:
+            # bulk_create skips the post_save signal that keeps the flag current
+            DeliveryReport.objects.filter(pk=report.pk).refresh_has_damages()
+        report.has_damages = report.delivery_without_damages_status is False or bool(damage_staged)
+
+        self._release_chunked_uploads()
         return report
 
 class ItemAutocompleteFilterSerializer(serializers.Serializer):
@@ -444,4 +767,164 @@ class ItemAutocompleteFilterSerializer(serializers.Serializer):
         help_text="Search term for item name (min 2 characters)",
         allow_blank=True
     )
-    location = serializers.CharField(required=False, allow_blank=True)
\ No newline at end of file
+    location = serializers.CharField(required=False, allow_blank=True)
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class ReportFilterSerializer(serializers.Serializer):
+    """Query parameters accepted by the report list endpoints. Text filters are case-insensitive exact matches."""
+    created_from = serializers.DateField(required=False, help_text="Reports created on or after this date")
+    created_to = serializers.DateField(required=False, help_text="Reports created on or before this date")
+    supplier = serializers.IntegerField(required=False, min_value=1, help_text="Supplier ID")
+    licence_plate = serializers.CharField(required=False, help_text="Truck or trailer licence plate")
+    container_number = serializers.CharField(required=False)
+    delivery_slip_number = serializers.CharField(required=False)
+    checking_company = serializers.CharField(required=False)
+    logistic_company = serializers.CharField(required=False)
+    has_damages = serializers.BooleanField(required=False, allow_null=True, default=None)
+
+    TEXT_FILTERS = ('container_number', 'delivery_slip_number', 'checking_company', 'logistic_company')
+
+    def validate(self, data):
+        if data.get('created_from') and data.get('created_to') and data['created_from'] > data['created_to']:
+            raise serializers.ValidationError({'created_to': "Must not be before created_from."})
+        return data
+
+    def filter(self, queryset):
+        data = self.validated_data
+        # Datetime bounds rather than created_at__date, which would hide the column from its index
+        if data.get('created_from'):
+            queryset = queryset.filter(created_at__gte=_start_of_day(data['created_from']))
+        if data.get('created_to'):
+            queryset = queryset.filter(created_at__lt=_start_of_day(data['created_to'] + timedelta(days=1)))
+        if data.get('supplier'):
+            queryset = queryset.filter(supplier_fk_id=data['supplier'])
+        if data.get('licence_plate'):
+            plate = data['licence_plate'].strip()
+            queryset = queryset.filter(
+                Q(licence_plate_truck__iexact=plate) | Q(licence_plate_trailer__iexact=plate)
+            )
+        for name in self.TEXT_FILTERS:
+            if data.get(name):
+                queryset = queryset.filter(**{f'{name}__iexact': data[name].strip()})
+        if data.get('has_damages') is not None:
+            queryset = queryset.filter(has_damages=data['has_damages'])
+        return queryset
+
+
+class ReportTableExportSerializer(ReportFilterSerializer):
+    FILE_TYPES = ('csv', 'xlsx')
+
+    file_type = serializers.ChoiceField(choices=FILE_TYPES, default='csv')
+    location = serializers.IntegerField(required=False, min_value=1, help_text="Location ID")
+
+    def filter(self, queryset):
+        queryset = super().filter(queryset)
+        if self.validated_data.get('location'):
+            queryset = queryset.filter(location_id=self.validated_data['location'])
+        return queryset
+
+
+class ReportExportSerializer(ReportFilterSerializer):
+    MAX_DAYS = 366
+
+    location = serializers.IntegerField(min_value=1, help_text="Location ID")
+    created_from = serializers.DateField(help_text="Reports created on or after this date")
+    created_to = serializers.DateField(help_text="Reports created on or before this date")
+    include_excel = serializers.BooleanField(default=False, help_text="Add the Excel files")
+
+    def validate(self, data):
+        data = super().validate(data)
+        if (data['created_to'] - data['created_from']).days >= self.MAX_DAYS:
+            raise serializers.ValidationError({'created_to': f"The range may span at most {self.MAX_DAYS} days."})
+        return data
+
+
+class ArtifactDownloadSerializer(serializers.Serializer):
+    MODES = ('redirect', 'proxy')
+
+    mode = serializers.ChoiceField(choices=MODES, required=False)
+
+    def validate(self, attrs):
+        attrs.setdefault('mode', settings.REPORT_DOWNLOADS['DEFAULT_MODE'])
+        return attrs
+
+
+class ReportMediaArchiveSerializer(serializers.Serializer):
+    include_reports = serializers.BooleanField(default=False, help_text="Add the Excel and PDF reports")
+
+
+class ReportSearchSerializer(serializers.Serializer):
+    q = serializers.CharField(min_length=2, max_length=200, help_text="Search text (min 2 characters)")
+
+
+class DeliveryReportSummarySerializer(serializers.Serializer):
+    """Read-only list row built from `DeliveryReport.objects.summary()` dicts."""
+    id = serializers.IntegerField()
+    delivery_slip_number = serializers.CharField()
+    supplier = serializers.IntegerField(source='supplier_fk_id', allow_null=True)
+    supplier_name = serializers.CharField(source='supplier_fk__name', allow_null=True)
+    location = serializers.IntegerField(source='location_id', allow_null=True)
+    location_name = serializers.CharField(source='location__name', allow_null=True)
+    created_at = serializers.DateTimeField()
+    has_damages = serializers.BooleanField()
+
+
+class MediaPresignSerializer(serializers.Serializer):
+    keys = serializers.ListField(
+        child=serializers.CharField(),
+        min_length=1,
+        max_length=media_keys.MAX_BATCH_SIZE,
+        help_text="Media keys from a `media=keys` response."
+    )
+
+
+class MediaThumbnailSerializer(serializers.Serializer):
+    key = serializers.CharField(help_text="Media key of the image")
+    size = serializers.IntegerField(required=False, help_text="Long edge in px")
+
+    def validate_size(self, value):
+        if value not in thumbnails.sizes():
+            raise serializers.ValidationError(f"Choose one of {', '.join(map(str, thumbnails.sizes()))}.")
+        return value
+
+    def validate(self, attrs):
+        attrs.setdefault('size', thumbnails.default_size())
+        return attrs
+
+
+class LocationDigestSerializer(serializers.Serializer):
+    date = serializers.DateField(required=False, help_text="Day of the digest, yesterday by default")
+
+    def validate(self, attrs):
+        attrs.setdefault('date', timezone.localdate() - timedelta(days=1))
+        return attrs
+
+
+class ReportBulkRetrieveSerializer(serializers.Serializer):
+    MAX_IDS = 50
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=MAX_IDS,
+        help_text=f"Report ids, at most {MAX_IDS}. GET takes them comma separated: ?ids=1,2,3."
+    )
+
+    def to_internal_value(self, data):
+        ids = data.get('ids')
+        if isinstance(ids, str):
+            data = {'ids': [part.strip() for part in ids.split(',') if part.strip()]}
+        return super().to_internal_value(data)
+
+
+class ReportListViewSerializer(serializers.Serializer):
+    view = serializers.ChoiceField(
+        choices=['full', 'summary'],
+        required=False,
+        default='full',
+        help_text="'summary' returns a lightweight row per report without nested images or URLs."
+    )
@@ -1,11 +1,33 @@
+import io
 import os
+import json
+import base64
+import binascii
+import hashlib
 import logging
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from datetime import datetime, time, timedelta
+from functools import partial
 from django.conf import settings
-from .models import DeliveryReport, Location
-from .utils.user_utils import get_username_from_id, get_signature_from_user_id
-from .utils.excel_utils import save_report_to_excel
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import DeliveryReport, DeliveryReportTombstone, Location
+from .utils.user_utils import get_username_from_id, get_signature_from_user_id, accessible_location_ids
+from .utils.conditional_utils import collect_report_stats
+from .utils.excel_utils import COMMENT_FIELD_MAP, STATUS_FIELDS, save_report_to_excel
 from .utils.pdf_utils import convert_excel_to_pdf
+from .utils.report_preview import IMAGES_PER_BAND, ReportPreviewRenderer
+from .utils.storage_keys import report_artifact_keys, report_artifact_prefix
+from .utils import media_metadata, thumbnails
+from .utils.digest_utils import DigestRenderer, write_pdf
+from .utils.image_ingest import thumbnail_name_for
+from .utils.media_keys import PresignedUrlCache
+from .utils.private_storage import PrivateMediaStorage
 
 logger = logging.getLogger(__name__)
 
@@ -13,27 +35,25 @@ logger = logging.getLogger(__name__)
 class ReportFileService:
     """Service for handling report file generation"""
 
-    def __init__(self):
-        self.excel_dir = os.path.join(settings.MEDIA_ROOT, "delivery_reports_excel")
-        os.makedirs(self.excel_dir, exist_ok=True)
+    def generate_filenames(self, report_id):
+        """Reserve a new artifact version for the report and return its storage keys"""
+        # The row lock makes read and increment one step, so concurrent generations get distinct versions
+        with transaction.atomic():
+            version = (
+                DeliveryReport.objects.select_for_update().filter(id=report_id)
+                .values_list('artifact_version', flat=True).first()
+            )
+            if version is None:
+                raise DeliveryReport.DoesNotExist(f"Report with ID {report_id} not found")
+            version += 1
+            DeliveryReport.objects.filter(id=report_id).update(artifact_version=version, updated_at=timezone.now())
+        return report_artifact_keys(report_id, version)
 
-    def generate_filenames(self):
-        """Generate timestamped filenames"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        return {
-            'excel': f"delivery_report_{timestamp}.xlsx",
-            'pdf': f"delivery_report_{timestamp}.pdf"
-        }
-
-    def generate_excel_path(self, filename):
-        """Generate full Excel file path"""
-        return f"{settings.REPORT_PATHS['EXCEL_SUBDIR']}/{filename}"
-
-    def generate_files(self, report_data, excel_path):
+    def generate_files(self, report_data, excel_path, pdf_path):
         """Generate both Excel and PDF files"""
         try:
             save_report_to_excel(report_data, file_path=excel_path)
-            convert_excel_to_pdf(excel_path)
+            convert_excel_to_pdf(excel_path, pdf_path)
             return True
         except Exception as e:
             logger.error(f"File generation failed: {e}")
@@ -71,13 +91,543 @@ class ReportUpdateService:
     """Service for updating report with file paths"""
 
     @staticmethod
-    def update_report_files(report_id, excel_filename, pdf_filename):
+    def update_report_files(report_id, filenames):
         try:
             report_instance = DeliveryReport.objects.get(id=report_id)
-            report_instance.excel_report_file = f"{settings.REPORT_PATHS['EXCEL_SUBDIR']}/{excel_filename}"
-            report_instance.pdf_report_file = f"{settings.REPORT_PATHS['PDF_SUBDIR']}/{pdf_filename}"
-            report_instance.save()
-            return report_instance
+            previous = {str(report_instance.excel_report_file), str(report_instance.pdf_report_file)}
+            report_instance.excel_report_file = filenames['excel']
+            report_instance.pdf_report_file = filenames['pdf']
+            report_instance.artifact_prefix = filenames['prefix']
+            report_instance.save(update_fields=[
+                'excel_report_file', 'pdf_report_file', 'artifact_prefix', 'updated_at',
+            ])
         except DeliveryReport.DoesNotExist:
             logger.error(f"Report with ID {report_id} not found")
             raise
+
+        # Older versions are unique keys now, so they are no longer overwritten in place
+        for old_path in previous - {filenames['excel'], filenames['pdf'], ''}:
+            try:
+                default_storage.delete(old_path)
+            except Exception as e:
+                logger.warning(f"Could not remove previous artifact {old_path}: {e}")
+        return report_instance
+
+
+class ReportGenerationPending(Exception):
+    """Another request is generating the report's artifacts; retry after `retry_after` seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Report generation in progress, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class ReportGenerationService:
+    """Service running the whole Excel and PDF generation workflow of a report"""
+
+    ARTIFACT_FIELDS = ('excel_report_file', 'pdf_report_file')
+
+    @staticmethod
+    def render(report_data):
+        """Write the Excel and PDF files of a new artifact version without pointing the report at them"""
+        report_id = report_data.get('id')
+
+        file_service = ReportFileService()
+        data_service = ReportDataService()
+
+        # Reserve unique storage keys for this version of the report
+        filenames = file_service.generate_filenames(report_id)
+        prepared_data = data_service.prepare_report_data(report_data.copy())
+        file_service.generate_files(prepared_data, filenames['excel'], filenames['pdf'])
+        return filenames
+
+    @classmethod
+    def generate(cls, report_data):
+        filenames = cls.render(report_data)
+        ReportUpdateService.update_report_files(report_data.get('id'), filenames)
+        return filenames
+
+    @classmethod
+    def render_for(cls, report):
+        """Render the artifacts of a stored report"""
+        from .serializers import DeliveryReportSerializer
+
+        return cls.render(DeliveryReportSerializer(report).data)
+
+    @classmethod
+    def generate_for(cls, report):
+        """Generate the artifacts of a stored report"""
+        from .serializers import DeliveryReportSerializer
+
+        return cls.generate(DeliveryReportSerializer(report).data)
+
+    @staticmethod
+    def is_lazy(location_id):
+        """Whether new reports of the location get their artifacts on first download instead of on create"""
+        config = settings.REPORT_GENERATION
+        return config['LAZY'] and location_id not in config['EAGER_LOCATIONS']
+
+    @classmethod
+    def _stored_artifacts(cls, queryset, report_id):
+        current = queryset.filter(pk=report_id).values_list(*cls.ARTIFACT_FIELDS).first()
+        if current is None:
+            raise DeliveryReport.DoesNotExist(f"Report with ID {report_id} not found")
+        return current
+
+    @classmethod
+    def ensure_generated(cls, report_id):
+        """
+        {field: storage key} of the report's artifacts, generating them first if one is missing.
+        Concurrent first requests are coalesced with a cache lock: only the holder renders, the
+        others get ReportGenerationPending and retry. The render runs outside any transaction and
+        the row is locked only to store the new keys, keeping files another worker stored first.
+        """
+        current = cls._stored_artifacts(DeliveryReport.objects, report_id)
+        if all(current):
+            return dict(zip(cls.ARTIFACT_FIELDS, current))
+
+        config = settings.REPORT_GENERATION
+        lock_key = f"report-generation-{report_id}"
+        if not cache.add(lock_key, True, timeout=config['LOCK_SECONDS']):
+            raise ReportGenerationPending(config['RETRY_AFTER_SECONDS'])
+        try:
+            logger.info(f"Generating artifacts of report {report_id} on first download")
+            filenames = cls.render_for(DeliveryReport.objects.with_related().get(pk=report_id))
+
+            with transaction.atomic():
+                current = cls._stored_artifacts(DeliveryReport.objects.select_for_update(), report_id)
+                stored = all(current)
+                if not stored:
+                    ReportUpdateService.update_report_files(report_id, filenames)
+                    current = (filenames['excel'], filenames['pdf'])
+        finally:
+            cache.delete(lock_key)
+
+        if stored:
+            # Another worker stored its files while this one rendered
+            for path in (filenames['excel'], filenames['pdf']):
+                try:
+                    default_storage.delete(path)
+                except Exception as e:
+                    logger.warning(f"Could not remove unused artifact {path}: {e}")
+        return dict(zip(cls.ARTIFACT_FIELDS, current))
+
+
+class ReportExportService:
+    """Service for exporting the artifacts of many reports as one archive"""
+
+    MISSING_FILENAME = 'MISSING.txt'
+
+    @staticmethod
+    def missing_artifacts(queryset, include_excel=False):
+        """Reports of `queryset` without a PDF (or, with `include_excel`, without an Excel file)"""
+        missing = Q(pdf_report_file='') | Q(pdf_report_file__isnull=True)
+        if include_excel:
+            missing |= Q(excel_report_file='') | Q(excel_report_file__isnull=True)
+        return queryset.filter(missing)
+
+    @classmethod
+    def archive_entries(cls, queryset, include_excel=False):
+        """
+        Lazily yield (arcname, open_file) pairs for the artifacts of `queryset`, reading the
+        reports in chunks so memory stays flat. Reports without an artifact are skipped and
+        listed in a final MISSING.txt entry.
+        """
+        storage = PrivateMediaStorage()
+        kinds = [('pdf', 'pdf_report_file')] + ([('excel', 'excel_report_file')] if include_excel else [])
+        rows = queryset.order_by('created_at', 'id').values_list(
+            'id', 'created_at', *[field for _, field in kinds]
+        ).iterator(chunk_size=500)
+
+        missing = []
+        for report_id, created_at, *names in rows:
+            for (folder, _), name in zip(kinds, names):
+                if not name:
+                    missing.append(f"{report_id}\t{folder}")
+                    continue
+                ext = os.path.splitext(name)[1]
+                yield (
+                    f"{folder}/{created_at:%Y-%m-%d}_report_{report_id}{ext}",
+                    partial(storage.open, name, 'rb'),
+                )
+
+        if missing:
+            listing = "report_id\tartifact\n" + "\n".join(missing) + "\n"
+            yield cls.MISSING_FILENAME, partial(io.BytesIO, listing.encode())
+
+    @staticmethod
+    def archive_filename(location_id, created_from, created_to):
+        return f"delivery_reports_location_{location_id}_{created_from:%Y%m%d}-{created_to:%Y%m%d}.zip"
+
+
+class ReportMediaService:
+    """Service for collecting the media of a report into an archive"""
+
+    IMAGE_RELATIONS = ('gsc_proof_images', 'slip_images', 'damage_images', 'additional_images')
+
+    @classmethod
+    def get_report(cls, report_id, user, relations=None):
+        """Report with its image relations (or `relations`) loaded, limited to the user's locations"""
+        queryset = DeliveryReport.objects.with_related(cls.IMAGE_RELATIONS if relations is None else relations)
+        location_ids = accessible_location_ids(user)
+        if location_ids is not None:
+            queryset = queryset.filter(location_id__in=location_ids)
+        return queryset.get(pk=report_id)
+
+    @classmethod
+    def media_files(cls, report, include_reports=False):
+        """(category, filename, field_file) for every stored file of the report"""
+        files = []
+
+        def add(category, basename, field_file, default_ext='.jpg'):
+            if not field_file:
+                return
+            ext = os.path.splitext(field_file.name)[1] or default_ext
+            files.append((category, f"{basename}{ext}", field_file))
+
+        add('license_plates', 'truck_license_plate', report.truck_license_plate_image)
+        add('license_plates', 'trailer_license_plate', report.trailer_license_plate_image)
+        add('delivery_proof', 'proof_of_delivery', report.proof_of_delivery_image)
+        add('cmr', 'cmr', report.cmr_image)
+        for folder, prefix, images in (
+            ('gsc_proof', 'gsc', report.gsc_proof_images.all()),
+            ('delivery_slips', 'slip', report.slip_images.all()),
+            ('damage_images', 'damage', report.damage_images.all()),
+            ('additional', 'additional', report.additional_images.all()),
+        ):
+            for i, img in enumerate(sorted(images, key=lambda img: img.id)):
+                add(folder, f"{prefix}_{i}", img.image)
+
+        if include_reports:
+            add('reports', f"delivery_report_{report.id}", report.excel_report_file, '.xlsx')
+            add('reports', f"delivery_report_{report.id}", report.pdf_report_file, '.pdf')
+        return files
+
+    @classmethod
+    def archive_entries(cls, report, include_reports=False):
+        """(arcname, open_file) pairs for the archive, one folder per category"""
+        return [
+            (f"{category}/{filename}", partial(field_file.storage.open, field_file.name, 'rb'))
+            for category, filename, field_file in cls.media_files(report, include_reports)
+        ]
+
+    @classmethod
+    def manifest(cls, report, include_reports=False):
+        """
+        Metadata and presigned URLs of every file of the report, built from MediaObject rows.
+        All URLs are signed locally with one client, so this makes no storage requests once
+        the metadata is recorded.
+        """
+        files = cls.media_files(report, include_reports)
+        storage = PrivateMediaStorage()
+        metadata = media_metadata.lookup([field_file.name for _, _, field_file in files], storage)
+        presigned = PresignedUrlCache()
+
+        media = []
+        for category, filename, field_file in files:
+            obj = metadata.get(field_file.name)
+            if obj is None:
+                continue  # missing from storage
+            media.append({
+                'category': category,
+                'filename': filename,
+                'content_type': obj.content_type,
+                'size': obj.size,
+                'etag': obj.etag,
+                'url': presigned.get(obj.name),
+                'thumbnails': {
+                    str(size): presigned.get(thumbnail_name_for(obj.name, size)) for size in obj.thumbnails
+                },
+            })
+        return media
+
+    @staticmethod
+    def archive_filename(report):
+        return f"delivery_report_{report.id}_media.zip"
+
+
+class ReportDigestService:
+    """
+    Service rendering the daily digest of a location as one PDF: a summary table of every
+    delivery of the day and a page per report with its image thumbnails.
+    """
+
+    @staticmethod
+    def day_bounds(day):
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        return start, start + timedelta(days=1)
+
+    @classmethod
+    def reports_for(cls, location, day):
+        """The day's reports of the location with everything the digest renders, in one batch"""
+        start, end = cls.day_bounds(day)
+        return DeliveryReport.objects.with_related(
+            ('supplier', 'items') + ReportMediaService.IMAGE_RELATIONS
+        ).filter(location=location, created_at__gte=start, created_at__lt=end).order_by('created_at', 'id')
+
+    @staticmethod
+    def _row(report):
+        items = [(entry.item.name, entry.quantity) for entry in report.deliveryreportitem_set.all()]
+        damaged = bool(report.has_damages)
+        return {
+            'id': report.id,
+            'time': f"{timezone.localtime(report.created_at):%H:%M}",
+            'supplier': report.supplier_fk.name if report.supplier_fk else report.supplier,
+            'slip': report.delivery_slip_number,
+            'container': report.container_number,
+            'plates': " / ".join(p for p in (report.licence_plate_truck, report.licence_plate_trailer) if p),
+            'checking_company': report.checking_company,
+            'logistic_company': report.logistic_company,
+            'items': items,
+            'items_summary': ", ".join(f"{name} × {quantity}" for name, quantity in items),
+            'total': sum(quantity for _, quantity in items),
+            'damaged': damaged,
+            'damage_flag': "Yes" if damaged else "No",
+            'damage_description': report.damage_description,
+        }
+
+    @classmethod
+    def write(cls, location, day, f):
+        """
+        Write the digest PDF of `location` on `day` to `f` and return its page count. Reports
+        come from one batched query and image metadata from one lookup; images are fetched by
+        a shared pool, one report ahead of the page being drawn, and each page is appended to
+        the PDF as soon as it is drawn.
+        """
+        reports = list(cls.reports_for(location, day))
+        rows = [cls._row(report) for report in reports]
+        renderer = DigestRenderer(location.name, day)
+        cell_size = renderer.cell_size()
+        per_report = settings.REPORT_DIGEST['THUMBNAILS_PER_REPORT']
+        timeout = settings.IMAGE_CONFIG['TIMEOUT_SECONDS']
+
+        images = [
+            [(category, field_file.name) for category, _, field_file in ReportMediaService.media_files(report)]
+            for report in reports
+        ]
+        storage = PrivateMediaStorage()
+        metadata = media_metadata.lookup(
+            [name for report_images in images for _, name in report_images[:per_report]], storage
+        )
+
+        def pages(executor):
+            yield from renderer.summary_pages(rows)
+
+            def submit(report_images):
+                return [
+                    (category.replace('_', ' ').capitalize(), executor.submit(
+                        thumbnails.open_scaled, storage,
+                        thumbnails.source_for(metadata.get(name), name, cell_size), cell_size,
+                    ))
+                    for category, name in report_images[:per_report]
+                ]
+
+            pending = submit(images[0]) if rows else None
+            for i, row in enumerate(rows):
+                current = pending
+                # Keep the pool busy with the next report while this page is drawn
+                pending = submit(images[i + 1]) if i + 1 < len(rows) else None
+                thumbs = []
+                for label, future in current:
+                    try:
+                        thumbs.append((label, future.result(timeout=timeout)))
+                    except TimeoutError:
+                        thumbs.append((label, None))
+                yield renderer.report_page(row, thumbs, len(images[i]))
+
+        with ThreadPoolExecutor(max_workers=settings.IMAGE_CONFIG['MAX_WORKERS']) as executor:
+            return write_pdf(pages(executor), f, renderer.dpi)
+
+    @staticmethod
+    def filename(location, day):
+        return f"digest_location_{location.id}_{day:%Y%m%d}.pdf"
+
+
+class ReportPreviewService:
+    """
+    Service rendering a PNG of a report's first page without LibreOffice, cached in storage
+    per report version
+    """
+
+    FIELDS = (
+        'delivery_slip_number', 'logistic_company', 'container_number', 'licence_plate_truck',
+        'licence_plate_trailer', 'weather_conditions', *STATUS_FIELDS, *COMMENT_FIELD_MAP.values(),
+    )
+
+    @staticmethod
+    def version(report_id):
+        """Changes whenever the report or any of its items and images do (see collect_report_stats)"""
+        stats = collect_report_stats(DeliveryReport.objects.filter(pk=report_id))
+        marker = f"{sorted(stats.items())!r}:{settings.REPORT_PREVIEW['DPI']}"
+        return hashlib.sha1(marker.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def preview_name(report_id, version):
+        return f"{report_artifact_prefix(report_id)}/preview/{version}.png"
+
+    @classmethod
+    def prepare_data(cls, report):
+        """The report data save_report_to_excel draws, read from the loaded report instead of serialized"""
+        data = {field: getattr(report, field) for field in cls.FIELDS}
+        data.update({
+            'location': report.location.name if report.location else "",
+            'location_client_name': report.location.client_name if report.location else None,
+            'supplier_name': report.supplier_fk.name if report.supplier_fk else report.supplier,
+            'user': get_username_from_id(report.user_id),
+            'date': f"{timezone.localtime(report.created_at):%Y-%m-%d}",
+            'items': [
+                {'item': {'name': entry.item.name}, 'quantity': entry.quantity}
+                for entry in report.deliveryreportitem_set.all()
+            ],
+        })
+        return data
+
+    @classmethod
+    def render(cls, report):
+        """PNG bytes of the first page. The images are fetched concurrently, as thumbnails where stored."""
+        renderer = ReportPreviewRenderer()
+        storage = PrivateMediaStorage()
+        cell_size = renderer.band_cell_size()
+        gsc_names = [img.image.name for img in report.gsc_proof_images.all() if img.image][:IMAGES_PER_BAND]
+        base_names = [
+            field_file.name for field_file in (
+                report.truck_license_plate_image, report.trailer_license_plate_image, report.proof_of_delivery_image,
+            ) if field_file
+        ]
+        metadata = media_metadata.lookup(gsc_names + base_names, storage)
+        profile = getattr(report.user, 'profile', None) if report.user_id else None
+        signature = profile.signature if profile is not None and profile.signature else None
+
+        with ThreadPoolExecutor(max_workers=settings.IMAGE_CONFIG['MAX_WORKERS']) as executor:
+            def fetch(names):
+                return [
+                    executor.submit(thumbnails.open_scaled, storage,
+                                    thumbnails.source_for(metadata.get(name), name, cell_size), cell_size)
+                    for name in names
+                ]
+
+            gsc, base = fetch(gsc_names), fetch(base_names)
+            signature_image = executor.submit(
+                thumbnails.open_scaled, signature.storage, signature.name, renderer.signature_size()
+            ) if signature else None
+            return renderer.render(
+                cls.prepare_data(report),
+                [future.result() for future in gsc],
+                [future.result() for future in base],
+                signature_image.result() if signature_image else None,
+            )
+
+    @classmethod
+    def get_preview(cls, report, version=None):
+        """PNG bytes of the report's preview, read from storage or rendered and stored on first request"""
+        version = version or cls.version(report.id)
+        name = cls.preview_name(report.id, version)
+        storage = PrivateMediaStorage()
+        if media_metadata.lookup([name], storage):
+            try:
+                with storage.open(name, 'rb') as f:
+                    return f.read()
+            except Exception as e:
+                logger.warning(f"Could not read cached preview {name}: {e}")
+
+        png = cls.render(report)
+        try:
+            storage.save_variant(name, ContentFile(png))
+            media_metadata.record(name, ContentFile(png))
+        except Exception as e:
+            logger.warning(f"Could not cache preview {name}: {e}")
+        return png
+
+
+class SyncCursorError(Exception):
+    pass
+
+
+class ReportSyncService:
+    """
+    Incremental sync: reports created or updated after a cursor, and tombstones of reports
+    deleted after it. Both streams are read in (timestamp, id) order from an index, so the cost
+    follows the amount of change, not the size of the history.
+    """
+
+    def __init__(self, user):
+        self.location_ids = accessible_location_ids(user)
+
+    def changes(self, queryset, cursor=None, limit=None):
+        """
+        Return (reports, deleted_report_ids, next_cursor, has_more). `queryset` is the report
+        queryset to read from (already prepared for serialization).
+        """
+        config = settings.REPORT_SYNC
+        limit = max(1, min(limit or config['PAGE_SIZE'], config['MAX_PAGE_SIZE']))
+        # Rows younger than the settle window may still belong to uncommitted transactions
+        # with an earlier timestamp, so the cursor never moves past them
+        horizon = timezone.now() - timedelta(seconds=config['SETTLE_SECONDS'])
+        position = self.decode_cursor(cursor) if cursor else None
+
+        reports = queryset.filter(updated_at__lte=horizon)
+        tombstones = DeliveryReportTombstone.objects.filter(deleted_at__lte=horizon)
+        visible = DeliveryReport.objects.all()
+        if self.location_ids is not None:
+            reports = reports.filter(location_id__in=self.location_ids)
+            tombstones = tombstones.filter(location_id__in=self.location_ids)
+            visible = visible.filter(location_id__in=self.location_ids)
+        # A report moved to another location leaves a tombstone at the old one. Clients that
+        # can see the new location get it as an update instead
+        tombstones = tombstones.exclude(Exists(visible.filter(pk=OuterRef('report_id'))))
+
+        if position:
+            reports = reports.filter(self._after('updated_at', *position['reports']))
+            tombstones = tombstones.filter(self._after('deleted_at', *position['tombstones']))
+            tombstone_position = position['tombstones']
+        else:
+            # A first sync has nothing to delete
+            tombstones = tombstones.none()
+            tombstone_position = (horizon, 0)
+
+        reports = list(reports.order_by('updated_at', 'id')[:limit + 1])
+        tombstones = list(tombstones.order_by('deleted_at', 'id')[:limit + 1])
+        more_reports, more_tombstones = len(reports) > limit, len(tombstones) > limit
+        reports, tombstones = reports[:limit], tombstones[:limit]
+
+        report_position = position['reports'] if position else (horizon, 0)
+        if reports:
+            report_position = (reports[-1].updated_at, reports[-1].id)
+        if tombstones:
+            tombstone_position = (tombstones[-1].deleted_at, tombstones[-1].id)
+        # Once a stream is drained up to the horizon, later syncs can start from there
+        if not more_reports:
+            report_position = max(report_position, (horizon, 0))
+        if not more_tombstones:
+            tombstone_position = max(tombstone_position, (horizon, 0))
+
+        next_cursor = self.encode_cursor({'reports': report_position, 'tombstones': tombstone_position})
+        has_more = more_reports or more_tombstones
+        return reports, [tombstone.report_id for tombstone in tombstones], next_cursor, has_more
+
+    @staticmethod
+    def _after(field, timestamp, row_id):
+        # The leading bound keeps this an index range scan on (field, id)
+        return Q(**{f'{field}__gte': timestamp}) & (
+            Q(**{f'{field}__gt': timestamp}) | Q(**{field: timestamp, 'id__gt': row_id})
+        )
+
+    @staticmethod
+    def encode_cursor(position):
+        payload = {name: [timestamp.isoformat(), row_id] for name, (timestamp, row_id) in position.items()}
+        return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            position = {}
+            for name in ('reports', 'tombstones'):
+                timestamp, row_id = payload[name]
+                parsed = parse_datetime(timestamp)
+                if parsed is None:
+                    raise ValueError(timestamp)
+                position[name] = (parsed, int(row_id))
+            return position
+        except (binascii.Error, ValueError, TypeError, KeyError) as e:
+            raise SyncCursorError(f"Invalid sync cursor: {e}")
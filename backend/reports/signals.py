@@ -0,0 +1,41 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import (
+    DeliveryReport,
+    DeliveryReportDamageImage,
+    DeliveryReportGSCProofImage,
+    DeliveryReportImage,
+    DeliveryReportSlipImage,
+    DeliveryReportTombstone,
+)
+
+
+@receiver(post_delete, sender=DeliveryReport)
+def record_report_tombstone(sender, instance, **kwargs):
+    DeliveryReportTombstone.objects.create(report_id=instance.pk, location_id=instance.location_id)
+
+
+@receiver(post_save, sender=DeliveryReport)
+def record_moved_report_tombstone(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_stored_location_id', None)
+    if not created and previous is not None and previous != instance.location_id:
+        # Clients that only see the old location have to drop the report
+        DeliveryReportTombstone.objects.create(report_id=instance.pk, location_id=previous)
+    instance._stored_location_id = instance.location_id
+
+
+@receiver(post_save, sender=DeliveryReportDamageImage)
+@receiver(post_delete, sender=DeliveryReportDamageImage)
+def refresh_damage_flag_for_image(sender, instance, **kwargs):
+    DeliveryReport.objects.filter(pk=instance.delivery_report_id).refresh_has_damages()
+
+
+@receiver(post_save, sender=DeliveryReportGSCProofImage)
+@receiver(post_delete, sender=DeliveryReportGSCProofImage)
+@receiver(post_save, sender=DeliveryReportSlipImage)
+@receiver(post_delete, sender=DeliveryReportSlipImage)
+@receiver(post_save, sender=DeliveryReportImage)
+@receiver(post_delete, sender=DeliveryReportImage)
+def touch_report_for_image(sender, instance, **kwargs):
+    DeliveryReport.objects.filter(pk=instance.delivery_report_id).touch()
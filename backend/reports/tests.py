@@ -1,3 +1,1711 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import zipfile
+from datetime import datetime, time, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.files.base import ContentFile, File
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from botocore.response import StreamingBody
+from openpyxl import load_workbook
+from PIL import Image as PILImage, PdfParser
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from .models import (
+    ChunkedUpload,
+    DeliveryReport,
+    DeliveryReportDamageImage,
+    DeliveryReportGSCProofImage,
+    DeliveryReportImage,
+    DeliveryReportItem,
+    DeliveryReportSlipImage,
+    Item,
+    Location,
+    MediaObject,
+    Supplier,
+)
+from .admin import DeliveryReportImageInline
+from .serializers import DeliveryReportSerializer, ReportBulkRetrieveSerializer, ReportFilterSerializer
+from .services import (
+    ReportDigestService,
+    ReportFileService,
+    ReportGenerationService,
+    ReportPreviewService,
+    ReportUpdateService,
+)
+from .utils import media_keys, media_spool
+from .utils.chunked_upload_utils import open_spooled_file
+from .utils.image_ingest import ImageTooLarge, normalize_image, should_normalize, thumbnail_name_for
+from .utils.private_storage import PrivateMediaStorage
+from .utils.excel_utils import get_relative_and_abs_path
+from .utils.storage_keys import report_artifact_keys, report_artifact_prefix, sharded_media_key
+from .utils.storage_utils import StorageWriteBatch
+from .utils.table_export import HEADERS
+
+
+def fake_presigned_url(storage, name):
+    return f"https://bucket.example.com/{name}"
+
+
+def create_report(location, supplier, user, index):
+    report = DeliveryReport.objects.create(
+        location=location,
+        supplier_fk=supplier,
+        user=user,
+        checking_company="Checker",
+        delivery_slip_number=f"SLIP-{index}",
+        logistic_company="Logistics",
+        container_number=f"CONT-{index}",
+        licence_plate_truck=f"CA{index:04d}AB",
+        licence_plate_trailer=f"CA{index:04d}TT",
+        cmr_image=f"cmr/{index}.jpg",
+        proof_of_delivery_image=f"proof_of_delivery/{index}.jpg",
+    )
+    for name in ("Panels", "Inverters"):
+        item, _ = Item.objects.get_or_create(name=name, location=location)
+        DeliveryReportItem.objects.create(delivery_report=report, item=item, quantity=index + 1)
+    DeliveryReportGSCProofImage.objects.create(delivery_report=report, image=f"gsc/{index}-1.jpg")
+    DeliveryReportGSCProofImage.objects.create(delivery_report=report, image=f"gsc/{index}-2.jpg")
+    DeliveryReportSlipImage.objects.create(delivery_report=report, image=f"slip/{index}.jpg")
+    DeliveryReportImage.objects.create(delivery_report=report, image=f"additional/{index}.jpg")
+    DeliveryReportDamageImage.objects.create(delivery_report=report, image=f"damage/{index}.jpg")
+    return report
+
+
+@mock.patch('reports.utils.private_storage.PrivateMediaStorage.url', fake_presigned_url)
+class ReportListQueryCountTests(TestCase):
+    # ETag validators + count + page with supplier/location join + 5 prefetches
+    # (+ location access checks)
+    LIST_QUERY_BUDGET = 8
+    BY_LOCATION_QUERY_BUDGET = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="inspector", password="secret")
+        cls.location = Location.objects.create(name="Site A", logo="locations/logos/a.png")
+        cls.user.profile.locations.add(cls.location)
+        supplier = Supplier.objects.create(name="Supplier A")
+        for index in range(12):
+            create_report(cls.location, supplier, cls.user, index)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_list_query_count_does_not_grow_with_page_size(self):
+        small, response = self._count_queries('/api/delivery-reports/?page_size=2')
+        self.assertEqual(len(response.data['results']), 2)
+        large, response = self._count_queries('/api/delivery-reports/?page_size=12')
+        self.assertEqual(len(response.data['results']), 12)
+
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, self.LIST_QUERY_BUDGET)
+
+    def test_reports_by_location_query_count_does_not_grow_with_page_size(self):
+        url = f'/reports-by-location/{self.location.id}/'
+        small, _ = self._count_queries(f'{url}?page_size=2')
+        large, response = self._count_queries(f'{url}?page_size=12')
+        self.assertEqual(len(response.data['results']), 12)
+
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, self.BY_LOCATION_QUERY_BUDGET)
+
+    def test_list_renders_prefetched_relations(self):
+        response = self.client.get('/api/delivery-reports/?page_size=1')
+        report = response.data['results'][0]
+
+        self.assertEqual([entry['item']['name'] for entry in report['items']], ["Panels", "Inverters"])
+        self.assertEqual(len(report['goods_seal_container_proof_urls']), 2)
+        self.assertEqual(report['supplier_name'], "Supplier A")
+        self.assertEqual(report['location_name'], "Site A")
+        self.assertEqual(len(report['delivery_slip_images_urls']), 1)
+        self.assertEqual(len(report['damage_images_urls']), 1)
+
+    def test_summary_view_skips_nested_relations(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/delivery-reports/?view=summary&page_size=12')
+        self.assertEqual(response.status_code, 200)
+        # ETag validators with the count, page by primary key
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(sum('COUNT(' in query['sql'] for query in queries), 1)
+        self.assertNotIn('OFFSET', queries[1]['sql'])
+
+        report = response.data['results'][0]
+        self.assertEqual(set(report), {
+            'id', 'delivery_slip_number', 'supplier', 'supplier_name',
+            'location', 'location_name', 'created_at', 'has_damages',
+        })
+        self.assertTrue(report['has_damages'])
+        self.assertEqual(report['location_name'], "Site A")
+
+        response = self.client.get(f'/reports-by-location/{self.location.id}/?view=summary')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 12)
+
+        response = self.client.get('/api/delivery-reports/?view=summary&page_size=5&page=last')
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(self.client.get('/api/delivery-reports/?view=summary&page=99').status_code, 404)
+
+    def test_sparse_fields_skip_unrequested_relations_and_urls(self):
+        with mock.patch('reports.utils.private_storage.PrivateMediaStorage.url') as presign:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/api/delivery-reports/?fields=id,delivery_slip_number&page_size=12')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'delivery_slip_number'})
+        self.assertEqual(len(queries), 2)
+        presign.assert_not_called()
+
+    def test_expand_adds_heavy_fields_on_top_of_light_ones(self):
+        report = DeliveryReport.objects.order_by('id').first()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/delivery-reports/{report.id}/?expand=items')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('items', response.data)
+        self.assertIn('supplier_name', response.data)
+        self.assertNotIn('damage_images_urls', response.data)
+        self.assertNotIn('cmr_image', response.data)
+        # ETag validators, report with location/supplier join, items
+        self.assertEqual(len(queries), 3)
+
+        response = self.client.get(
+            f'/reports-by-location/{self.location.id}/?fields=id,damage_images_urls&page_size=3'
+        )
+        self.assertEqual(set(response.data['results'][0]), {'id', 'damage_images_urls'})
+
+    def test_unknown_sparse_fields_are_rejected(self):
+        response = self.client.get('/api/delivery-reports/?fields=id,nope')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/delivery-reports/?expand=supplier_name')
+        self.assertEqual(response.status_code, 400)
+
+    def _walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.data['results'])
+            url, last = response.data['next'], response
+        return ids, last
+
+    def test_cursor_pagination_walks_every_report_once(self):
+        # Ties on created_at are broken by id
+        tied = DeliveryReport.objects.order_by('id').values_list('id', flat=True)[:7]
+        DeliveryReport.objects.filter(id__in=list(tied)).update(created_at=timezone.now())
+        expected = list(DeliveryReport.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        ids, last = self._walk('/api/delivery-reports/?pagination=cursor&page_size=5&fields=id')
+        self.assertEqual(ids, expected)
+
+        previous = self.client.get(last.data['previous'])
+        self.assertEqual([row['id'] for row in previous.data['results']], expected[5:10])
+
+        ids, _ = self._walk(f'/reports-by-location/{self.location.id}/?pagination=cursor&page_size=5&view=summary')
+        self.assertEqual(ids, sorted(expected, reverse=True))
+
+    def test_cursor_pagination_counts_only_on_request(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/delivery-reports/?pagination=cursor&view=summary')
+        self.assertIsNone(response.data['count'])
+        # Neither the page nor its ETag validators count the reports
+        counts = [q['sql'] for q in queries.captured_queries if 'COUNT(' in q['sql']]
+        self.assertEqual(counts, [])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/delivery-reports/?pagination=cursor&view=summary&count=exact')
+        self.assertEqual(response.data['count'], 12)
+        # Counted once, along with the ETag validators
+        self.assertEqual(sum('COUNT(' in q['sql'] for q in queries.captured_queries), 1)
+
+        with self.settings(REPORT_LIST_COUNT_CAP=10):
+            response = self.client.get('/api/delivery-reports/?pagination=cursor&view=summary&count=capped')
+        self.assertEqual(response.data['count'], 10)
+        self.assertTrue(response.data['count_capped'])
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get('/api/delivery-reports/?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+    def test_unchanged_list_is_answered_with_304_before_serializing(self):
+        url = '/api/delivery-reports/?page_size=5'
+        first = self.client.get(url)
+        etag = first['ETag']
+        self.assertTrue(first.has_header('Last-Modified'))
+
+        with mock.patch('reports.views.DeliveryReportSerializer') as serializer:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 1)
+        serializer.assert_not_called()
+
+        # Last-Modified alone cannot tell that a report left the page
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 200)
+
+        # A different representation has its own validator
+        response = self.client.get('/api/delivery-reports/?page_size=5&view=summary', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_child_changes_invalidate_the_etag(self):
+        report = DeliveryReport.objects.order_by('id').first()
+        url = f'/api/delivery-reports/{report.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        DeliveryReportItem.objects.filter(delivery_report=report).update(quantity=99)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        DeliveryReportDamageImage.objects.create(delivery_report=report, image="damage/new.jpg")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # Page validators only cover the rows on the page
+        location_url = f'/reports-by-location/{self.location.id}/?page_size=5'
+        etag = self.client.get(location_url)['ETag']
+        DeliveryReport.objects.filter(pk=report.pk).update(updated_at=timezone.now())
+        self.assertEqual(self.client.get(location_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        newest = DeliveryReport.objects.order_by('-id').first()
+        DeliveryReport.objects.filter(pk=newest.pk).update(updated_at=timezone.now())
+        self.assertEqual(self.client.get(location_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_page_etag_changes_when_a_report_leaves_the_page(self):
+        url = '/api/delivery-reports/?pagination=cursor&page_size=5&fields=id'
+        first = self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        DeliveryReport.objects.filter(pk=first.data['results'][2]['id']).delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 5)
+
+        # With a count in the payload, a change anywhere in the list counts
+        url = '/api/delivery-reports/?pagination=cursor&page_size=5&fields=id&count=exact'
+        etag = self.client.get(url)['ETag']
+        DeliveryReport.objects.order_by('id').first().delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@mock.patch('reports.utils.private_storage.PrivateMediaStorage.presign', fake_presigned_url)
+class MediaKeyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="inspector", password="secret")
+        cls.location = Location.objects.create(name="Site A", logo="locations/logos/a.png")
+        other_location = Location.objects.create(name="Site B", logo="locations/logos/b.png")
+        cls.user.profile.locations.add(cls.location)
+        supplier = Supplier.objects.create(name="Supplier A")
+        cls.report = create_report(cls.location, supplier, cls.user, 1)
+        cls.other_report = create_report(other_location, supplier, cls.user, 2)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_keys_mode_does_not_sign_and_keys_can_be_exchanged(self):
+        with mock.patch('reports.utils.private_storage.PrivateMediaStorage.url') as presign:
+            response = self.client.get(f'/api/delivery-reports/{self.report.id}/?media=keys')
+        presign.assert_not_called()
+        keys = [response.data['cmr_image'], response.data['damage_images_urls'][0]['image'],
+                *response.data['goods_seal_container_proof_urls']]
+        self.assertNotIn('://', keys[0])
+
+        response = self.client.post('/api/media/presign/', {'keys': keys}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['urls'][keys[0]], "https://bucket.example.com/cmr/1.jpg")
+        self.assertEqual(response.data['urls'][keys[2]], "https://bucket.example.com/gsc/1-1.jpg")
+
+    def test_keys_outside_user_locations_or_forged_are_refused(self):
+        other = self.client.get(f'/api/delivery-reports/{self.other_report.id}/?media=keys').data['cmr_image']
+        response = self.client.post('/api/media/presign/', {'keys': [other, 'forged:key']}, format='json')
+        self.assertEqual(response.data['urls'], {other: None, 'forged:key': None})
+
+    def test_bulk_retrieve_scopes_to_user_locations(self):
+        ids = f'{self.other_report.id},{self.report.id},999'
+        with mock.patch('reports.utils.private_storage.PrivateMediaStorage.url') as head_and_sign:
+            response = self.client.get(f'/api/delivery-reports/bulk/?ids={ids}')
+        head_and_sign.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([report['id'] for report in response.data['results']], [self.report.id])
+        self.assertEqual(response.data['missing'], [self.other_report.id, 999])
+        self.assertEqual(response.data['results'][0]['cmr_image'], "https://bucket.example.com/cmr/1.jpg")
+
+    def test_bulk_retrieve_post_uses_fixed_queries_and_limits_batch(self):
+        supplier = Supplier.objects.get()
+        ids = [self.report.id] + [create_report(self.location, supplier, self.user, i).id for i in range(3, 8)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/delivery-reports/bulk/?fields=id,items', {'ids': ids}, format='json')
+        self.assertEqual([report['id'] for report in response.data['results']], ids)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'items'})
+        # profile locations, reports, items
+        self.assertEqual(len(queries), 3)
+
+        too_many = list(range(1, ReportBulkRetrieveSerializer.MAX_IDS + 2))
+        response = self.client.post('/api/delivery-reports/bulk/', {'ids': too_many}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+def fake_storage_open(storage, name, mode='rb'):
+    if name.startswith('damage/'):
+        raise OSError("NoSuchKey")
+    return ContentFile(f"contents of {name}".encode(), name=name)
+
+
+@mock.patch('reports.utils.private_storage.PrivateMediaStorage._open', fake_storage_open)
+class ReportMediaArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="inspector", password="secret")
+        cls.location = Location.objects.create(name="Site A", logo="locations/logos/a.png")
+        other_location = Location.objects.create(name="Site B", logo="locations/logos/b.png")
+        cls.user.profile.locations.add(cls.location)
+        supplier = Supplier.objects.create(name="Supplier A")
+        cls.report = create_report(cls.location, supplier, cls.user, 1)
+        cls.report.pdf_report_file = "reports/1.pdf"
+        cls.report.save()
+        cls.other_report = create_report(other_location, supplier, cls.user, 2)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _archive(self, query=''):
+        response = self.client.get(f'/delivery-reports/{self.report.id}/download-media/zip/{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        return zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_archive_streams_every_readable_image_by_category(self):
+        archive = self._archive()
+        self.assertIsNone(archive.testzip())
+        # The damage image can't be read and is left out
+        self.assertEqual(sorted(archive.namelist()), [
+            'additional/additional_0.jpg',
+            'cmr/cmr.jpg',
+            'delivery_proof/proof_of_delivery.jpg',
+            'delivery_slips/slip_0.jpg',
+            'gsc_proof/gsc_0.jpg',
+            'gsc_proof/gsc_1.jpg',
+        ])
+        self.assertEqual(archive.read('gsc_proof/gsc_1.jpg'), b"contents of gsc/1-2.jpg")
+
+    def test_archive_can_include_reports(self):
+        archive = self._archive('?include_reports=true')
+        self.assertEqual(archive.read(f'reports/delivery_report_{self.report.id}.pdf'), b"contents of reports/1.pdf")
+
+    def test_archive_is_limited_to_user_locations(self):
+        response = self.client.get(f'/delivery-reports/{self.other_report.id}/download-media/zip/')
+        self.assertEqual(response.status_code, 404)
+
+
+@mock.patch('reports.utils.private_storage.PrivateMediaStorage._open', fake_storage_open)
+class ReportExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="inspector", password="secret")
+        cls.location = Location.objects.create(name="Site A", logo="locations/logos/a.png")
+        cls.other_location = Location.objects.create(name="Site B", logo="locations/logos/b.png")
+        cls.user.profile.locations.add(cls.location)
+        supplier = Supplier.objects.create(name="Supplier A")
+        cls.reports = [create_report(cls.location, supplier, cls.user, i) for i in range(3)]
+        for report in cls.reports[:2]:
+            DeliveryReport.objects.filter(pk=report.pk).update(
+                pdf_report_file=f"reports/{report.pk}.pdf", excel_report_file=f"reports/{report.pk}.xlsx",
+            )
+        cls.today = timezone.localdate()
+        cls.earlier = cls.today - timedelta(days=40)
+        DeliveryReport.objects.filter(pk=cls.reports[0].pk).update(
+            created_at=timezone.make_aware(datetime.combine(cls.earlier, time(12, 0)))
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_export_streams_pdfs_and_lists_missing_reports(self):
+        response = self.client.get('/api/delivery-reports/export/', {
+            'location': self.location.id, 'created_from': self.earlier - timedelta(days=5), 'created_to': self.today,
+        })
+        self.assertEqual(response.status_code, 200)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        first, second, third = self.reports
+        self.assertEqual(sorted(archive.namelist()), sorted([
+            'MISSING.txt',
+            f'pdf/{self.earlier:%Y-%m-%d}_report_{first.id}.pdf',
+            f'pdf/{self.today:%Y-%m-%d}_report_{second.id}.pdf',
+        ]))
+        self.assertEqual(archive.read('MISSING.txt').decode(), f"report_id\tartifact\n{third.id}\tpdf\n")
+
+        response = self.client.get('/api/delivery-reports/export/', {
+            'location': self.location.id, 'created_from': self.earlier, 'created_to': self.earlier,
+            'include_excel': 'true',
+        })
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(sorted(archive.namelist()), [
+            f'excel/{self.earlier:%Y-%m-%d}_report_{first.id}.xlsx',
+            f'pdf/{self.earlier:%Y-%m-%d}_report_{first.id}.pdf',
+        ])
+
+    def test_export_checks_location_and_range(self):
+        params = {'location': self.other_location.id, 'created_from': '2024-01-01', 'created_to': '2024-01-31'}
+        self.assertEqual(self.client.get('/api/delivery-reports/export/', params).status_code, 403)
+        params = {'location': self.location.id, 'created_from': '2022-01-01', 'created_to': '2024-01-31'}
+        self.assertEqual(self.client.get('/api/delivery-reports/export/', params).status_code, 400)
+
+    def test_export_command_can_generate_missing_files(self):
+        def render_for(report):
+            return report_artifact_keys(report.pk, 1)
+
+        with tempfile.TemporaryDirectory() as tmp, mock.patch(
+            'reports.services.ReportGenerationService.render_for', side_effect=render_for,
+        ) as generate, mock.patch('reports.services.default_storage.delete'):
+            output = f"{tmp}/export.zip"
+            call_command(
+                'export_report_artifacts', location=self.location.id, created_from=self.earlier.isoformat(),
+                created_to=self.today.isoformat(), output=output, generate_missing=True, stdout=io.StringIO(),
+            )
+            with zipfile.ZipFile(output) as archive:
+                self.assertEqual(len(archive.namelist()), 3)
+                self.assertNotIn('MISSING.txt', archive.namelist())
+        self.assertEqual([call.args[0].pk for call in generate.call_args_list], [self.reports[2].pk])
+
+
+def jpeg_bytes(size=(640, 480), color='navy'):
+    buffer = io.BytesIO()
+    PILImage.new('RGB', size, color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def fake_image_open(storage, name, mode='rb'):
+    if name.startswith('damage/'):
+        raise OSError("NoSuchKey")
+    return ContentFile(jpeg_bytes(), name=name)
+
+
+@mock.patch('reports.utils.private_storage.PrivateMediaStorage.head', lambda storage, name: None)
+@mock.patch('reports.utils.private_storage.PrivateMediaStorage._open', side_effect=fake_image_open, autospec=True)
+class LocationDigestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="inspector", password="secret")
+        cls.location = Location.objects.create(name="Site A", logo="locations/logos/a.png")
+        cls.other_location = Location.objects.create(name="Site B", logo="locations/logos/b.png")
+        cls.user.profile.locations.add(cls.location)
+        cls.supplier = Supplier.objects.create(name="Supplier A")
+        cls.reports = [create_report(cls.location, cls.supplier, cls.user, i) for i in range(2)]
+        create_report(cls.other_location, cls.supplier, cls.user, 9)
+        MediaObject.objects.create(name="gsc/0-1.jpg", size=1, etag='"x"', content_type="image/jpeg", thumbnails=[160, 480])
+        cls.today = timezone.localdate()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_digest_has_a_summary_and_a_page_per_report(self, storage_open):
+        response = self.client.get(f'/locations/{self.location.id}/digest/', {'date': self.today})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn(f'digest_location_{self.location.id}_{self.today:%Y%m%d}.pdf', response['Content-Disposition'])
+        pdf = PdfParser.PdfParser(buf=b''.join(response.streaming_content))
+        self.assertEqual(len(pdf.pages), 1 + len(self.reports))
+
+        opened = {call.args[1] for call in storage_open.call_args_list}
+        # A stored thumbnail big enough for the grid is used instead of the original
+        self.assertIn(thumbnail_name_for("gsc/0-1.jpg", 480), opened)
+        self.assertNotIn("gsc/0-1.jpg", opened)
+        self.assertIn("gsc/1-1.jpg", opened)
+
+    def test_digest_queries_do_not_grow_with_reports(self, storage_open):
+        with CaptureQueriesContext(connection) as few:
+            ReportDigestService.write(self.location, self.today, tempfile.TemporaryFile())
+        for i in range(2, 5):
+            create_report(self.location, self.supplier, self.user, i)
+        with CaptureQueriesContext(connection) as many:
+            with tempfile.TemporaryFile() as f:
+                self.assertEqual(ReportDigestService.write(self.location, self.today, f), 1 + 5)
+        self.assertEqual(len(few), len(many))
+
+    def test_digest_checks_location_and_date(self, storage_open):
+        self.assertEqual(self.client.get(f'/locations/{self.other_location.id}/digest/').status_code, 403)
+        self.assertEqual(self.client.get('/locations/999/digest/').status_code, 404)
+        self.assertEqual(
+            self.client.get(f'/locations/{self.location.id}/digest/', {'date': 'yesterday'}).status_code, 400
+        )
+
+    def test_digest_command_writes_a_pdf_per_location(self, storage_open):
+        with tempfile.TemporaryDirectory() as tmp:
+            call_command('generate_daily_digest', '--all', '--date', str(self.today), '--output-dir', tmp,
+                         stdout=io.StringIO())
+            written = sorted(os.listdir(tmp))
+        self.assertEqual(written, [
+            f'digest_location_{location.id}_{self.today:%Y%m%d}.pdf' for location in (self.location, self.other_location)
+        ])
+
+
+@override_settings(REPORT_TABLE_EXPORT={'CHUNK_SIZE': 2})
+class ReportTableExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="inspector", password="secret")
+        cls.location = Location.objects.create(name="Site A", logo="locations/logos/a.png")
+        cls.user.profile.locations.add(cls.location)
+        supplier = Supplier.objects.create(name="Supplier A")
+        cls.reports = [create_report(cls.location, supplier, cls.user, i) for i in range(5)]
+        DeliveryReport.objects.filter(pk=cls.reports[0].pk).update(
+            comments="=HYPERLINK(\"http://example.com\")", load_secured_status=True,
+        )
+        create_report(Location.objects.create(name="Site B", logo="b.png"), supplier, cls.user, 9)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_csv_export_reads_reports_and_items_in_chunks(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/delivery-reports/export-table/')
+            content = b''.join(response.streaming_content).decode('utf-8-sig')
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0][:3], ["ID", "Created at", "Location"])
+        self.assertEqual([int(row[0]) for row in rows[1:]], [report.id for report in self.reports])
+
+        first = dict(zip(rows[0], rows[1]))
+        self.assertEqual(first["Items"], "Panels x 1; Inverters x 1")
+        self.assertEqual(first["Total quantity"], "2")
+        self.assertEqual(first["Load secured"], "Yes")
+        self.assertEqual(first["Comments"], "'=HYPERLINK(\"http://example.com\")")
+        # profile locations, one cursor over the reports, one items query per chunk of 2
+        self.assertEqual(len(queries), 1 + 1 + 3)
+
+    def test_xlsx_export_filters_like_the_list(self):
+        response = self.client.get('/api/delivery-reports/export-table/', {
+            'file_type': 'xlsx', 'container_number': 'cont-0',
+        })
+        self.assertEqual(response.status_code, 200)
+        workbook = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)
+        rows = list(workbook.active.iter_rows(values_only=True))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][0], self.reports[0].id)
+        # Text that looks like a formula stays text
+        self.assertEqual(rows[1][HEADERS.index("Comments")], "=HYPERLINK(\"http://example.com\")")
+
+
+def fake_head(storage, name):
+    if name.startswith('damage/'):
+        return None
+    return {'size': 1000, 'etag': '"head"', 'content_type': 'image/jpeg'}
+
+
+@mock.patch('reports.utils.private_storage.PrivateMediaStorage.presign', fake_presigned_url)
+class ReportMediaManifestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="inspector", password="secret")
+        cls.location = Location.objects.create(name="Site A", logo="locations/logos/a.png")
+        cls.user.profile.locations.add(cls.location)
+        supplier = Supplier.objects.create(name="Supplier A")
+        cls.report = create_report(cls.location, supplier, cls.user, 1)
+        MediaObject.objects.create(
+            name="cmr/1.jpg", size=2048, etag='"abc"', content_type="image/jpeg", thumbnails=[160, 480],
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_manifest_lists_metadata_and_presigned_urls(self):
+        with mock.patch('reports.utils.private_storage.PrivateMediaStorage.head', fake_head):
+            response = self.client.get(f'/delivery-reports/{self.report.id}/media-manifest/')
+        self.assertEqual(response.status_code, 200)
+        media = {entry['filename']: entry for entry in response.data['media']}
+        self.assertEqual(media['cmr.jpg'], {
+            'category': 'cmr',
+            'filename': 'cmr.jpg',
+            'content_type': 'image/jpeg',
+            'size': 2048,
+            'etag': '"abc"',
+            'url': "https://bucket.example.com/cmr/1.jpg",
+            'thumbnails': {
+                '160': "https://bucket.example.com/cmr/thumbs/160/1.jpg",
+                '480': "https://bucket.example.com/cmr/thumbs/480/1.jpg",
+            },
+        })
+        # Missing metadata is read from storage once; objects that don't exist are left out
+        self.assertEqual(media['gsc_1.jpg']['etag'], '"head"')
+        self.assertNotIn('damage_0.jpg', media)
+        self.assertEqual(len(media), 6)
+
+        with mock.patch('reports.utils.private_storage.PrivateMediaStorage.head') as head:
+            self.client.get(f'/delivery-reports/{self.report.id}/media-manifest/')
+        head.assert_called_once_with("damage/1.jpg")
+
+
+class ImageNormalizationTests(TestCase):
+    def _jpeg(self, img, **options):
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', **options)
+        return ContentFile(buffer.getvalue(), name="photo.jpg")
+
+    def test_exif_orientation_is_applied(self):
+        exif = PILImage.Exif()
+        exif[0x0112] = 6  # rotated 90 degrees clockwise
+        upload = self._jpeg(PILImage.new('RGB', (400, 200), 'navy'), exif=exif)
+
+        name, content, stats, _ = normalize_image("ab/cmr/photo.jpg", upload)
+        self.assertIsNot(content, upload)
+        with PILImage.open(content) as img:
+            self.assertEqual(img.size, (200, 400))
+            self.assertEqual(img.getexif().get(0x0112, 1), 1)
+
+    @override_settings(IMAGE_INGEST=dict(settings.IMAGE_INGEST, MAX_EDGE=500))
+    def test_long_edge_is_capped(self):
+        name, content, stats, thumbnails = normalize_image(
+            "ab/cmr/photo.png", ContentFile(jpeg_bytes((1200, 800)), name="photo.png"),
+        )
+        self.assertEqual(name, "ab/cmr/photo.jpg")
+        with PILImage.open(content) as img:
+            self.assertEqual((img.format, img.size), ('JPEG', (500, 333)))
+        self.assertEqual(stats['stored_bytes'], content.size)
+        self.assertEqual(thumbnails, {})
+
+    def test_smaller_upright_upload_is_kept_as_it_is(self):
+        upload = self._jpeg(PILImage.effect_noise((200, 200), 64).convert('RGB'), quality=10)
+
+        name, content, stats, _ = normalize_image("ab/cmr/photo.jpg", upload)
+        self.assertEqual(name, "ab/cmr/photo.jpg")
+        self.assertIs(content, upload)
+        self.assertEqual(stats['saved_bytes'], 0)
+
+    @override_settings(IMAGE_INGEST=dict(settings.IMAGE_INGEST, MAX_PIXELS=100 * 100))
+    def test_oversized_image_is_rejected_before_decoding(self):
+        reads = []
+
+        class RecordingFile(io.BytesIO):
+            def read(self, size=-1):
+                reads.append(size)
+                return super().read(size)
+
+        data = jpeg_bytes((200, 100))
+        with mock.patch('PIL.ImageFile.ImageFile.load') as decode, self.assertRaises(ImageTooLarge):
+            normalize_image("ab/cmr/photo.jpg", File(RecordingFile(data), name="photo.jpg"))
+        decode.assert_not_called()
+        # Only the header was read, never the whole upload at once
+        self.assertTrue(reads)
+        self.assertTrue(all(0 <= size < len(data) for size in reads))
+
+    @override_settings(IMAGE_INGEST=dict(settings.IMAGE_INGEST, MAX_EDGE=500, MEMORY_PER_FILE=1024))
+    def test_large_output_is_spooled_to_disk(self):
+        image = PILImage.effect_noise((800, 600), 64).convert('RGB')
+        name, content, stats, _ = normalize_image("ab/cmr/photo.jpg", self._jpeg(image, quality=95))
+        self.assertGreater(stats['stored_bytes'], 1024)
+        self.assertTrue(content.file._rolled)
+        with PILImage.open(content) as img:
+            self.assertEqual(img.size, (500, 375))
+        content.close()
+
+    def test_only_report_images_are_normalized(self):
+        self.assertTrue(should_normalize(sharded_media_key('cmr', "photo.jpg")))
+        self.assertFalse(should_normalize("locations/logos/logo.png"))
+
+        logo = io.BytesIO()
+        PILImage.new('RGB', (3000, 1000), 'white').save(logo, format='PNG')
+        with tempfile.TemporaryDirectory() as spool_dir, override_settings(
+            MEDIA_WRITE_BEHIND=dict(settings.MEDIA_WRITE_BEHIND, ENABLED=True, SPOOL_DIR=spool_dir),
+        ):
+            location = Location.objects.create(name="Site A", logo=ContentFile(logo.getvalue(), name="logo.png"))
+            self.assertTrue(location.logo.name.startswith("locations/logos/logo"))
+            with media_spool.open_file(location.logo.name) as f:
+                self.assertEqual(f.read(), logo.getvalue())
+
+
+class ImageIngestThumbnailTests(TestCase):
+    def setUp(self):
+        spool_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(spool_dir.cleanup)
+        spooling = override_settings(
+            MEDIA_WRITE_BEHIND=dict(settings.MEDIA_WRITE_BEHIND, ENABLED=True, SPOOL_DIR=spool_dir.name),
+        )
+        spooling.enable()
+        self.addCleanup(spooling.disable)
+        image = io.BytesIO()
+        PILImage.new('RGB', (1200, 800), (200, 30, 30)).save(image, format='JPEG')
+        self.upload = ContentFile(image.getvalue(), name="photo.jpg")
+
+    @override_settings(IMAGE_INGEST=dict(settings.IMAGE_INGEST, THUMBNAILS_AT_UPLOAD=True))
+    def test_upload_stores_thumbnails_and_metadata(self):
+        name = PrivateMediaStorage().save(sharded_media_key('cmr', "photo.jpg"), self.upload)
+        with PILImage.open(media_spool.open_file(thumbnail_name_for(name, 160))) as thumbnail:
+            self.assertEqual(thumbnail.size, (160, 107))
+        self.assertTrue(media_spool.contains(thumbnail_name_for(name, 480)))
+
+        obj = MediaObject.objects.get(name=name)
+        self.assertEqual(obj.thumbnails, [160, 480])
+        self.assertEqual(obj.content_type, 'image/jpeg')
+        self.assertGreater(obj.size, 0)
+        self.assertEqual(obj.original_size, self.upload.size)
+        self.assertEqual(obj.saved_bytes, self.upload.size - obj.size)
+
+    def test_thumbnails_are_left_to_first_request_by_default(self):
+        name = PrivateMediaStorage().save(sharded_media_key('cmr', "photo.jpg"), self.upload)
+        self.assertFalse(media_spool.contains(thumbnail_name_for(name, 160)))
+        self.assertEqual(MediaObject.objects.get(name=name).thumbnails, [])
+
+    def test_write_batch_leaves_metadata_to_the_calling_thread(self):
+        batch = StorageWriteBatch()
+        staged = batch.add(DeliveryReportImage._meta.get_field('image'), self.upload)
+        with mock.patch('reports.utils.media_metadata.record_many') as record_many:
+            batch.write()
+        record_many.assert_not_called()
+        self.assertFalse(MediaObject.objects.exists())
+
+        batch.record_metadata()
+        self.assertEqual(MediaObject.objects.get().name, staged.name)
+        self.assertEqual(staged.metadata['content_type'], 'image/jpeg')
+
+
+class FakeS3Client:
+    def __init__(self, objects):
+        self.objects = objects
+        self.gets = []
+
+    def head_object(self, Bucket, Key):
+        return {'ContentLength': len(self.objects[Key]), 'ETag': '"v1"', 'ContentType': 'application/pdf'}
+
+    def get_object(self, Bucket, Key, Range=None):
+        self.gets.append(Range)
+        data = self.objects[Key]
+        if Range:
+            start, end = (int(value) for value in Range[len('bytes='):].split('-'))
+            data = data[start:end + 1]
+        return {'Body': StreamingBody(io.BytesIO(data), len(data))}
+
+
+class ReportArtifactDownloadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="inspector", password="secret")
+        location = Location.objects.create(name="Site A", logo="locations/logos/a.png")
+        cls.report = create_report(location, Supplier.objects.create(name="Supplier A"), cls.user, 1)
+        cls.report.pdf_report_file = "reports/1/delivery_report_1_v1.pdf"
+        cls.report.save()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_redirects_to_presigned_attachment_url(self):
+        # Signing is local, no request reaches S3
+        response = self.client.get(f'/download-report/{self.report.id}/pdf/')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("reports/1/delivery_report_1_v1.pdf", response['Location'])
+        self.assertIn("response-content-disposition=attachment", response['Location'])
+        self.assertIn("Expires=300", response['Location'].replace("X-Amz-Expires", "Expires"))
+        self.assertEqual(self.client.get(f'/download-report/{self.report.id}/excel/').status_code, 404)
+
+    def test_proxy_supports_ranges_and_conditional_requests(self):
+        s3 = FakeS3Client({"reports/1/delivery_report_1_v1.pdf": b"%PDF-0123456789"})
+        patcher = mock.patch('reports.utils.private_storage.PrivateMediaStorage._client', lambda storage: s3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        url = f'/download-report/{self.report.id}/pdf/?mode=proxy'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b"%PDF-0123456789")
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['ETag'], '"v1"')
+
+        response = self.client.get(url, HTTP_RANGE='bytes=5-8')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 5-8/15')
+        self.assertEqual(b''.join(response.streaming_content), b"0123")
+
+        response = self.client.get(url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b"789")
+        response = self.client.get(url, HTTP_RANGE='bytes=5-8', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_RANGE='bytes=99-').status_code, 416)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='"v1"')
+        self.assertEqual(response.status_code, 304)
+        # Size and ETag are read from storage once, then from MediaObject; 304/416 fetch nothing
+        self.assertEqual(MediaObject.objects.get(name="reports/1/delivery_report_1_v1.pdf").size, 15)
+        self.assertEqual(s3.gets, [None, 'bytes=5-8', 'bytes=12-14', None])
+
+
+class ReportArtifactKeyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user(username="inspector", password="secret")
+        location = Location.objects.create(name="Site A", logo="locations/logos/a.png")
+        cls.report = create_report(location, Supplier.objects.create(name="Supplier A"), user, 1)
+
+    def test_each_generation_reserves_its_own_version(self):
+        service = ReportFileService()
+        first = service.generate_filenames(self.report.id)
+        second = service.generate_filenames(self.report.id)
+
+        self.assertEqual(first['excel'], report_artifact_keys(self.report.id, 1)['excel'])
+        self.assertEqual(second['pdf'], report_artifact_keys(self.report.id, 2)['pdf'])
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.artifact_version, 2)
+        with self.assertRaises(DeliveryReport.DoesNotExist):
+            service.generate_filenames(0)
+
+    def test_unversioned_keys_stay_under_the_report_prefix(self):
+        first, _ = get_relative_and_abs_path(report_id=self.report.id, ext="xlsx")
+        second, _ = get_relative_and_abs_path(report_id=self.report.id, ext="xlsx")
+        self.assertNotEqual(first, second)
+        self.assertTrue(first.startswith(f"{report_artifact_prefix(self.report.id)}/"))
+        self.assertTrue(first.endswith(".xlsx"))
+
+
+    def test_migrate_media_keys_limit_counts_processed_objects(self):
+        out = io.StringIO()
+        call_command('migrate_media_keys', dry_run=True, limit=3, stdout=out)
+        self.assertIn("Would move 3 object(s).", out.getvalue())
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.cmr_image.name, "cmr/1.jpg")
+
+        out = io.StringIO()
+        with mock.patch('reports.management.commands.migrate_media_keys.copy_object',
+                        side_effect=[RuntimeError("unreachable"), None, None]) as copy:
+            call_command('migrate_media_keys', limit=3, stdout=out)
+        # A failed copy counts towards the limit too
+        self.assertEqual(copy.call_count, 3)
+        self.assertIn("Moved 2 object(s), 1 failed.", out.getvalue())
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.proof_of_delivery_image.name, "proof_of_delivery/1.jpg")
+        self.assertNotEqual(self.report.cmr_image.name, "cmr/1.jpg")
+
+def report_form(location, items=1, images=1):
+    """Multipart payload creating a report with `items` items and `images` images of each kind."""
+    def upload(name):
+        return ContentFile(jpeg_bytes((64, 48)), name=f"{name}.jpg")
+
+    return {
+        'location': location.id,
+        'supplier_input': "Supplier A",
+        'checking_company': "Checker",
+        'delivery_slip_number': "SLIP-1",
+        'logistic_company': "Logistics",
+        'container_number': "CONT-1",
+        'licence_plate_truck': "CA0001AB",
+        'licence_plate_trailer': "CA0001TT",
+        'delivery_without_damages_status': 'true',
+        'damage_description': "Scratched frame",
+        'items_input': json.dumps([{'name': f"Item {i}", 'quantity': i + 1} for i in range(items)]),
+        'cmr_image': upload("cmr"),
+        'proof_of_delivery_image': upload("proof"),
+        'goods_seal_container_proof': [upload(f"gsc{i}") for i in range(min(images, 3))],
+        'delivery_slip_images_input': [upload(f"slip{i}") for i in range(images)],
+        'additional_images_input': [upload(f"additional{i}") for i in range(images)],
+        'damage_images_input': [upload(f"damage{i}") for i in range(min(images, 4))],
+    }
+
+
+class ReportCreateQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="inspector", password="secret")
+        cls.location = Location.objects.create(name="Site A", logo="locations/logos/a.png")
+        cls.user.profile.locations.add(cls.location)
+        Supplier.objects.create(name="Supplier A").locations.add(cls.location)
+        Item.objects.create(name="Item 0", location=cls.location)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        spool_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(spool_dir.cleanup)
+        patcher = override_settings(
+            MEDIA_WRITE_BEHIND=dict(settings.MEDIA_WRITE_BEHIND, ENABLED=True, SPOOL_DIR=spool_dir.name),
+            REPORT_GENERATION={'LAZY': True, 'EAGER_LOCATIONS': [], 'LOCK_SECONDS': 300, 'RETRY_AFTER_SECONDS': 5},
+        )
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def _create(self, items, images):
+        data = report_form(self.location, items, images)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/delivery-reports/?fields=id,has_damages', data, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        return len(queries), DeliveryReport.objects.get(pk=response.data['id'])
+
+    def test_create_query_count_does_not_grow_with_items_and_images(self):
+        few, report = self._create(items=2, images=1)
+        self.assertEqual(report.deliveryreportitem_set.count(), 2)
+        many, report = self._create(items=30, images=3)
+        self.assertEqual(few, many)
+
+        self.assertEqual(
+            sorted(report.deliveryreportitem_set.values_list('item__name', 'quantity')),
+            sorted((f"Item {i}", i + 1) for i in range(30)),
+        )
+        self.assertEqual(Item.objects.filter(location=self.location).count(), 30)
+        self.assertEqual(report.gsc_proof_images.count(), 3)
+        self.assertEqual(report.slip_images.count(), 3)
+        self.assertEqual(report.additional_images.count(), 3)
+        self.assertEqual(report.damage_images.count(), 3)
+        self.assertEqual(report.damage_description, "Scratched frame")
+        # Set by the explicit refresh, since bulk_create sends no signals
+        self.assertTrue(report.has_damages)
+
+
+class MediaSpoolReplicationTests(TestCase):
+    def setUp(self):
+        self.spool_dir, self.target_dir = (tempfile.TemporaryDirectory() for _ in range(2))
+        self.addCleanup(self.spool_dir.cleanup)
+        self.addCleanup(self.target_dir.cleanup)
+        patcher = override_settings(MEDIA_WRITE_BEHIND=dict(
+            settings.MEDIA_WRITE_BEHIND, ENABLED=True, SPOOL_DIR=self.spool_dir.name,
+            TARGET_DIR=self.target_dir.name, RETRY_BACKOFF_SECONDS=30,
+        ))
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def _target_bytes(self, name):
+        with open(os.path.join(self.target_dir.name, name), 'rb') as f:
+            return f.read()
+
+    def test_save_writes_the_object_whole(self):
+        media_spool.save("ab/cmr/1.jpg", ContentFile(b"jpeg bytes"))
+        self.assertTrue(media_spool.contains("ab/cmr/1.jpg"))
+        self.assertEqual(media_spool.size("ab/cmr/1.jpg"), 10)
+        with media_spool.open_file("ab/cmr/1.jpg") as f:
+            self.assertEqual(f.read(), b"jpeg bytes")
+        # The temporary file was renamed into place
+        self.assertEqual(os.listdir(os.path.join(self.spool_dir.name, 'tmp')), [])
+
+    def test_replication_moves_objects_to_the_local_target(self):
+        media_spool.save("ab/cmr/1.jpg", ContentFile(b"one"))
+        media_spool.save("cd/slip/2.jpg", ContentFile(b"two"))
+        stats = media_spool.replication_stats()
+        self.assertEqual((stats['backlog_objects'], stats['backlog_bytes']), (2, 6))
+        self.assertGreaterEqual(stats['lag_seconds'], 0)
+
+        self.assertIsInstance(media_spool.get_replication_target(), media_spool.LocalReplicationTarget)
+        call_command('replicate_media', '--once', stdout=io.StringIO())
+
+        self.assertEqual(self._target_bytes("ab/cmr/1.jpg"), b"one")
+        self.assertEqual(self._target_bytes("cd/slip/2.jpg"), b"two")
+        self.assertFalse(media_spool.contains("ab/cmr/1.jpg"))
+        self.assertEqual(media_spool.replication_stats(), {'backlog_objects': 0, 'backlog_bytes': 0, 'lag_seconds': 0.0})
+
+    def test_failed_push_is_retried_with_backoff(self):
+        media_spool.save("ab/cmr/1.jpg", ContentFile(b"one"))
+        target = media_spool.LocalReplicationTarget(self.target_dir.name)
+        replicator = media_spool.Replicator(target)
+
+        with mock.patch.object(target, 'push', side_effect=OSError("unreachable")) as push, \
+                mock.patch('reports.utils.media_spool.time.time', return_value=1000):
+            self.assertEqual(replicator.run_once(), (0, 1))
+            # Still backing off: not attempted again
+            self.assertEqual(replicator.run_once(), (0, 0))
+        self.assertEqual(push.call_count, 1)
+        self.assertEqual(replicator.failures["ab/cmr/1.jpg"], (1, 1030))
+        self.assertTrue(media_spool.contains("ab/cmr/1.jpg"))
+
+        with mock.patch.object(target, 'push', side_effect=OSError("unreachable")), \
+                mock.patch('reports.utils.media_spool.time.time', return_value=1030):
+            self.assertEqual(replicator.run_once(), (0, 1))
+        # The delay doubles with every failed attempt
+        self.assertEqual(replicator.failures["ab/cmr/1.jpg"], (2, 1090))
+
+        with mock.patch('reports.utils.media_spool.time.time', return_value=1090):
+            self.assertEqual(replicator.run_once(), (1, 0))
+        self.assertEqual(replicator.failures, {})
+        self.assertEqual(self._target_bytes("ab/cmr/1.jpg"), b"one")
+        self.assertFalse(media_spool.contains("ab/cmr/1.jpg"))
+
+
+class StorageWriteBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="inspector", password="secret")
+        cls.location = Location.objects.create(name="Site A", logo="locations/logos/a.png")
+        cls.user.profile.locations.add(cls.location)
+
+    def setUp(self):
+        spool_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(spool_dir.cleanup)
+        patcher = override_settings(
+            MEDIA_WRITE_BEHIND=dict(settings.MEDIA_WRITE_BEHIND, ENABLED=True, SPOOL_DIR=spool_dir.name),
+            REPORT_GENERATION={'LAZY': True, 'EAGER_LOCATIONS': [], 'LOCK_SECONDS': 300, 'RETRY_AFTER_SECONDS': 5},
+        )
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def test_staged_files_are_written_concurrently(self):
+        # Every write waits for the others, so this only finishes if they run at the same time
+        barrier = threading.Barrier(3, timeout=5)
+        save_with_metadata = PrivateMediaStorage.save_with_metadata
+
+        def save(storage, name, content, max_length=None):
+            barrier.wait()
+            return save_with_metadata(storage, name, content, max_length=max_length)
+
+        batch = StorageWriteBatch(max_workers=3)
+        field = DeliveryReportImage._meta.get_field('image')
+        staged = [batch.add(field, ContentFile(jpeg_bytes((64, 48)), name=f"{i}.jpg")) for i in range(3)]
+        with mock.patch.object(PrivateMediaStorage, 'save_with_metadata', autospec=True, side_effect=save):
+            batch.write()
+
+        self.assertEqual(len({f.name for f in staged}), 3)
+        self.assertTrue(all(media_spool.contains(f.name) for f in staged))
+
+    def test_failed_row_insert_removes_the_written_files(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch('reports.serializers.DeliveryReportSerializer._create_rows', side_effect=RuntimeError("boom")), \
+                mock.patch.object(StorageWriteBatch, 'discard', autospec=True,
+                                  side_effect=StorageWriteBatch.discard) as discard, \
+                mock.patch('storages.backends.s3boto3.S3Boto3Storage.delete') as s3_delete:
+            with self.assertRaises(RuntimeError):
+                client.post('/api/delivery-reports/', report_form(self.location, images=2), format='multipart')
+
+        discard.assert_called_once()
+        batch = discard.call_args.args[0]
+        # cmr, proof of delivery and two images of each of the four kinds
+        self.assertEqual(len(batch.staged), 2 + 2 * 4)
+        self.assertEqual(s3_delete.call_count, len(batch.staged))
+        self.assertEqual(list(media_spool.iter_spooled_names()), [])
+        self.assertFalse(DeliveryReport.objects.exists())
+        self.assertFalse(MediaObject.objects.exists())
+
+
+class ChunkedUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="inspector", password="secret")
+        cls.location = Location.objects.create(name="Site A", logo="locations/logos/a.png")
+        cls.user.profile.locations.add(cls.location)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for setting, name in (('UPLOAD_CONFIG', 'upload_dir'), ('MEDIA_WRITE_BEHIND', 'spool_dir')):
+            directory = tempfile.TemporaryDirectory()
+            self.addCleanup(directory.cleanup)
+            setattr(self, name, directory.name)
+        patcher = override_settings(
+            UPLOAD_CONFIG=dict(settings.UPLOAD_CONFIG, SPOOL_DIR=self.upload_dir, MAX_CHUNK_SIZE=1024),
+            MEDIA_WRITE_BEHIND=dict(settings.MEDIA_WRITE_BEHIND, ENABLED=True, SPOOL_DIR=self.spool_dir),
+            REPORT_GENERATION={'LAZY': True, 'EAGER_LOCATIONS': [], 'LOCK_SECONDS': 300, 'RETRY_AFTER_SECONDS': 5},
+        )
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+        image = io.BytesIO()
+        PILImage.effect_noise((160, 120), 40).convert('RGB').save(image, 'JPEG')
+        self.image = image.getvalue()
+
+    def _start(self, data=None):
+        response = self.client.post('/api/uploads/', {'filename': "cmr.jpg", 'total_size': len(data or self.image)})
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def _put(self, upload_id, start, end, total=None, data=None):
+        data = self.image if data is None else data
+        return self.client.put(
+            f'/api/uploads/{upload_id}/', data[start:end + 1], content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{len(data) if total is None else total}',
+        )
+
+    def _upload(self, data=None):
+        data = data or self.image
+        upload_id = self._start(data)
+        for start in range(0, len(data), 1024):
+            self.assertEqual(self._put(upload_id, start, min(start + 1023, len(data) - 1), data=data).status_code, 200)
+        self.assertEqual(self.client.post(f'/api/uploads/{upload_id}/complete/').data['status'], 'complete')
+        return upload_id
+
+    def test_content_range_is_validated(self):
+        upload_id = self._start()
+        for header in ('', 'bytes 0-9', 'items 0-9/10', 'bytes 9-0/%d' % len(self.image)):
+            response = self.client.put(f'/api/uploads/{upload_id}/', b'x', content_type='application/octet-stream',
+                                       HTTP_CONTENT_RANGE=header)
+            self.assertEqual(response.status_code, 400, header)
+        self.assertEqual(self._put(upload_id, 0, 9, total=len(self.image) + 1).status_code, 400)
+        # Larger than MAX_CHUNK_SIZE
+        self.assertEqual(self._put(upload_id, 0, 1024).status_code, 400)
+        self.assertEqual(self.client.get(f'/api/uploads/{upload_id}/')['Upload-Offset'], '0')
+
+    def test_out_of_order_chunk_is_rejected_and_overlapping_retry_accepted(self):
+        upload_id = self._start()
+        self.assertEqual(self._put(upload_id, 0, 999).status_code, 200)
+
+        response = self._put(upload_id, 1500, 1999)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '1000')
+
+        # A retried chunk may overlap what was already received
+        response = self._put(upload_id, 500, 1499)
+        self.assertEqual(response['Upload-Offset'], '1500')
+        for start in range(1500, len(self.image), 1024):
+            self._put(upload_id, start, min(start + 1023, len(self.image) - 1))
+
+        response = self.client.post(f'/api/uploads/{upload_id}/complete/')
+        self.assertEqual(response.status_code, 200)
+        with open(os.path.join(self.upload_dir, f"{upload_id}.part"), 'rb') as f:
+            self.assertEqual(f.read(), self.image)
+
+    def test_expired_upload_accepts_no_data_and_cannot_be_attached(self):
+        upload_id = self._upload()
+        pending_id = self._start()
+        ChunkedUpload.objects.update(created_at=timezone.now() - timedelta(hours=settings.UPLOAD_CONFIG['EXPIRY_HOURS'] + 1))
+
+        self.assertEqual(self._put(pending_id, 0, 999).status_code, 409)
+        data = report_form(self.location)
+        del data['cmr_image']
+        data['upload_ids'] = json.dumps({'cmr_image': upload_id})
+        response = self.client.post('/api/delivery-reports/', data, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('upload_ids: Upload', response.data['message'])
+        self.assertIn('has expired', response.data['message'])
+
+    def test_upload_consumed_by_a_concurrent_create_is_rejected(self):
+        upload_id = self._upload()
+        data = report_form(self.location)
+        del data['cmr_image']
+        data['upload_ids'] = json.dumps({'cmr_image': upload_id})
+        create_rows = DeliveryReportSerializer._create_rows
+
+        def consumed_meanwhile(*args, **kwargs):
+            # Another create attached the same upload and committed first
+            ChunkedUpload.objects.filter(id=upload_id).update(status=ChunkedUpload.STATUS_CONSUMED)
+            return create_rows(*args, **kwargs)
+
+        with mock.patch.object(DeliveryReportSerializer, '_create_rows', autospec=True,
+                               side_effect=consumed_meanwhile), \
+                mock.patch('storages.backends.s3boto3.S3Boto3Storage.delete') as s3_delete:
+            response = self.client.post('/api/delivery-reports/', data, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('already used', response.data['message'])
+        self.assertFalse(DeliveryReport.objects.exists())
+        # The files stored for the rolled back report are removed again
+        self.assertTrue(s3_delete.called)
+
+        response = self.client.post('/api/delivery-reports/', data, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(DeliveryReport.objects.exists())
+
+    def test_completed_upload_is_attached_to_a_report(self):
+        cmr_id, slip_id = self._upload(), self._upload()
+        data = report_form(self.location)
+        del data['cmr_image']
+        data['upload_ids'] = json.dumps({'cmr_image': cmr_id, 'delivery_slip_images_input': [cmr_id]})
+        response = self.client.post('/api/delivery-reports/', data, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('only be used once', response.data['message'])
+
+        data = report_form(self.location)
+        del data['cmr_image']
+        data['upload_ids'] = json.dumps({'cmr_image': cmr_id, 'delivery_slip_images_input': [slip_id]})
+        opened = []
+
+        def open_spooled(upload):
+            opened.append(open_spooled_file(upload))
+            return opened[-1]
+
+        with mock.patch('reports.serializers.open_spooled_file', side_effect=open_spooled):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/delivery-reports/?fields=id', data, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(opened), 2)
+        self.assertTrue(all(f.closed for f in opened))
+
+        report = DeliveryReport.objects.get(pk=response.data['id'])
+        self.assertTrue(report.cmr_image.name)
+        self.assertEqual(report.slip_images.count(), 2)
+        self.assertEqual(set(ChunkedUpload.objects.values_list('status', flat=True)), {'consumed'})
+        self.assertFalse(os.path.exists(os.path.join(self.upload_dir, f"{cmr_id}.part")))
+
+
+@mock.patch('reports.utils.private_storage.PrivateMediaStorage.head', lambda storage, name: None)
+class ReportPreviewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="inspector", password="secret")
+        cls.location = Location.objects.create(name="Site A", logo="locations/logos/a.png")
+        other_location = Location.objects.create(name="Site B", logo="locations/logos/b.png")
+        cls.user.profile.locations.add(cls.location)
+        supplier = Supplier.objects.create(name="Supplier A")
+        cls.report = create_report(cls.location, supplier, cls.user, 1)
+        cls.other_report = create_report(other_location, supplier, cls.user, 2)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.stored = {}
+
+        def storage_open(storage, name, mode='rb'):
+            if name in self.stored:
+                return ContentFile(self.stored[name], name=name)
+            return fake_image_open(storage, name, mode)
+
+        def save_variant(storage, name, content):
+            self.stored[name] = content.read()
+            return name
+
+        for target, fake in (('_open', storage_open), ('save_variant', save_variant)):
+            patcher = mock.patch(f'reports.utils.private_storage.PrivateMediaStorage.{target}', fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_preview_is_rendered_once_per_version(self):
+        url = f'/delivery-reports/{self.report.id}/preview/'
+        with mock.patch.object(ReportGenerationService, 'generate') as generate, \
+                mock.patch.object(ReportPreviewService, 'render', wraps=ReportPreviewService.render) as render:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'image/png')
+            with PILImage.open(io.BytesIO(response.content)) as img:
+                self.assertEqual(img.format, 'PNG')
+                self.assertEqual(img.width, round(8.27 * settings.REPORT_PREVIEW['DPI']))
+
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+            self.assertEqual(self.client.get(url).content, response.content)
+            self.assertEqual(render.call_count, 1)
+            self.assertEqual(list(self.stored), [
+                ReportPreviewService.preview_name(self.report.id, response['ETag'].strip('"'))
+            ])
+
+            DeliveryReportItem.objects.filter(delivery_report=self.report).update(quantity=50)
+            changed = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(changed.status_code, 200)
+            self.assertNotEqual(changed['ETag'], response['ETag'])
+            self.assertEqual(render.call_count, 2)
+        generate.assert_not_called()
+
+    def test_preview_is_limited_to_accessible_reports(self):
+        self.assertEqual(self.client.get(f'/delivery-reports/{self.other_report.id}/preview/').status_code, 404)
+
+
+class LazyReportGenerationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="inspector", password="secret")
+        cls.location = Location.objects.create(name="Site A", logo="locations/logos/a.png")
+        cls.eager_location = Location.objects.create(name="Site B", logo="locations/logos/b.png")
+        cls.report = create_report(cls.location, Supplier.objects.create(name="Supplier A"), cls.user, 1)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        settings_patcher = override_settings(REPORT_GENERATION={
+            'LAZY': True, 'EAGER_LOCATIONS': [self.eager_location.id], 'LOCK_SECONDS': 300, 'RETRY_AFTER_SECONDS': 5,
+        })
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+
+    @staticmethod
+    def fake_render_for(report, version=1):
+        prefix = f"reports/{report.pk}/v{version}"
+        return {'excel': f"{prefix}.xlsx", 'pdf': f"{prefix}.pdf", 'prefix': prefix}
+
+    def test_create_skips_generation_except_for_eager_locations(self):
+        with mock.patch('reports.services.ReportGenerationService.generate') as generate:
+            for location, generated in ((self.location, False), (self.eager_location, True)):
+                with mock.patch(
+                    'rest_framework.mixins.CreateModelMixin.create',
+                    return_value=Response({'id': self.report.id, 'location': location.id}, status=201),
+                ):
+                    response = self.client.post('/api/delivery-reports/', {}, format='json')
+                self.assertEqual(response.status_code, 201)
+                self.assertEqual(generate.called, generated)
+
+    def test_first_download_generates_files_once(self):
+        atomic_depth = len(connection.atomic_blocks)
+        render_depths = []
+
+        def render_for(report):
+            render_depths.append(len(connection.atomic_blocks))
+            return self.fake_render_for(report)
+
+        with mock.patch('reports.services.ReportGenerationService.render_for', side_effect=render_for):
+            response = self.client.get(f'/download-report/{self.report.id}/pdf/')
+            self.assertEqual(response.status_code, 302)
+            self.assertIn(f"reports/{self.report.id}/v1.pdf", response['Location'])
+            response = self.client.get(f'/download-report/{self.report.id}/excel/')
+            self.assertIn(f"reports/{self.report.id}/v1.xlsx", response['Location'])
+            self.assertEqual(ReportGenerationService.ensure_generated(self.report.id)['pdf_report_file'],
+                             f"reports/{self.report.id}/v1.pdf")
+        # Rendered once, and outside of any transaction holding the row lock
+        self.assertEqual(render_depths, [atomic_depth])
+        self.assertIsNone(cache.get(f"report-generation-{self.report.id}"))
+
+    def test_concurrent_download_gets_retry_after(self):
+        cache.add(f"report-generation-{self.report.id}", True)
+        self.addCleanup(cache.delete, f"report-generation-{self.report.id}")
+        with mock.patch('reports.services.ReportGenerationService.render_for') as render:
+            response = self.client.get(f'/download-report/{self.report.id}/pdf/')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Retry-After'], '5')
+        render.assert_not_called()
+
+    def test_files_stored_during_render_are_kept(self):
+        def render_for(report):
+            # Another worker stores its version while this one renders
+            ReportUpdateService.update_report_files(report.pk, self.fake_render_for(report))
+            return self.fake_render_for(report, version=2)
+
+        with mock.patch('reports.services.ReportGenerationService.render_for', side_effect=render_for), \
+                mock.patch('reports.services.default_storage.delete') as delete:
+            stored = ReportGenerationService.ensure_generated(self.report.id)
+        self.assertEqual(stored['pdf_report_file'], f"reports/{self.report.id}/v1.pdf")
+        self.assertEqual(sorted(call.args[0] for call in delete.call_args_list),
+                         [f"reports/{self.report.id}/v2.pdf", f"reports/{self.report.id}/v2.xlsx"])
+
+    def test_failed_generation_is_reported(self):
+        with mock.patch('reports.services.ReportGenerationService.render_for', side_effect=RuntimeError("soffice")):
+            response = self.client.get(f'/download-report/{self.report.id}/pdf/')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(self.client.get('/download-report/999/pdf/').status_code, 404)
+        self.report.refresh_from_db()
+        self.assertFalse(self.report.pdf_report_file)
+        self.assertIsNone(cache.get(f"report-generation-{self.report.id}"))
+
+
+@mock.patch('reports.utils.private_storage.PrivateMediaStorage.url', fake_presigned_url)
+class MediaThumbnailTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="inspector", password="secret")
+        location = Location.objects.create(name="Site A", logo="locations/logos/a.png")
+        cls.user.profile.locations.add(location)
+        supplier = Supplier.objects.create(name="Supplier A")
+        cls.report = create_report(location, supplier, cls.user, 1)
+        cls.other_report = create_report(Location.objects.create(name="Site B", logo="b.png"), supplier, cls.user, 2)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        spool_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(spool_dir.cleanup)
+        spooling = override_settings(
+            MEDIA_WRITE_BEHIND=dict(settings.MEDIA_WRITE_BEHIND, ENABLED=True, SPOOL_DIR=spool_dir.name),
+        )
+        spooling.enable()
+        self.addCleanup(spooling.disable)
+
+        # An image stored before thumbnails were made at upload
+        image = io.BytesIO()
+        PILImage.new('RGB', (1600, 1200), (30, 120, 30)).save(image, format='JPEG')
+        media_spool.save("additional/1.jpg", ContentFile(image.getvalue()))
+
+    def test_admin_preview_signs_only_stored_thumbnails(self):
+        inline = DeliveryReportImageInline(DeliveryReport, admin.site)
+        request = RequestFactory().get('/admin/')
+        request.user = get_user_model().objects.create_superuser(username="admin", password="secret")
+        image = DeliveryReportImage.objects.filter(delivery_report=self.report).first()
+
+        with mock.patch('reports.utils.thumbnails.PILImage.open') as decode, \
+                mock.patch('reports.utils.private_storage.PrivateMediaStorage.presign',
+                           side_effect=lambda name: f"https://bucket.example/{name}") as presign:
+            self.assertEqual(inline.preview(inline.get_queryset(request).get(pk=image.pk)), "-")
+            MediaObject.objects.update_or_create(
+                name=image.image.name, defaults={'size': 1, 'content_type': 'image/jpeg', 'thumbnails': [480, 160]},
+            )
+            preview = inline.preview(inline.get_queryset(request).get(pk=image.pk))
+        self.assertIn(thumbnail_name_for(image.image.name, 160), preview)
+        decode.assert_not_called()
+        presign.assert_called_once()
+
+    def test_thumbnail_is_rendered_once_and_then_served_from_storage(self):
+        response = self.client.get(f'/api/delivery-reports/{self.report.id}/?fields=id,additional_images_urls')
+        link = response.data['additional_images_urls'][0]['thumbnail']
+        self.assertIn('/api/media/thumbnail/?key=', link)
+
+        response = self.client.get(link)
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/media-spool/', response['Location'])
+        with PILImage.open(media_spool.open_file(thumbnail_name_for("additional/1.jpg", 160))) as thumbnail:
+            self.assertEqual(thumbnail.size, (160, 120))
+        self.assertEqual(MediaObject.objects.get(name="additional/1.jpg").thumbnails, [160])
+
+        with mock.patch('reports.utils.thumbnails.PILImage.open') as decode:
+            self.assertEqual(self.client.get(link).status_code, 302)
+        decode.assert_not_called()
+
+    def test_thumbnail_checks_size_and_access(self):
+        fields = '?fields=id,additional_images_urls'
+        link = self.client.get(f'/api/delivery-reports/{self.report.id}/{fields}').data['additional_images_urls'][0]['thumbnail']
+        self.assertEqual(self.client.get(f'{link}&size=37').status_code, 400)
+        self.assertEqual(self.client.get(f'{link}&size=480').status_code, 302)
+
+        other_key = media_keys.make_key(self.other_report.additional_images.get().image)
+        self.assertEqual(self.client.get('/api/media/thumbnail/', {'key': other_key}).status_code, 404)
+
+
+@mock.patch('reports.utils.private_storage.PrivateMediaStorage.url', fake_presigned_url)
+@override_settings(REPORT_SYNC={'PAGE_SIZE': 2, 'MAX_PAGE_SIZE': 10, 'SETTLE_SECONDS': 0})
+class ReportSyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="inspector", password="secret")
+        cls.location = Location.objects.create(name="Site A", logo="locations/logos/a.png")
+        cls.other_location = Location.objects.create(name="Site B", logo="locations/logos/b.png")
+        cls.user.profile.locations.add(cls.location)
+        cls.supplier = Supplier.objects.create(name="Supplier A")
+        cls.reports = [create_report(cls.location, cls.supplier, cls.user, i) for i in range(3)]
+        create_report(cls.other_location, cls.supplier, cls.user, 10)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _sync(self, cursor=None):
+        changed, deleted = [], []
+        while True:
+            params = {'fields': 'id'}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get('/api/delivery-reports/sync/', params)
+            self.assertEqual(response.status_code, 200)
+            changed += [report['id'] for report in response.data['changed']]
+            deleted += response.data['deleted']
+            cursor = response.data['cursor']
+            if not response.data['has_more']:
+                return changed, deleted, cursor
+
+    def test_sync_returns_only_changes_since_cursor(self):
+        changed, deleted, cursor = self._sync()
+        self.assertEqual(changed, [report.id for report in self.reports])
+        self.assertEqual(deleted, [])
+
+        self.assertEqual(self._sync(cursor)[:2], ([], []))
+
+        updated = self.reports[0]
+        updated.comments = "Rechecked"
+        updated.save()
+        new = create_report(self.location, self.supplier, self.user, 5)
+        removed_id = self.reports[1].id
+        self.reports[1].delete()
+        create_report(self.other_location, self.supplier, self.user, 11)
+
+        changed, deleted, cursor = self._sync(cursor)
+        self.assertEqual(changed, [updated.id, new.id])
+        self.assertEqual(deleted, [removed_id])
+        self.assertEqual(self._sync(cursor)[:2], ([], []))
+
+    def test_changes_made_outside_report_saves_are_synced(self):
+        _, _, cursor = self._sync()
+        DeliveryReportSlipImage.objects.create(delivery_report=self.reports[0], image="slip_images/extra.jpg")
+        self.reports[1].damage_images.all().delete()
+        ReportFileService().generate_filenames(self.reports[2].pk)
+
+        changed, deleted, _ = self._sync(cursor)
+        self.assertEqual(sorted(changed), [report.id for report in self.reports])
+        self.assertEqual(deleted, [])
+
+    def test_moved_report_is_deleted_only_where_it_is_no_longer_visible(self):
+        _, _, cursor = self._sync()
+        moved = DeliveryReport.objects.get(pk=self.reports[0].pk)
+        moved.location = self.other_location
+        moved.save()
+
+        self.assertEqual(self._sync(cursor)[:2], ([], [moved.id]))
+        self.user.profile.locations.add(self.other_location)
+        self.assertEqual(self._sync(cursor)[:2], ([moved.id], []))
+
+    def test_sync_holds_back_unsettled_changes(self):
+        _, _, cursor = self._sync()
+        with self.settings(REPORT_SYNC={'PAGE_SIZE': 2, 'MAX_PAGE_SIZE': 10, 'SETTLE_SECONDS': 60}):
+            create_report(self.location, self.supplier, self.user, 6)
+            self.assertEqual(self._sync(cursor)[0], [])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/delivery-reports/sync/', {'cursor': 'nope'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ReportFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="inspector", password="secret")
+        cls.location = Location.objects.create(name="Site A", logo="locations/logos/a.png")
+        cls.user.profile.locations.add(cls.location)
+        cls.supplier = Supplier.objects.create(name="Supplier A")
+        cls.other_supplier = Supplier.objects.create(name="Supplier B")
+        cls.reports = [create_report(cls.location, cls.supplier, cls.user, i) for i in range(4)]
+
+        clean = cls.reports[0]
+        clean.damage_images.all().delete()
+        clean.supplier_fk = cls.other_supplier
+        clean.logistic_company = "Fast Freight"
+        clean.save()
+        DeliveryReport.objects.filter(pk=cls.reports[1].pk).update(
+            created_at=timezone.make_aware(timezone.datetime(2024, 3, 15, 12, 0))
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _ids(self, query, url='/api/delivery-reports/'):
+        response = self.client.get(f'{url}?view=summary&page_size=50&{query}')
+        self.assertEqual(response.status_code, 200, response.data)
+        return sorted(row['id'] for row in response.data['results'])
+
+    def test_filters(self):
+        first, second, third, _ = self.reports
+        self.assertEqual(self._ids('licence_plate=ca0002ab'), [third.id])
+        self.assertEqual(self._ids('licence_plate=CA0002TT'), [third.id])
+        self.assertEqual(self._ids('container_number=cont-1'), [second.id])
+        self.assertEqual(self._ids('delivery_slip_number=slip-2'), [third.id])
+        self.assertEqual(self._ids(f'supplier={self.other_supplier.id}'), [first.id])
+        self.assertEqual(self._ids('logistic_company=fast freight'), [first.id])
+        self.assertEqual(self._ids('checking_company=checker'), [r.id for r in self.reports])
+        self.assertEqual(self._ids('has_damages=false'), [first.id])
+        self.assertEqual(len(self._ids('has_damages=true')), 3)
+        self.assertEqual(self._ids('created_from=2024-03-15&created_to=2024-03-15'), [second.id])
+        self.assertEqual(
+            self._ids('has_damages=true&created_to=2024-03-31', url=f'/reports-by-location/{self.location.id}/'),
+            [second.id],
+        )
+
+    def test_invalid_filters_are_rejected(self):
+        response = self.client.get('/api/delivery-reports/?created_from=2024-05-01&created_to=2024-04-01')
+        self.assertEqual(response.status_code, 400)
+
+    def test_damage_flag_follows_status_and_images(self):
+        report = self.reports[0]
+        self.assertFalse(DeliveryReport.objects.get(pk=report.pk).has_damages)
+        DeliveryReportDamageImage.objects.create(delivery_report=report, image="damage/new.jpg")
+        self.assertTrue(DeliveryReport.objects.get(pk=report.pk).has_damages)
+        report.damage_images.all().delete()
+        report.delivery_without_damages_status = False
+        report.save()
+        self.assertTrue(DeliveryReport.objects.get(pk=report.pk).has_damages)
+        report.delivery_without_damages_status = True
+        report.save()
+        self.assertFalse(DeliveryReport.objects.get(pk=report.pk).has_damages)
+
+    def test_artifact_saves_do_not_touch_the_damage_flag(self):
+        report = self.reports[0]
+        with CaptureQueriesContext(connection) as queries:
+            ReportUpdateService.update_report_files(report.pk, report_artifact_keys(report.pk, 1))
+        writes = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(writes), 1)
+        self.assertNotIn('has_damages', writes[0])
+
+
+@skipUnless(connection.vendor == 'postgresql', "EXPLAIN output is PostgreSQL specific")
+class ReportFilterIndexTests(TestCase):
+    """The common list filters must be answered from an index, not a scan of all reports."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user(username="inspector", password="secret")
+        cls.location = Location.objects.create(name="Site A", logo="locations/logos/a.png")
+        cls.supplier = Supplier.objects.create(name="Supplier A")
+        DeliveryReport.objects.bulk_create([
+            DeliveryReport(
+                location=cls.location,
+                supplier_fk=cls.supplier,
+                user=user,
+                checking_company=f"Checker {i % 20}",
+                delivery_slip_number=f"SLIP-{i}",
+                logistic_company=f"Logistics {i % 30}",
+                container_number=f"CONT-{i}",
+                licence_plate_truck=f"CA{i:05d}AB",
+                licence_plate_trailer=f"CA{i:05d}TT",
+                has_damages=i % 50 == 0,
+            )
+            for i in range(5000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {DeliveryReport._meta.db_table}')
+
+    def _plan(self, query):
+        params = ReportFilterSerializer(data=query)
+        params.is_valid(raise_exception=True)
+        queryset = params.filter(DeliveryReport.objects.order_by('-created_at'))[:20]
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def test_common_filters_use_index_scans(self):
+        table = DeliveryReport._meta.db_table
+        for query in (
+            {'licence_plate': 'ca00042ab'},
+            {'container_number': 'cont-42'},
+            {'delivery_slip_number': 'slip-42'},
+            {'checking_company': 'checker 3'},
+            {'logistic_company': 'logistics 3'},
+            {'supplier': self.supplier.id},
+            {'created_from': '2024-01-01', 'created_to': '2024-01-31'},
+        ):
+            with self.subTest(query=query):
+                plan = self._plan(query)
+                self.assertIn('Index', plan)
+                self.assertNotIn(f'Seq Scan on {table}', plan)
+
+        plan = self._plan({'has_damages': True})
+        self.assertIn('report_damaged_idx', plan)
+
+
+@mock.patch('reports.utils.private_storage.PrivateMediaStorage.url', fake_presigned_url)
+class ReportSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="inspector", password="secret")
+        cls.location = Location.objects.create(name="Site A", logo="locations/logos/a.png")
+        cls.other_location = Location.objects.create(name="Site B", logo="locations/logos/b.png")
+        cls.user.profile.locations.add(cls.location)
+        supplier = Supplier.objects.create(name="Supplier A")
+        cls.reports = [create_report(cls.location, supplier, cls.user, i) for i in range(3)]
+        cls.hidden = create_report(cls.other_location, supplier, cls.user, 3)
+
+        scratched = cls.reports[1]
+        scratched.comments = "Two panels scratched on the left side"
+        scratched.save()
+        mentioned = cls.reports[2]
+        mentioned.damage_description = "Container CONT-1 arrived next to this one"
+        mentioned.save()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_short_query_is_rejected(self):
+        response = self.client.get('/api/delivery-reports/search/?q=a')
+        self.assertEqual(response.status_code, 400)
+
+    @skipUnless(connection.vendor != 'postgresql', "Only other backends lack full-text search")
+    def test_search_requires_postgresql(self):
+        response = self.client.get('/api/delivery-reports/search/?q=scratched')
+        self.assertEqual(response.status_code, 501)
+
+    @skipUnless(connection.vendor == 'postgresql', "Full-text search is PostgreSQL specific")
+    def test_search_ranks_matches_within_user_locations(self):
+        response = self.client.get('/api/delivery-reports/search/?q=scratch&view=summary')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual([row['id'] for row in response.data['results']], [self.reports[1].id])
+
+        # The container number outranks a mention in the damage description
+        response = self.client.get('/api/delivery-reports/search/?q=cont-1&view=summary')
+        self.assertEqual(
+            [row['id'] for row in response.data['results']],
+            [self.reports[1].id, self.reports[2].id],
+        )
+
+        response = self.client.get('/api/delivery-reports/search/?q=CA0003')
+        self.assertEqual(response.data['results'], [])
@@ -3,6 +3,8 @@ from rest_framework.routers import DefaultRouter
 from . import views
 from .views import download_excel_report, download_pdf_report, SupplierAutocompleteView
 from .views import DeliveryReportViewSet, HomePageView, ItemAutocompleteView, ReportsByLocationView, RecognizePlatesView
+from .views import ChunkedUploadCreateView, ChunkedUploadDetailView, ChunkedUploadCompleteView, MediaPresignView
+from .views import MediaThumbnailView, LocationDigestView
 
 router = DefaultRouter()
 router.register(r'delivery-reports', DeliveryReportViewSet, basename='deliveryreport')
@@ -12,9 +14,19 @@ urlpatterns = [
     path('api/', include(router.urls)),# API nested under /api/
     path('api/items/autocomplete/', ItemAutocompleteView.as_view(), name='item-autocomplete'),
     path('api/recognize-plates/', RecognizePlatesView.as_view(), name='recognize-plates'),
+    path('api/uploads/', ChunkedUploadCreateView.as_view(), name='chunked-upload-create'),
+    path('api/uploads/<uuid:upload_id>/', ChunkedUploadDetailView.as_view(), name='chunked-upload-detail'),
+    path('api/uploads/<uuid:upload_id>/complete/', ChunkedUploadCompleteView.as_view(), name='chunked-upload-complete'),
+    path('api/media/presign/', MediaPresignView.as_view(), name='media-presign'),
+    path('api/media/thumbnail/', MediaThumbnailView.as_view(), name='media-thumbnail'),
     path('download-report/<int:report_id>/excel/', download_excel_report, name='download_excel_report'),
     path('download-report/<int:report_id>/pdf/', download_pdf_report, name='download_pdf_report'),
     path('delivery-reports/<int:report_id>/download-media/', views.download_report_media, name='download-media'),
+    path('delivery-reports/<int:report_id>/download-media/zip/', views.download_report_media_zip, name='download-media-zip'),
+    path('delivery-reports/<int:report_id>/media-manifest/', views.report_media_manifest, name='media-manifest'),
+    path('delivery-reports/<int:report_id>/preview/', views.report_preview, name='report-preview'),
+    path('media-spool/<str:token>/', views.spooled_media, name='spooled-media'),
     path('reports-by-location/<int:location_id>/', ReportsByLocationView.as_view(), name='reports-by-location'),
     path('locations/<int:location_id>/suppliers/',SupplierAutocompleteView.as_view(),name='supplier-autocomplete'),
+    path('locations/<int:location_id>/digest/', LocationDigestView.as_view(), name='location-digest'),
 ]
\ No newline at end of file
@@ -0,0 +1,100 @@
+import os
+import re
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+READ_BLOCK_SIZE = 64 * 1024
+
+
+class ChunkedUploadError(Exception):
+    pass
+
+
+class UploadOffsetMismatch(ChunkedUploadError):
+    def __init__(self, expected_offset):
+        self.expected_offset = expected_offset
+        super().__init__(f"Chunk must start at or before byte {expected_offset}.")
+
+
+def get_spool_path(upload):
+    """
+    Return the local path where the parts of an upload are assembled.
+    """
+    return os.path.join(settings.UPLOAD_CONFIG['SPOOL_DIR'], f"{upload.id}.part")
+
+
+def parse_content_range(header, total_size):
+    """
+    Parse a `Content-Range: bytes <start>-<end>/<total>` header into (start, end).
+    """
+    match = CONTENT_RANGE_RE.match((header or '').strip())
+    if not match:
+        raise ChunkedUploadError("Content-Range header must look like 'bytes <start>-<end>/<total>'.")
+
+    start, end, total = (int(value) for value in match.groups())
+    if total != total_size:
+        raise ChunkedUploadError(f"Content-Range total {total} does not match the declared size {total_size}.")
+    if start > end or end >= total_size:
+        raise ChunkedUploadError("Content-Range is outside of the upload.")
+    if end - start + 1 > settings.UPLOAD_CONFIG['MAX_CHUNK_SIZE']:
+        raise ChunkedUploadError(
+            f"Chunk too large. Maximum chunk size is {settings.UPLOAD_CONFIG['MAX_CHUNK_SIZE']} bytes."
+        )
+    return start, end
+
+
+def write_chunk(upload, start, end, stream):
+    """
+    Write the byte range [start, end] read from `stream` into the spool file.
+    Chunks may overlap already received data (a retried PUT), but must not leave a gap.
+    Returns the new contiguous offset.
+    """
+    if start > upload.offset:
+        raise UploadOffsetMismatch(upload.offset)
+
+    path = get_spool_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    expected = end - start + 1
+    written = 0
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+        f.seek(start)
+        while written < expected:
+            block = stream.read(min(READ_BLOCK_SIZE, expected - written))
+            if not block:
+                break
+            f.write(block)
+            written += len(block)
+
+    if written != expected:
+        # Only the bytes that actually arrived count towards the offset
+        logger.warning(f"Upload {upload.id}: expected {expected} bytes, received {written}")
+    return max(upload.offset, start + written)
+
+
+def open_spooled_file(upload):
+    """
+    Open a completed upload as a Django File carrying the client's original filename.
+    """
+    return File(open(get_spool_path(upload), 'rb'), name=upload.filename)
+
+
+def discard_spooled_file(upload):
+    path = get_spool_path(upload)
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.error(f"Could not remove spooled upload {path}: {e}")
+
+
+def is_expired(upload):
+    expiry = timedelta(hours=settings.UPLOAD_CONFIG['EXPIRY_HOURS'])
+    return upload.created_at < timezone.now() - expiry
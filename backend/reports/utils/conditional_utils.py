@@ -0,0 +1,110 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.db.models import Count, F, Max, Sum, Value, CharField, DateTimeField, IntegerField
+
+from .private_storage import PRESIGNED_URL_EXPIRY
+
+# Responses embed presigned URLs, so a cached copy must be refreshed before they expire
+URL_FRESHNESS_SECONDS = PRESIGNED_URL_EXPIRY // 2
+
+
+NO_TIMESTAMP = Value(None, output_field=DateTimeField())
+NO_KEY = Value(None, output_field=IntegerField())
+ZERO = Value(0, output_field=IntegerField())
+
+
+def _label(table):
+    return Value(table, output_field=CharField())
+
+
+def _child_stats(model, reports, table, latest, checksum):
+    """(table, report id, newest timestamp, sum of ids, checksum) per report, for a UNION ALL."""
+    return model.objects.filter(delivery_report__in=reports).order_by().values('delivery_report').annotate(
+        table=_label(table),
+        key=F('delivery_report'),
+        latest=Max(latest) if latest else NO_TIMESTAMP,
+        ids=Sum('pk'),
+        checksum=Sum(checksum) if checksum else ZERO,
+    ).values_list('table', 'key', 'latest', 'ids', 'checksum')
+
+
+def collect_report_stats(rows, total=None):
+    """
+    Cheap change markers for the reports in `rows` (a queryset, possibly a page slice): each
+    report's `updated_at` and, per report, the newest `uploaded_at`, the sum of ids and item
+    quantities of its child rows, read in a single UNION ALL query. The sums change when a child
+    row is added or removed. `total` adds the row count of a queryset, for pages showing a count.
+    """
+    from ..models import (
+        DeliveryReport,
+        DeliveryReportItem,
+        DeliveryReportImage,
+        DeliveryReportDamageImage,
+        DeliveryReportSlipImage,
+        DeliveryReportGSCProofImage,
+    )
+
+    # A sliced page keeps its ORDER BY/LIMIT as a subquery, so only its own rows are read
+    reports = rows.prefetch_related(None).values('pk')
+    parts = [
+        DeliveryReport.objects.filter(pk__in=reports).order_by().annotate(
+            table=_label('reports'), key=F('pk'), latest=F('updated_at'), ids=F('pk'), checksum=ZERO,
+        ).values_list('table', 'key', 'latest', 'ids', 'checksum'),
+        _child_stats(DeliveryReportItem, reports, 'items', None, 'quantity'),
+    ]
+    for table, model in (
+        ('additional_images', DeliveryReportImage),
+        ('damage_images', DeliveryReportDamageImage),
+        ('slip_images', DeliveryReportSlipImage),
+        ('gsc_proof_images', DeliveryReportGSCProofImage),
+    ):
+        parts.append(_child_stats(model, reports, table, 'uploaded_at', None))
+    if total is not None:
+        parts.append(total.order_by().prefetch_related(None).annotate(table=_label('total')).values('table').annotate(
+            key=NO_KEY, latest=NO_TIMESTAMP, ids=Count('pk'), checksum=ZERO,
+        ).values_list('table', 'key', 'latest', 'ids', 'checksum'))
+
+    stats = parts[0].union(*parts[1:], all=True)
+    stats = {(table, key): (latest, ids, checksum) for table, key, latest, ids, checksum in stats}
+    if total is not None:
+        # Grouping an empty queryset yields no row at all
+        stats.setdefault(('total', None), (None, 0, 0))
+    return stats
+
+
+def page_of(stats):
+    """(report ids, row count of `total` or None) read by collect_report_stats, for the paginator."""
+    ids = [key for table, key in stats if table == 'reports']
+    count = stats.get(('total', None), (None, None, None))[1]
+    return ids, count
+
+
+def report_validators(request, stats, scope):
+    """
+    Return (etag, last_modified) for a report read from its collect_report_stats. Nothing is
+    serialized: the ETag hashes the change markers (and the size of `total`), the request
+    parameters, the user and the current URL freshness window; Last-Modified is the newest
+    timestamp, but never older than that window.
+    """
+    window = int(time.time()) // URL_FRESHNESS_SECONDS
+
+    # Filters, pagination and representation options all change the payload
+    params = sorted((name, values) for name, values in request.query_params.lists())
+    fingerprint = repr((scope, request.user.pk, window, params, sorted(stats.items())))
+    etag = '"%s"' % hashlib.sha256(fingerprint.encode()).hexdigest()[:32]
+
+    timestamps = [_as_datetime(latest) for latest, _ids, _sum in stats.values() if latest]
+    window_start = datetime.fromtimestamp(window * URL_FRESHNESS_SECONDS, tz=timezone.utc)
+    last_modified = max(timestamps + [window_start])
+    return etag, last_modified
+
+
+def _as_datetime(value):
+    # UNION output is not converted back to datetimes on every backend
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
@@ -0,0 +1,197 @@
+import math
+
+from django.conf import settings
+from PIL import Image as PILImage, ImageDraw, ImageFont
+
+A4_INCHES = (8.27, 11.69)
+MARGIN = 0.4  # inches
+
+TEXT = (20, 20, 20)
+MUTED = (110, 110, 110)
+RULE = (200, 200, 200)
+ALERT = (190, 30, 30)
+
+
+def load_font(size, bold=False):
+    """TrueType font from REPORT_DIGEST['FONT_PATHS'] (Cyrillic capable), else Pillow's default."""
+    paths = settings.REPORT_DIGEST['BOLD_FONT_PATHS' if bold else 'FONT_PATHS']
+    for path in paths:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=size)
+
+
+def fit_text(draw, text, font, width):
+    """`text` on one line, shortened with an ellipsis to fit `width` pixels."""
+    text = ' '.join(str(text or '').split())
+    if draw.textlength(text, font=font) <= width:
+        return text
+    while text and draw.textlength(text + '…', font=font) > width:
+        text = text[:-1]
+    return text + '…'
+
+
+class DigestRenderer:
+    """
+    Draws the pages of a daily digest as A4 images: a summary table of every delivery, then
+    one compact page per report with its details and a grid of image thumbnails.
+    """
+    SUMMARY_COLUMNS = [
+        # (title, key, share of the table width)
+        ("Time", 'time', 0.07),
+        ("Supplier", 'supplier', 0.19),
+        ("Slip", 'slip', 0.13),
+        ("Container", 'container', 0.13),
+        ("Plates", 'plates', 0.17),
+        ("Items", 'items_summary', 0.21),
+        ("Qty", 'total', 0.05),
+        ("Damage", 'damage_flag', 0.05),
+    ]
+    GRID_COLUMNS = 4
+
+    def __init__(self, location_name, day):
+        dpi = settings.REPORT_DIGEST['DPI']
+        self.dpi = dpi
+        self.size = (round(A4_INCHES[0] * dpi), round(A4_INCHES[1] * dpi))
+        self.margin = round(MARGIN * dpi)
+        self.title = f"Deliveries at {location_name} on {day:%d.%m.%Y}"
+        scale = dpi / 100
+        self.font = load_font(round(11 * scale))
+        self.small = load_font(round(9 * scale))
+        self.bold = load_font(round(11 * scale), bold=True)
+        self.heading = load_font(round(16 * scale), bold=True)
+        self.line = round(17 * scale)
+
+    @property
+    def content_width(self):
+        return self.size[0] - 2 * self.margin
+
+    def _page(self):
+        img = PILImage.new('RGB', self.size, 'white')
+        draw = ImageDraw.Draw(img)
+        draw.text((self.margin, self.margin), self.title, font=self.heading, fill=TEXT)
+        return img, draw, self.margin + round(self.line * 1.8)
+
+    def summary_pages(self, rows):
+        """Summary table over as many pages as it needs."""
+        rows = list(rows)
+        damaged = sum(1 for row in rows if row['damaged'])
+        remaining = rows
+        first = True
+        while first or remaining:
+            img, draw, y = self._page()
+            if first:
+                draw.text((self.margin, y), f"{len(rows)} deliveries, {damaged} with damages",
+                          font=self.font, fill=MUTED)
+                y += round(self.line * 1.5)
+            y = self._table_header(draw, y)
+            capacity = (self.size[1] - self.margin - y) // self.line
+            chunk, remaining = remaining[:capacity], remaining[capacity:]
+            for row in chunk:
+                self._table_row(draw, y, row)
+                y += self.line
+            first = False
+            yield img
+
+    def _columns(self):
+        x = self.margin
+        for title, key, share in self.SUMMARY_COLUMNS:
+            width = round(self.content_width * share)
+            yield title, key, x, width
+            x += width
+
+    def _table_header(self, draw, y):
+        for title, _, x, width in self._columns():
+            draw.text((x, y), title, font=self.bold, fill=TEXT)
+        y += self.line
+        draw.line((self.margin, y - 3, self.size[0] - self.margin, y - 3), fill=RULE, width=1)
+        return y
+
+    def _table_row(self, draw, y, row):
+        for _, key, x, width in self._columns():
+            fill = ALERT if key == 'damage_flag' and row['damaged'] else TEXT
+            draw.text((x, y), fit_text(draw, row[key], self.font, width - 6), font=self.font, fill=fill)
+
+    def cell_size(self):
+        """Size of one thumbnail in the report page grid, so fetchers can decode straight to it."""
+        width = self.content_width // self.GRID_COLUMNS
+        return width - 8, round((width - 8) * 0.75)
+
+    def report_page(self, row, images, total_images):
+        """
+        One report: its details, then `images` ([(label, PIL image or None)]) in a grid and a
+        note for the rest of its `total_images`.
+        """
+        img, draw, y = self._page()
+        draw.text((self.margin, y), f"Report #{row['id']}  ·  {row['time']}  ·  {row['supplier']}",
+                  font=self.bold, fill=TEXT)
+        y += round(self.line * 1.4)
+
+        details = [
+            ("Delivery slip", row['slip']),
+            ("Container", row['container']),
+            ("Plates", row['plates']),
+            ("Checking company", row['checking_company']),
+            ("Logistic company", row['logistic_company']),
+            ("Damage", row['damage_flag'] + (f" – {row['damage_description']}" if row['damage_description'] else "")),
+        ]
+        label_width = round(self.content_width * 0.25)
+        for label, value in details:
+            draw.text((self.margin, y), label, font=self.font, fill=MUTED)
+            fill = ALERT if label == "Damage" and row['damaged'] else TEXT
+            draw.text((self.margin + label_width, y), fit_text(draw, value, self.font, self.content_width - label_width),
+                      font=self.font, fill=fill)
+            y += self.line
+
+        draw.text((self.margin, y), "Items", font=self.font, fill=MUTED)
+        item_lines = [f"{name} × {quantity}" for name, quantity in row['items']] or ["–"]
+        for line in item_lines[:8]:
+            draw.text((self.margin + label_width, y), fit_text(draw, line, self.font, self.content_width - label_width),
+                      font=self.font, fill=TEXT)
+            y += self.line
+        if len(item_lines) > 8:
+            draw.text((self.margin + label_width, y), f"+ {len(item_lines) - 8} more", font=self.font, fill=MUTED)
+            y += self.line
+
+        y += self.line // 2
+        self._grid(img, draw, y, images, total_images)
+        return img
+
+    def _grid(self, img, draw, y, images, total_images):
+        cell_w, cell_h = self.cell_size()
+        pitch_x = self.content_width // self.GRID_COLUMNS
+        pitch_y = cell_h + self.line + 8
+        rows_fit = max((self.size[1] - self.margin - y) // pitch_y, 0)
+        shown = images[:rows_fit * self.GRID_COLUMNS]
+        for i, (label, thumb) in enumerate(shown):
+            x = self.margin + (i % self.GRID_COLUMNS) * pitch_x
+            top = y + (i // self.GRID_COLUMNS) * pitch_y
+            draw.text((x, top), fit_text(draw, label, self.small, cell_w), font=self.small, fill=MUTED)
+            box = (x, top + self.line, x + cell_w, top + self.line + cell_h)
+            if thumb is None:
+                draw.rectangle(box, outline=RULE)
+                draw.text((x + 6, box[1] + 6), "not available", font=self.small, fill=MUTED)
+                continue
+            # Center the thumbnail in its cell
+            offset_x = x + (cell_w - thumb.width) // 2
+            offset_y = box[1] + (cell_h - thumb.height) // 2
+            img.paste(thumb, (offset_x, offset_y))
+        if total_images > len(shown):
+            more_y = y + math.ceil(len(shown) / self.GRID_COLUMNS) * pitch_y
+            draw.text((self.margin, min(more_y, self.size[1] - self.margin - self.line)),
+                      f"+ {total_images - len(shown)} more images", font=self.small, fill=MUTED)
+
+
+def write_pdf(pages, f, dpi):
+    """
+    Write `pages` to a PDF in `f` (opened w+b), one page at a time: every page after the first
+    is appended as an incremental update, so only one page image is held in memory.
+    """
+    count = 0
+    for page in pages:
+        page.save(f, 'PDF', resolution=dpi, append=count > 0)
+        page.close()
+        count += 1
+    return count
@@ -0,0 +1,87 @@
+import re
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header
+
+from . import media_metadata
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    (start, end) of a single `bytes=` range, end inclusive, or None to send the whole object.
+    Multiple ranges are answered with the whole object, which RFC 9110 allows.
+    """
+    match = RANGE_RE.match((header or '').strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def redirect_to_object(storage, name, filename):
+    """302 to a short-lived presigned URL that downloads the object as `filename`."""
+    url = storage.presign(name, expires_in=settings.REPORT_DOWNLOADS['URL_EXPIRY_SECONDS'], filename=filename)
+    response = HttpResponseRedirect(url)
+    # The target expires, so the redirect must not be reused
+    patch_cache_control(response, private=True, no_store=True)
+    return response
+
+
+def proxy_object(request, storage, name, filename):
+    """
+    Stream the object through the API, honouring If-None-Match/If-Match and single byte
+    ranges (with If-Range). Size and ETag come from MediaObject, so only the ranged GET
+    reaches storage.
+    """
+    obj = media_metadata.lookup([name], storage).get(name)
+    if obj is None:
+        raise Http404("File not found.")
+
+    not_modified = get_conditional_response(request, etag=obj.etag)
+    if not_modified is not None:
+        return not_modified
+
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if 'Range' in request.headers and (if_range is None or if_range == obj.etag):
+        try:
+            byte_range = parse_range(request.headers['Range'], obj.size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{obj.size}'
+            return response
+
+    if byte_range is None:
+        response = StreamingHttpResponse(storage.open_range(name), content_type=obj.content_type)
+        response['Content-Length'] = obj.size
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(storage.open_range(name, start, end), content_type=obj.content_type, status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{obj.size}'
+        response['Content-Length'] = end - start + 1
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = obj.etag
+    response['Content-Disposition'] = content_disposition_header(as_attachment=True, filename=filename)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -1,6 +1,7 @@
 import io
 from io import BytesIO
 import logging
+import uuid
 from datetime import datetime
 from pathlib import Path
 from django.conf import settings
@@ -13,6 +14,7 @@ from openpyxl.drawing.image import Image as XLImage
 from PIL import Image as PILImage, ImageOps
 from openpyxl.worksheet.pagebreak import Break
 
+from .storage_keys import report_artifact_keys
 from .image_utils import fetch_image_bytes, create_collage_of_images, insert_cmr_sheet, insert_images_in_single_sheet
 
 logger = logging.getLogger(__name__)
@@ -53,11 +55,7 @@ COMMENT_FIELD_MAP = {
 def save_report_to_excel(data, file_path=None, template_path=None):
     if template_path is None:
         template_path = settings.REPORT_PATHS['TEMPLATE_PATH']
-    relative_path, abs_path = get_relative_and_abs_path(
-        file_path,
-        subdir=settings.REPORT_PATHS['EXCEL_SUBDIR'],
-        ext="xlsx"
-    )
+    relative_path, abs_path = get_relative_and_abs_path(file_path, report_id=data.get('id'), ext="xlsx")
     items = data.get("items", [])
     extra_rows = max(0, len(items) - ITEMS_PER_PAGE)
 
@@ -487,9 +485,7 @@ def autofit_row_height(ws, cell, text, multiplier=14):
     ws.row_dimensions[row_num].height = max(15, total_lines * multiplier)
 
 
-def get_relative_and_abs_path(file_path=None, subdir="delivery_reports_excel", ext="xlsx"):
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
+def get_relative_and_abs_path(file_path=None, report_id=None, ext="xlsx"):
     if file_path:
         # If file_path is provided, use it as relative path
         if isinstance(file_path, Path):
@@ -499,8 +495,9 @@ def get_relative_and_abs_path(file_path=None, subdir="delivery_reports_excel", e
         # For S3, we don't need absolute paths
         abs_path = relative_path
     else:
-        # Generate new filename
-        relative_path = f"{subdir}/delivery_report_{timestamp}.{ext}"
+        # Generate a new, collision-free filename under the report's artifact prefix
+        keys = report_artifact_keys(report_id, f"x{uuid.uuid4().hex[:12]}")
+        relative_path = keys['pdf' if ext == 'pdf' else 'excel']
         abs_path = relative_path
 
     return relative_path, abs_path
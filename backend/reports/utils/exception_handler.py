@@ -25,6 +25,9 @@ def custom_exception_handler(exc, context):
                             messages.append(f"{prefix}{key} {idx}: {msg}")
                 elif isinstance(value, dict):
                     messages.extend(flatten_errors(value, f"{prefix}{key} "))
+                else:
+                    # ValidationError({field: "message"}) raised outside of field validation
+                    messages.append(f"{prefix}{key}: {value}")
             return messages
 
         if isinstance(response.data, dict):
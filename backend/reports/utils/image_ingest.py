@@ -0,0 +1,145 @@
+import io
+import os
+import posixpath
+import logging
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from PIL import Image as PILImage, ImageOps
+
+from .storage_keys import upload_category
+
+logger = logging.getLogger(__name__)
+
+# GIFs may be animated, everything else is re-encoded
+NORMALIZED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tiff', '.tif'}
+FORMAT_EXTENSIONS = {'JPEG': '.jpg', 'WEBP': '.webp', 'PNG': '.png'}
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+def should_normalize(name):
+    """Only report images are normalized; logos and generated files are stored as they come."""
+    config = settings.IMAGE_INGEST
+    return (config['ENABLED'] and os.path.splitext(name)[1].lower() in NORMALIZED_EXTENSIONS
+            and upload_category(name) is not None)
+
+
+def original_name_for(name):
+    """Key under which the untouched upload is kept when KEEP_ORIGINAL is on."""
+    return posixpath.join(posixpath.dirname(name), 'originals', posixpath.basename(name))
+
+
+def thumbnail_name_for(name, size):
+    """Key of the `size` px thumbnail of `name`, stored next to it."""
+    stem = os.path.splitext(posixpath.basename(name))[0]
+    return posixpath.join(posixpath.dirname(name), 'thumbs', str(size), f'{stem}.jpg')
+
+
+def make_thumbnails(img, sizes=None):
+    """JPEG thumbnails of an upright image for each of `sizes`, IMAGE_INGEST['THUMBNAIL_SIZES'] by default."""
+    config = settings.IMAGE_INGEST
+    sizes = config['THUMBNAIL_SIZES'] if sizes is None else sizes
+    thumbnails = {}
+    for size in sorted(sizes, reverse=True):
+        # Each size is reduced from the previous, larger one
+        img = img.copy()
+        img.thumbnail((size, size), PILImage.LANCZOS)
+        if img.mode in ('RGBA', 'LA', 'P'):
+            background = PILImage.new('RGB', img.size, (255, 255, 255))
+            rgba = img.convert('RGBA')
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            img = background
+        output = io.BytesIO()
+        img.convert('RGB').save(output, format='JPEG', quality=config['THUMBNAIL_QUALITY'], optimize=True)
+        thumbnails[size] = ContentFile(output.getvalue(), name=f'{size}.jpg')
+    return thumbnails
+
+
+def normalize_image(name, content):
+    """
+    Apply the EXIF orientation, cap the long edge at IMAGE_INGEST['MAX_EDGE'] and re-encode.
+    Returns (name, content, stats, thumbnails); the input is returned unchanged when re-encoding
+    would not help. Thumbnails are only made here with IMAGE_INGEST['THUMBNAILS_AT_UPLOAD'], reduced
+    from the already decoded image; otherwise thumbnails.ensure_thumbnail() renders them on first use.
+    Images over IMAGE_INGEST['MAX_PIXELS'] raise ImageTooLarge before anything is decoded.
+    """
+    config = settings.IMAGE_INGEST
+    max_edge = config['MAX_EDGE']
+
+    content.seek(0)
+    original_size = content.size
+    # Pillow only reads the header here and decodes from the file later, so the upload is
+    # never copied into memory as a whole
+    with PILImage.open(content) as img:
+        original_dims = img.size
+        if original_dims[0] * original_dims[1] > config['MAX_PIXELS']:
+            raise ImageTooLarge(f"{original_dims[0]}x{original_dims[1]} px is over IMAGE_INGEST['MAX_PIXELS']")
+        rotated = img.getexif().get(0x0112, 1) != 1
+        if img.format == 'JPEG':
+            # Let the decoder do a cheap DCT downscale before the real resize
+            img.draft('RGB', (max_edge, max_edge))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_edge, max_edge), PILImage.LANCZOS)
+        resized = max(original_dims) > max_edge
+        thumbnails = make_thumbnails(img) if config['THUMBNAILS_AT_UPLOAD'] else {}
+
+        has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+        target_format = 'PNG' if has_alpha and config['FORMAT'] == 'JPEG' else config['FORMAT']
+
+        # Stays in memory up to MEMORY_PER_FILE and spills to disk beyond that
+        output = tempfile.SpooledTemporaryFile(max_size=config['MEMORY_PER_FILE'])
+        if target_format == 'PNG':
+            img.convert('RGBA').save(output, format='PNG', optimize=True)
+        elif target_format == 'WEBP':
+            img.save(output, format='WEBP', quality=config['QUALITY'], method=4)
+        else:
+            img.convert('RGB').save(output, format='JPEG', quality=config['QUALITY'], optimize=True, progressive=True)
+
+    normalized_size = output.tell()
+    if normalized_size >= original_size and not (rotated or resized):
+        # Already small and upright, keep the upload as it is
+        output.close()
+        content.seek(0)
+        stats = {'original_bytes': original_size, 'stored_bytes': original_size, 'saved_bytes': 0}
+        return name, content, stats, thumbnails
+
+    new_name = os.path.splitext(name)[0] + FORMAT_EXTENSIONS[target_format]
+    output.seek(0)
+    stats = {
+        'original_bytes': original_size,
+        'stored_bytes': normalized_size,
+        'saved_bytes': original_size - normalized_size,
+    }
+    return new_name, File(output, name=posixpath.basename(new_name)), stats, thumbnails
+
+
+def normalize_upload(name, content, keep_original):
+    """
+    Normalize an image on its way into storage. `keep_original(name, content)` is called with
+    the untouched upload when IMAGE_INGEST['KEEP_ORIGINAL'] is on.
+    Returns (name, content, thumbnails, original_size), thumbnails being a {size: content} dict
+    and original_size the size of the upload, or None when it was not normalized.
+    """
+    if not should_normalize(name):
+        return name, content, {}, None
+
+    try:
+        new_name, new_content, stats, thumbnails = normalize_image(name, content)
+    except Exception as e:
+        logger.warning(f"Image normalization skipped for {name}: {e}")
+        content.seek(0)
+        return name, content, {}, None
+
+    if new_content is not content and settings.IMAGE_INGEST['KEEP_ORIGINAL']:
+        content.seek(0)
+        keep_original(original_name_for(name), content)
+
+    logger.info(
+        f"Ingested {new_name}: {stats['original_bytes']} -> {stats['stored_bytes']} bytes "
+        f"(saved {stats['saved_bytes']} bytes)"
+    )
+    return new_name, new_content, thumbnails, stats['original_bytes']
@@ -14,6 +14,8 @@ import concurrent.futures
 from concurrent.futures import ThreadPoolExecutor
 import functools
 
+from . import media_spool
+
 # max allowed image size to prevent DoS attacks
 PILImage.MAX_IMAGE_PIXELS = 50000000
 
@@ -235,7 +237,10 @@ def fetch_image_bytes(url):
     Fetch image bytes from S3 if the URL is an S3 object, else use requests.
     """
     try:
-        if url.startswith("s3://"):
+        spooled = media_spool.read_url(url)
+        if spooled is not None:
+            content = spooled
+        elif url.startswith("s3://"):
             s3 = boto3.client("s3")
             parsed = urlparse(url)
             bucket = parsed.netloc
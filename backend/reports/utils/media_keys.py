@@ -0,0 +1,86 @@
+import logging
+
+from django.core import signing
+
+from .private_storage import PrivateMediaStorage
+from .user_utils import accessible_location_ids
+
+logger = logging.getLogger(__name__)
+
+KEY_SALT = 'reports.media_keys'
+
+# Largest number of keys presigned in one request
+MAX_BATCH_SIZE = 100
+
+
+def make_key(field_file):
+    """
+    Opaque key for a report image. It names the report the image belongs to, so access
+    can be checked when the key is exchanged for a URL. Keys are deterministic and do not
+    expire; the presigned URLs they are exchanged for do.
+    """
+    instance = field_file.instance
+    report_id = getattr(instance, 'delivery_report_id', None) or instance.pk
+    return signing.Signer(salt=KEY_SALT).sign_object({'r': report_id, 'n': field_file.name}, compress=True)
+
+
+def parse_key(key):
+    """Return (report_id, storage name) of a key, or None if it was not issued by us."""
+    try:
+        payload = signing.Signer(salt=KEY_SALT).unsign_object(key)
+        return int(payload['r']), str(payload['n'])
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+
+def presign_keys(keys, user):
+    """
+    Map each key to a presigned URL, or to None when the key is invalid or points at a
+    report outside the user's locations.
+    """
+    parsed = {key: parse_key(key) for key in keys}
+    allowed = accessible_report_ids({ref[0] for ref in parsed.values() if ref}, user)
+
+    presigned = PresignedUrlCache()
+    return {
+        key: presigned.get(ref[1]) if ref is not None and ref[0] in allowed else None
+        for key, ref in parsed.items()
+    }
+
+
+def resolve_key(key, user):
+    """Storage name a key points at, or None when it is invalid or outside the user's locations."""
+    ref = parse_key(key)
+    if ref is None or ref[0] not in accessible_report_ids({ref[0]}, user):
+        return None
+    return ref[1]
+
+
+def accessible_report_ids(report_ids, user):
+    from ..models import DeliveryReport
+
+    reports = DeliveryReport.objects.filter(id__in=report_ids)
+    location_ids = accessible_location_ids(user)
+    if location_ids is not None:
+        reports = reports.filter(location_id__in=location_ids)
+    return set(reports.values_list('id', flat=True))
+
+
+class PresignedUrlCache:
+    """
+    Presigned URLs for a batch of reports, signed on first use with a single storage client
+    and without the per-object HEAD request `PrivateMediaStorage.url()` makes.
+    """
+
+    def __init__(self):
+        self.storage = PrivateMediaStorage()
+        self.urls = {}
+
+    def get(self, name):
+        if name not in self.urls:
+            try:
+                self.urls[name] = self.storage.presign(name)
+            except Exception as e:
+                logger.error(f"Could not presign {name}: {e}")
+                self.urls[name] = None
+        return self.urls[name]
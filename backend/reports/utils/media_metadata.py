@@ -0,0 +1,103 @@
+import hashlib
+import logging
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+def guess_content_type(name, default='application/octet-stream'):
+    return mimetypes.guess_type(name)[0] or default
+
+
+def describe(name, content):
+    """
+    Size, ETag and content type of `content` as stored under `name`. The ETag is the quoted
+    MD5 of the content, which is what S3 reports for objects uploaded in a single part.
+    """
+    digest = hashlib.md5(usedforsecurity=False)
+    size = 0
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks() if hasattr(content, 'chunks') else iter(lambda: content.read(64 * 1024), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return {'size': size, 'etag': f'"{digest.hexdigest()}"', 'content_type': guess_content_type(name)}
+
+
+def record(name, content, thumbnails=()):
+    record_many({name: {**describe(name, content), 'thumbnails': sorted(thumbnails)}})
+
+
+def record_many(entries):
+    """Store {name: metadata} (as returned by PrivateMediaStorage.save_with_metadata) in one query."""
+    from ..models import MediaObject
+
+    if not entries:
+        return
+    try:
+        with transaction.atomic():
+            MediaObject.objects.bulk_create(
+                [MediaObject(name=name, **metadata) for name, metadata in entries.items()],
+                update_conflicts=True,
+                unique_fields=['name'],
+                update_fields=['size', 'etag', 'content_type', 'thumbnails', 'original_size'],
+            )
+    except Exception as e:
+        # Metadata is an optimization; lookup() backfills whatever is missing
+        logger.warning(f"Could not record metadata of {', '.join(sorted(entries))}: {e}")
+
+
+def forget(name):
+    """Drop the metadata of `name` and return the thumbnail sizes it had."""
+    from ..models import MediaObject
+
+    thumbnails = MediaObject.objects.filter(name=name).values_list('thumbnails', flat=True).first()
+    MediaObject.objects.filter(name=name).delete()
+    return thumbnails or []
+
+
+def add_thumbnail(name, size):
+    from ..models import MediaObject
+
+    with transaction.atomic():
+        obj = MediaObject.objects.select_for_update().filter(name=name).first()
+        if obj is not None and size not in obj.thumbnails:
+            obj.thumbnails = sorted(obj.thumbnails + [size])
+            obj.save(update_fields=['thumbnails'])
+
+
+def lookup(names, storage):
+    """
+    {name: MediaObject} for `names`. Objects stored before metadata was recorded are looked
+    up in storage once, concurrently, and recorded; names that don't exist are left out.
+    """
+    from ..models import MediaObject
+
+    names = set(filter(None, names))
+    known = {obj.name: obj for obj in MediaObject.objects.filter(name__in=names)}
+    missing = sorted(names - set(known))
+    if not missing:
+        return known
+
+    workers = min(settings.IMAGE_CONFIG['MAX_WORKERS'], len(missing))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        heads = list(executor.map(lambda name: _head(storage, name), missing))
+
+    found = [MediaObject(name=name, **head) for name, head in zip(missing, heads) if head]
+    MediaObject.objects.bulk_create(found, ignore_conflicts=True)
+    known.update({obj.name: obj for obj in found})
+    return known
+
+
+def _head(storage, name):
+    try:
+        return storage.head(name)
+    except Exception as e:
+        logger.error(f"Could not read metadata of {name}: {e}")
+        return None
@@ -0,0 +1,216 @@
+import os
+import time
+import logging
+import tempfile
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.urls import reverse
+from django.utils._os import safe_join
+
+logger = logging.getLogger(__name__)
+
+URL_SALT = 'reports.media_spool'
+
+
+def is_enabled():
+    return bool(settings.MEDIA_WRITE_BEHIND['ENABLED'])
+
+
+def _objects_dir():
+    return os.path.join(settings.MEDIA_WRITE_BEHIND['SPOOL_DIR'], 'objects')
+
+
+def _tmp_dir():
+    return os.path.join(settings.MEDIA_WRITE_BEHIND['SPOOL_DIR'], 'tmp')
+
+
+def spool_path(name):
+    return safe_join(_objects_dir(), name)
+
+
+def contains(name):
+    if not name:
+        return False
+    try:
+        return os.path.isfile(spool_path(name))
+    except Exception:
+        return False
+
+
+def save(name, content):
+    """
+    Durably write `content` to the spool under `name`. The data is fsync'ed to a temporary file
+    first and then renamed into place, so the replicator never sees a partial object.
+    """
+    path = spool_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.makedirs(_tmp_dir(), exist_ok=True)
+
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    fd, tmp_path = tempfile.mkstemp(dir=_tmp_dir())
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            chunks = content.chunks() if hasattr(content, 'chunks') else iter(lambda: content.read(64 * 1024), b'')
+            for chunk in chunks:
+                f.write(chunk if isinstance(chunk, bytes) else chunk.encode())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return name
+
+
+def open_file(name, mode='rb'):
+    return File(open(spool_path(name), mode), name=name)
+
+
+def size(name):
+    return os.path.getsize(spool_path(name))
+
+
+def discard(name):
+    try:
+        os.remove(spool_path(name))
+    except FileNotFoundError:
+        pass
+
+
+def url(name):
+    """Signed, expiring URL of a spooled object (served by the `spooled_media` view)."""
+    token = signing.dumps(name, salt=URL_SALT)
+    return reverse('spooled-media', kwargs={'token': token})
+
+
+def name_from_token(token):
+    return signing.loads(token, salt=URL_SALT, max_age=settings.MEDIA_WRITE_BEHIND['URL_EXPIRY_SECONDS'])
+
+
+def read_url(url):
+    """
+    Return the bytes of a spooled object if `url` points at the spool view, else None.
+    Used by report generation so it does not fetch its own server over HTTP.
+    """
+    if not url:
+        return None
+    prefix = reverse('spooled-media', kwargs={'token': 'TOKEN'}).split('TOKEN')[0]
+    path = urlparse(url).path
+    if not path.startswith(prefix):
+        return None
+    try:
+        name = name_from_token(path[len(prefix):].strip('/'))
+        with open_file(name) as f:
+            return f.read()
+    except (signing.BadSignature, FileNotFoundError) as e:
+        logger.warning(f"Spooled media for {url} is not available: {e}")
+        return None
+
+
+def iter_spooled_names():
+    root = _objects_dir()
+    for dirpath, _dirnames, filenames in os.walk(root):
+        for filename in filenames:
+            full_path = os.path.join(dirpath, filename)
+            yield os.path.relpath(full_path, root).replace(os.sep, '/')
+
+
+def replication_stats():
+    """Backlog size and replication lag (age of the oldest object still in the spool)."""
+    count = 0
+    total_bytes = 0
+    oldest_mtime = None
+    for name in iter_spooled_names():
+        try:
+            stat = os.stat(spool_path(name))
+        except FileNotFoundError:
+            continue
+        count += 1
+        total_bytes += stat.st_size
+        if oldest_mtime is None or stat.st_mtime < oldest_mtime:
+            oldest_mtime = stat.st_mtime
+    return {
+        'backlog_objects': count,
+        'backlog_bytes': total_bytes,
+        'lag_seconds': round(time.time() - oldest_mtime, 1) if oldest_mtime else 0.0,
+    }
+
+
+class LocalReplicationTarget:
+    """A local directory standing in for S3."""
+
+    def __init__(self, location):
+        self.storage = FileSystemStorage(location=location, allow_overwrite=True)
+
+    def push(self, name, content):
+        self.storage.save(name, content)
+
+
+class S3ReplicationTarget:
+    def __init__(self):
+        from .private_storage import PrivateMediaStorage
+        self.storage = PrivateMediaStorage()
+
+    def push(self, name, content):
+        self.storage.save_remote(name, content)
+
+
+def get_replication_target():
+    target_dir = settings.MEDIA_WRITE_BEHIND['TARGET_DIR']
+    if target_dir:
+        return LocalReplicationTarget(target_dir)
+    return S3ReplicationTarget()
+
+
+class Replicator:
+    """
+    Push spooled objects to the replication target, retrying failures with exponential backoff.
+    An object is removed from the spool only if it was not rewritten while it was being pushed.
+    """
+
+    def __init__(self, target=None):
+        self.target = target or get_replication_target()
+        self.failures = {}  # name -> (attempts, next attempt timestamp)
+
+    def run_once(self, limit=None):
+        limit = limit or settings.MEDIA_WRITE_BEHIND['BATCH_SIZE']
+        replicated = failed = 0
+        now = time.time()
+        for name in iter_spooled_names():
+            if replicated + failed >= limit:
+                break
+            attempts, retry_at = self.failures.get(name, (0, 0))
+            if retry_at > now:
+                continue
+            if self._push(name):
+                self.failures.pop(name, None)
+                replicated += 1
+            else:
+                backoff = settings.MEDIA_WRITE_BEHIND['RETRY_BACKOFF_SECONDS'] * (2 ** min(attempts, 6))
+                self.failures[name] = (attempts + 1, now + backoff)
+                failed += 1
+        return replicated, failed
+
+    def _push(self, name):
+        path = spool_path(name)
+        try:
+            before = os.stat(path)
+            with open(path, 'rb') as f:
+                self.target.push(name, f)
+            after = os.stat(path)
+        except FileNotFoundError:
+            # Deleted while we were working on it
+            return True
+        except Exception as e:
+            logger.error(f"Replication of {name} failed: {e}")
+            return False
+
+        if (before.st_mtime_ns, before.st_size) == (after.st_mtime_ns, after.st_size):
+            discard(name)
+        return True
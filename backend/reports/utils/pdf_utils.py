@@ -9,7 +9,7 @@ from django.conf import settings
 logger = logging.getLogger(__name__)
 
 
-def convert_excel_to_pdf(excel_path):
+def convert_excel_to_pdf(excel_path, target_path=None):
     excel_path = Path(excel_path)
     pdf_filename = excel_path.with_suffix('.pdf').name
     with tempfile.TemporaryDirectory() as tmpdir:
@@ -39,7 +39,7 @@ def convert_excel_to_pdf(excel_path):
                 f"Stdout: {result.stdout.decode(errors='replace')}\n"
                 f"Stderr: {result.stderr.decode(errors='replace')}"
             )
-        s3_relative_path = f"{settings.REPORT_PATHS['PDF_SUBDIR']}/{pdf_filename}"
+        s3_relative_path = target_path or f"{settings.REPORT_PATHS['PDF_SUBDIR']}/{pdf_filename}"
         with open(pdf_path, "rb") as f:
             default_storage.save(s3_relative_path, ContentFile(f.read()))
     return default_storage.url(s3_relative_path)
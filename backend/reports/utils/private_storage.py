@@ -1,19 +1,159 @@
 from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
 import boto3
 from django.conf import settings
+from django.core.files import File
+from django.core.files.utils import validate_file_name
+from django.utils.http import content_disposition_header
 from botocore.exceptions import ClientError
 
+from . import media_spool, media_metadata
+from .image_ingest import normalize_upload, thumbnail_name_for
+
+# Lifetime of the presigned GET URLs handed out by `url()`
+PRESIGNED_URL_EXPIRY = 3600
+
 class PrivateMediaStorage(S3Boto3Storage):
     default_acl = 'private'
     custom_domain = False
 
+    def _save(self, name, content):
+        name, metadata = self._ingest(name, content)
+        media_metadata.record_many({name: metadata})
+        return name
+
+    def save_with_metadata(self, name, content, max_length=None):
+        """
+        `save()` that returns (name, metadata) and leaves the MediaObject row to the caller.
+        Touches only storage, so it is safe to run in a thread pool (see StorageWriteBatch).
+        """
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        validate_file_name(name, allow_relative_path=True)
+        name = self.get_available_name(name, max_length=max_length)
+        validate_file_name(name, allow_relative_path=True)
+        name, metadata = self._ingest(name, content)
+        validate_file_name(name, allow_relative_path=True)
+        return name, metadata
+
+    def _ingest(self, name, content):
+        name, stored, thumbnails, original_size = normalize_upload(name, content, keep_original=self._store)
+        try:
+            name = self._store(name, stored)
+            for size, thumbnail in thumbnails.items():
+                self._store(thumbnail_name_for(name, size), thumbnail)
+            metadata = media_metadata.describe(name, stored)
+        finally:
+            if stored is not content:
+                # The re-encoded image may have spilled to a temporary file
+                stored.close()
+        return name, {**metadata, 'thumbnails': sorted(thumbnails), 'original_size': original_size}
+
+    def _store(self, name, content):
+        if media_spool.is_enabled():
+            # Write-behind: keep the upload locally, `replicate_media` pushes it to S3
+            return media_spool.save(clean_name(name), content)
+        return super()._save(name, content)
+
+    def save_variant(self, name, content):
+        """Store a derived object such as a thumbnail as it is, without normalizing it."""
+        return self._store(name, content)
+
+    def save_remote(self, name, content):
+        """Write straight to S3, bypassing the write-behind spool."""
+        return super()._save(name, content)
+
+    def _open(self, name, mode='rb'):
+        if media_spool.contains(name):
+            try:
+                return media_spool.open_file(name, mode)
+            except FileNotFoundError:
+                pass  # replicated in the meantime
+        return super()._open(name, mode)
+
+    def exists(self, name):
+        return media_spool.contains(name) or super().exists(name)
+
+    def size(self, name):
+        if media_spool.contains(name):
+            try:
+                return media_spool.size(name)
+            except FileNotFoundError:
+                pass
+        return super().size(name)
+
+    def delete(self, name):
+        media_spool.discard(name)
+        super().delete(name)
+        for size in media_metadata.forget(name):
+            thumbnail = thumbnail_name_for(name, size)
+            media_spool.discard(thumbnail)
+            super().delete(thumbnail)
+
+    def head(self, name):
+        """Size, ETag and content type of an object, or None if it does not exist."""
+        if media_spool.contains(name):
+            try:
+                with media_spool.open_file(name) as f:
+                    return media_metadata.describe(name, f)
+            except FileNotFoundError:
+                pass
+        try:
+            response = self._client().head_object(Bucket=self.bucket_name, Key=name)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                return None
+            raise
+        return {
+            'size': response['ContentLength'],
+            'etag': response.get('ETag', ''),
+            'content_type': response.get('ContentType') or media_metadata.guess_content_type(name),
+        }
+
+    def _client(self):
+        if getattr(self, '_presign_client', None) is None:
+            self._presign_client = boto3.client(
+                's3',
+                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                region_name=settings.AWS_S3_REGION_NAME,
+            )
+        return self._presign_client
+
+    def presign(self, name, expires_in=PRESIGNED_URL_EXPIRY, filename=None):
+        """
+        Presigned GET URL without the existence check `url()` makes. Signing is local,
+        so this costs no request to S3. With `filename`, S3 serves the object as an
+        attachment of that name.
+        """
+        if media_spool.contains(name):
+            return media_spool.url(name)
+        params = {'Bucket': self.bucket_name, 'Key': name}
+        if filename:
+            params['ResponseContentDisposition'] = content_disposition_header(as_attachment=True, filename=filename)
+        return self._client().generate_presigned_url('get_object', Params=params, ExpiresIn=expires_in)
+
+    def open_range(self, name, start=None, end=None, chunk_size=64 * 1024):
+        """
+        Iterator over the bytes `start`..`end` (inclusive) of an object, or all of it. The
+        object is requested right away, so a missing object fails here rather than mid-response.
+        """
+        if media_spool.contains(name):
+            try:
+                return _iter_file(media_spool.open_file(name), start, end, chunk_size)
+            except FileNotFoundError:
+                pass
+        params = {'Bucket': self.bucket_name, 'Key': name}
+        if start is not None:
+            params['Range'] = f'bytes={start}-{end}'
+        body = self._client().get_object(**params)['Body']
+        return _iter_body(body, chunk_size)
+
     def url(self, name):
-        client = boto3.client(
-            's3',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name=settings.AWS_S3_REGION_NAME,
-        )
+        if media_spool.contains(name):
+            return media_spool.url(name)
+
+        client = self._client()
 
         try:
             # HEAD request to check if the object exists
@@ -31,5 +171,28 @@ class PrivateMediaStorage(S3Boto3Storage):
         return client.generate_presigned_url(
             'get_object',
             Params={'Bucket': self.bucket_name, 'Key': name},
-            ExpiresIn=3600,  # 1 hour
-        )
\ No newline at end of file
+            ExpiresIn=PRESIGNED_URL_EXPIRY,
+        )
+
+
+def _iter_file(f, start, end, chunk_size):
+    with f:
+        if start is not None:
+            f.seek(start)
+            remaining = end - start + 1
+        else:
+            remaining = None
+        while remaining is None or remaining > 0:
+            chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+def _iter_body(body, chunk_size):
+    try:
+        yield from body.iter_chunks(chunk_size)
+    finally:
+        body.close()
@@ -0,0 +1,171 @@
+import io
+
+from django.conf import settings
+from PIL import Image as PILImage, ImageDraw
+
+from .digest_utils import A4_INCHES, ALERT, MUTED, RULE, TEXT, fit_text, load_font
+from .excel_utils import CELL_MAP, COMMENT_FIELD_MAP, ITEMS_PER_PAGE, STATUS_FIELDS
+from .table_export import STATUS_FIELDS as STATUS_LABELS
+
+FIELD_LABELS = {
+    'supplier_name': "Supplier",
+    'delivery_slip_number': "Delivery slip",
+    'logistic_company': "Logistic company",
+    'container_number': "Container",
+    'licence_plate_truck': "Truck plate",
+    'licence_plate_trailer': "Trailer plate",
+    'weather_conditions': "Weather",
+}
+STATUS_COLUMNS = ("Yes", "No", "N/A")
+IMAGES_PER_BAND = 3
+
+
+class ReportPreviewRenderer:
+    """
+    Draws the first page of a report as a low resolution PNG, laid out like the Excel template:
+    header, the CELL_MAP fields next to the items, the status table with ticks and comments,
+    the two image bands and the signature line. Works from the same prepared report data as
+    save_report_to_excel, with the images already decoded.
+    """
+
+    def __init__(self):
+        dpi = settings.REPORT_PREVIEW['DPI']
+        self.size = (round(A4_INCHES[0] * dpi), round(A4_INCHES[1] * dpi))
+        self.margin = round(0.35 * dpi)
+        scale = dpi / 100
+        self.font = load_font(max(round(10 * scale), 7))
+        self.bold = load_font(max(round(10 * scale), 7), bold=True)
+        self.heading = load_font(max(round(15 * scale), 9), bold=True)
+        self.line = max(round(15 * scale), 9)
+
+    @property
+    def content_width(self):
+        return self.size[0] - 2 * self.margin
+
+    def band_cell_size(self):
+        """Size of one image in a band, so images can be decoded straight to it."""
+        width = self.content_width // IMAGES_PER_BAND - 6
+        return width, round(width * 0.7)
+
+    def signature_size(self):
+        return round(self.content_width * 0.3), self.line * 3
+
+    def render(self, data, gsc_images, base_images, signature):
+        """PNG bytes of the page. Image arguments are PIL images (or None where missing)."""
+        img = PILImage.new('RGB', self.size, 'white')
+        draw = ImageDraw.Draw(img)
+        y = self._header(draw, data)
+        y = self._fields_and_items(draw, data, y)
+        y = self._status_table(draw, data, y)
+        y = self._band(img, draw, y, "Goods, seal and container", gsc_images)
+        y = self._band(img, draw, y, "Licence plates and proof of delivery", base_images)
+        self._footer(img, draw, data, signature)
+
+        output = io.BytesIO()
+        img.save(output, 'PNG', optimize=True)
+        return output.getvalue()
+
+    def _header(self, draw, data):
+        m, width = self.margin, self.content_width
+        title = fit_text(draw, data.get('location') or "", self.heading, width * 0.6)
+        draw.text((m, m), title, font=self.heading, fill=TEXT)
+        client = fit_text(draw, data.get('location_client_name') or "", self.font, width * 0.35)
+        draw.text((m + width - draw.textlength(client, font=self.font), m), client, font=self.font, fill=MUTED)
+        y = m + round(self.line * 1.8)
+        draw.line((m, y, m + width, y), fill=TEXT, width=2)
+        return y + self.line // 2
+
+    def _fields_and_items(self, draw, data, y):
+        m, half = self.margin, self.content_width // 2
+        label_width = round(half * 0.4)
+        top = y
+        for key in CELL_MAP:
+            if key not in FIELD_LABELS:
+                continue
+            draw.text((m, y), FIELD_LABELS[key], font=self.font, fill=MUTED)
+            draw.text((m + label_width, y), fit_text(draw, data.get(key), self.font, half - label_width - 8),
+                      font=self.font, fill=TEXT)
+            y += self.line
+
+        items = data.get('items') or []
+        x, item_y = m + half, top
+        for entry in items[:ITEMS_PER_PAGE]:
+            draw.text((x, item_y), fit_text(draw, entry['item']['name'], self.font, half * 0.75),
+                      font=self.font, fill=TEXT)
+            quantity = str(entry['quantity'])
+            draw.text((m + self.content_width - draw.textlength(quantity, font=self.font), item_y), quantity,
+                      font=self.font, fill=TEXT)
+            item_y += self.line
+        if len(items) > ITEMS_PER_PAGE:
+            draw.text((x, item_y), f"+ {len(items) - ITEMS_PER_PAGE} more items", font=self.font, fill=MUTED)
+            item_y += self.line
+        return max(y, item_y) + self.line // 2
+
+    def _status_table(self, draw, data, y):
+        m, width = self.margin, self.content_width
+        labels = dict(STATUS_LABELS)
+        check_width = round(width * 0.07)
+        columns_x = [m + round(width * 0.38) + i * check_width for i in range(len(STATUS_COLUMNS))]
+        comment_x = columns_x[-1] + check_width
+
+        for x, title in zip(columns_x, STATUS_COLUMNS):
+            draw.text((x, y), title, font=self.bold, fill=TEXT)
+        draw.text((comment_x, y), "Comment", font=self.bold, fill=TEXT)
+        y += self.line
+        draw.line((m, y - 2, m + width, y - 2), fill=RULE)
+
+        for field in STATUS_FIELDS:
+            value = data.get(field)
+            draw.text((m, y), fit_text(draw, labels[field.removesuffix('_status')], self.font, columns_x[0] - m - 6),
+                      font=self.font, fill=TEXT)
+            column = {True: 0, False: 1, None: 2}[value]
+            self._tick(draw, columns_x[column], y, ALERT if value is False else TEXT)
+            comment = data.get(COMMENT_FIELD_MAP[field])
+            draw.text((comment_x, y), fit_text(draw, comment, self.font, m + width - comment_x),
+                      font=self.font, fill=MUTED)
+            y += self.line
+        return y + self.line // 2
+
+    def _tick(self, draw, x, y, fill):
+        # Drawn rather than typed, so it does not depend on the font having a check mark
+        size = self.line * 0.6
+        top = y + self.line * 0.15
+        draw.line((
+            (x + size * 0.1, top + size * 0.5),
+            (x + size * 0.4, top + size * 0.85),
+            (x + size * 0.95, top + size * 0.05),
+        ), fill=fill, width=max(round(self.line / 8), 1))
+
+    def _band(self, img, draw, y, title, images):
+        m = self.margin
+        draw.text((m, y), title, font=self.bold, fill=TEXT)
+        y += self.line
+        cell_w, cell_h = self.band_cell_size()
+        pitch = self.content_width // IMAGES_PER_BAND
+        for i, thumb in enumerate(images[:IMAGES_PER_BAND]):
+            x = m + i * pitch
+            if thumb is None:
+                draw.rectangle((x, y, x + cell_w, y + cell_h), outline=RULE)
+                continue
+            img.paste(thumb, (x + (cell_w - thumb.width) // 2, y + (cell_h - thumb.height) // 2))
+        if not images:
+            draw.text((m, y), "No images", font=self.font, fill=MUTED)
+            return y + self.line * 2
+        return y + cell_h + self.line // 2
+
+    def _footer(self, img, draw, data, signature):
+        m, width = self.margin, self.content_width
+        sig_w, sig_h = self.signature_size()
+        y = self.size[1] - m - sig_h
+        draw.line((m, y - 4, m + width, y - 4), fill=RULE)
+        draw.text((m, y), "Inspector", font=self.font, fill=MUTED)
+        draw.text((m, y + self.line), fit_text(draw, data.get('user'), self.font, width * 0.3),
+                  font=self.font, fill=TEXT)
+        sig_x = m + round(width * 0.35)
+        if signature is not None:
+            img.paste(signature, (sig_x, y))
+        else:
+            draw.rectangle((sig_x, y, sig_x + sig_w, y + sig_h), outline=RULE)
+        date_x = m + round(width * 0.75)
+        draw.text((date_x, y), "Date", font=self.font, fill=MUTED)
+        draw.text((date_x, y + self.line), data.get('date') or "", font=self.font, fill=TEXT)
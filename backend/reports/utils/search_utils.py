@@ -0,0 +1,44 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F
+
+# Text search configuration of DeliveryReport.search_vector (see migration 0024). 'simple' only
+# lowercases, which suits plates, container and slip numbers and mixed-language comments.
+SEARCH_CONFIG = 'simple'
+
+MAX_TERMS = 10
+
+
+class SearchNotSupported(Exception):
+    pass
+
+
+def is_supported():
+    return connection.vendor == 'postgresql'
+
+
+def build_search_query(text):
+    """
+    Prefix query over the words of `text`, so fragments like "CA12" or "scratch" match
+    "CA1234AB" and "scratched". Returns None when there is nothing to search for.
+    """
+    terms = re.findall(r'\w+', text or '')[:MAX_TERMS]
+    if not terms:
+        return None
+    # \w+ terms contain none of the tsquery operators, so they are safe in a raw query
+    raw = ' & '.join(f'{term.lower()}:*' for term in terms)
+    return SearchQuery(raw, search_type='raw', config=SEARCH_CONFIG)
+
+
+def search_reports(queryset, text):
+    """Reports matching `text` through the GIN-indexed search vector, best matches first."""
+    if not is_supported():
+        raise SearchNotSupported("Full-text search requires PostgreSQL.")
+    query = build_search_query(text)
+    if query is None:
+        return queryset.none()
+    return queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query)
+    ).order_by('-rank', '-created_at', '-id')
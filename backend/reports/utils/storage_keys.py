@@ -0,0 +1,67 @@
+import hashlib
+import os
+import posixpath
+import uuid
+
+from django.utils.deconstruct import deconstructible
+
+SHARD_WIDTH = 2
+
+
+def shard_for(value):
+    """Short hash prefix that spreads keys evenly over S3 partitions."""
+    return hashlib.sha1(str(value).encode()).hexdigest()[:SHARD_WIDTH]
+
+
+def report_artifact_prefix(report_id):
+    return f"{shard_for(f'report-{report_id}')}/delivery_reports/{report_id}"
+
+
+def report_artifact_keys(report_id, version):
+    """
+    Storage keys for the Excel and PDF artifacts of one report version.
+    Unique per report and version, so parallel generation never overwrites another report.
+    """
+    prefix = report_artifact_prefix(report_id)
+    base = f"delivery_report_{report_id}_v{version}"
+    return {
+        'prefix': prefix,
+        'excel': f"{prefix}/v{version}/{base}.xlsx",
+        'pdf': f"{prefix}/v{version}/{base}.pdf",
+    }
+
+
+def sharded_media_key(category, filename):
+    token = uuid.uuid4().hex
+    ext = os.path.splitext(filename)[1].lower()
+    return f"{shard_for(token)}/{category}/{token}{ext}"
+
+
+def upload_category(name):
+    """Category of a key made by a ShardedUploadTo, i.e. of a report image, or None for any other key."""
+    shard, _, rest = name.partition('/')
+    category = posixpath.dirname(rest)
+    if len(shard) == SHARD_WIDTH and category in ShardedUploadTo.categories:
+        return category
+    return None
+
+
+@deconstructible
+class ShardedUploadTo:
+    """
+    `upload_to` callable producing `<shard>/<category>/<uuid><ext>` keys, so two uploads
+    never share a name and keys do not pile up under a handful of flat prefixes.
+    """
+
+    # Every category a field uploads to, see upload_category()
+    categories = set()
+
+    def __init__(self, category):
+        self.category = category
+        ShardedUploadTo.categories.add(category)
+
+    def __call__(self, instance, filename):
+        return sharded_media_key(self.category, filename)
+
+    def __eq__(self, other):
+        return isinstance(other, ShardedUploadTo) and self.category == other.category
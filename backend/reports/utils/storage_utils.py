@@ -0,0 +1,80 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from . import media_metadata
+
+logger = logging.getLogger(__name__)
+
+
+class StagedFile:
+    """A file queued for upload through a model field's storage."""
+
+    def __init__(self, field, content):
+        self.field = field
+        self.content = content
+        self.name = None
+        self.metadata = None
+
+    @property
+    def storage(self):
+        return self.field.storage
+
+
+class StorageWriteBatch:
+    """
+    Upload all files of a report concurrently, before any row referencing them is inserted.
+    Remembers what was written so it can be removed again if the DB transaction fails.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or settings.UPLOAD_CONFIG['WRITE_WORKERS']
+        self.staged = []
+
+    def add(self, field, content):
+        staged = StagedFile(field, content)
+        self.staged.append(staged)
+        return staged
+
+    def write(self):
+        pending = [staged for staged in self.staged if staged.name is None]
+        if not pending:
+            return
+
+        errors = []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending))) as executor:
+            futures = {executor.submit(self._save, staged): staged for staged in pending}
+            for future, staged in futures.items():
+                try:
+                    staged.name, staged.metadata = future.result()
+                except Exception as e:
+                    logger.error(f"Storage write failed for {getattr(staged.content, 'name', '?')}: {e}")
+                    errors.append(e)
+
+        if errors:
+            self.discard()
+            raise errors[0]
+
+    def record_metadata(self):
+        """
+        Store the MediaObject rows of the written files. The workers only talk to storage, so
+        this runs on the calling thread, inside the transaction inserting the report rows.
+        """
+        media_metadata.record_many({staged.name: staged.metadata for staged in self.staged if staged.name})
+
+    def discard(self):
+        """Delete every object this batch has already written."""
+        for staged in self.staged:
+            if staged.name is None:
+                continue
+            try:
+                staged.storage.delete(staged.name)
+            except Exception as e:
+                logger.error(f"Could not remove orphaned upload {staged.name}: {e}")
+            staged.name = None
+
+    @staticmethod
+    def _save(staged):
+        name = staged.field.generate_filename(None, staged.content.name)
+        return staged.storage.save_with_metadata(name, staged.content, max_length=staged.field.max_length)
@@ -0,0 +1,147 @@
+import csv
+import tempfile
+from collections import defaultdict
+from datetime import datetime
+from itertools import islice
+
+from django.conf import settings
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+FORMULA_PREFIXES = ('=', '+', '-', '@')
+
+STATUS_FIELDS = [
+    ('load_secured', "Load secured"),
+    ('goods_according', "Goods according to slip"),
+    ('packaging', "Packaging"),
+    ('delivery_without_damages', "Delivery without damages"),
+    ('suitable_machines', "Suitable machines"),
+    ('delivery_slip', "Delivery slip"),
+    ('inspection_report', "Inspection report"),
+]
+
+REPORT_FIELDS = [
+    'id', 'created_at', 'location__name', 'supplier', 'supplier_fk__name', 'checking_company',
+    'delivery_slip_number', 'logistic_company', 'container_number', 'licence_plate_truck',
+    'licence_plate_trailer', 'weather_conditions', 'comments', 'damage_description', 'has_damages',
+    'user__username',
+    *[f'{name}_{suffix}' for name, _ in STATUS_FIELDS for suffix in ('status', 'comment')],
+]
+
+HEADERS = [
+    "ID", "Created at", "Location", "Supplier", "Checking company", "Delivery slip number",
+    "Logistic company", "Container number", "Truck licence plate", "Trailer licence plate",
+    "Weather conditions", "Comments",
+    *[header for _, label in STATUS_FIELDS for header in (label, f"{label} comment")],
+    "Damage description", "Has damages", "Items", "Total quantity", "Created by",
+]
+
+
+def _yes_no(value):
+    if value is None:
+        return ""
+    return "Yes" if value else "No"
+
+
+def _row(report, items):
+    created_at = timezone.localtime(report['created_at']).replace(tzinfo=None) if report['created_at'] else None
+    return [
+        report['id'],
+        created_at,
+        report['location__name'] or "",
+        report['supplier_fk__name'] or report['supplier'] or "",
+        report['checking_company'],
+        report['delivery_slip_number'],
+        report['logistic_company'],
+        report['container_number'],
+        report['licence_plate_truck'],
+        report['licence_plate_trailer'],
+        report['weather_conditions'],
+        report['comments'],
+        *[value for name, _ in STATUS_FIELDS
+          for value in (_yes_no(report[f'{name}_status']), report[f'{name}_comment'] or "")],
+        report['damage_description'] or "",
+        _yes_no(report['has_damages']),
+        "; ".join(f"{name} x {quantity}" for name, quantity in items),
+        sum(quantity for _, quantity in items),
+        report['user__username'] or "",
+    ]
+
+
+def export_rows(queryset):
+    """
+    Yield one list of cell values per report of `queryset`, oldest first. Reports are read
+    through a server-side cursor in chunks of REPORT_TABLE_EXPORT['CHUNK_SIZE'], with one
+    query for the items of each chunk, so memory does not grow with the number of reports.
+    """
+    from ..models import DeliveryReportItem
+
+    chunk_size = settings.REPORT_TABLE_EXPORT['CHUNK_SIZE']
+    reports = queryset.order_by('created_at', 'id').values(*REPORT_FIELDS).iterator(chunk_size=chunk_size)
+    while chunk := list(islice(reports, chunk_size)):
+        items = defaultdict(list)
+        for report_id, name, quantity in DeliveryReportItem.objects.filter(
+            delivery_report_id__in=[report['id'] for report in chunk]
+        ).order_by('id').values_list('delivery_report_id', 'item__name', 'quantity'):
+            items[report_id].append((name, quantity))
+        for report in chunk:
+            yield _row(report, items[report['id']])
+
+
+class _Echo:
+    """Pseudo-buffer for csv.writer: hands every written line straight back."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ', timespec='seconds')
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Keep spreadsheet apps from evaluating user text as a formula
+        return "'" + value
+    return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    # BOM so Excel opens the file as UTF-8
+    yield '\ufeff' + writer.writerow(HEADERS)
+    for row in rows:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def _xlsx_value(sheet, value):
+    if not isinstance(value, str):
+        return value
+    value = ILLEGAL_CHARACTERS_RE.sub('', value)
+    if value.startswith('='):
+        # openpyxl would otherwise write it as a formula
+        cell = WriteOnlyCell(sheet, value)
+        cell.data_type = 's'
+        return cell
+    return value
+
+
+def stream_xlsx(rows):
+    """
+    Write the rows with openpyxl's write-only mode, which flushes each row to a temporary
+    file instead of keeping cells in memory, then stream the finished workbook.
+    """
+    chunk_size = settings.MEDIA_ARCHIVE['CHUNK_SIZE']
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Delivery reports")
+    sheet.append(HEADERS)
+    for row in rows:
+        sheet.append([_xlsx_value(sheet, value) for value in row])
+
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        while chunk := f.read(chunk_size):
+            yield chunk
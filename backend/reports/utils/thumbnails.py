@@ -0,0 +1,85 @@
+import logging
+
+from django.conf import settings
+from PIL import Image as PILImage, ImageOps
+
+from . import media_metadata
+from .image_ingest import make_thumbnails, thumbnail_name_for
+
+logger = logging.getLogger(__name__)
+
+
+class ThumbnailError(Exception):
+    pass
+
+
+def sizes():
+    return tuple(sorted(settings.IMAGE_INGEST['THUMBNAIL_SIZES']))
+
+
+def default_size():
+    return sizes()[0]
+
+
+def ensure_thumbnail(storage, name, size):
+    """
+    Storage name of the `size` px thumbnail of `name`. It is made on first request and stored
+    next to the image; MediaObject remembers that it exists, so later calls only read the DB.
+    Concurrent first requests may both render it, which is harmless since the key is fixed.
+    """
+    if size not in sizes():
+        raise ThumbnailError(f"Unsupported thumbnail size {size}.")
+
+    obj = media_metadata.lookup([name], storage).get(name)
+    if obj is None:
+        raise ThumbnailError(f"{name} does not exist.")
+    thumbnail_name = thumbnail_name_for(name, size)
+    if size in obj.thumbnails:
+        return thumbnail_name
+
+    try:
+        with storage.open(name, 'rb') as f, PILImage.open(f) as img:
+            if img.format == 'JPEG':
+                # Let the decoder do a cheap DCT downscale, which is most of the work saved
+                img.draft('RGB', (size, size))
+            img = ImageOps.exif_transpose(img)
+            thumbnail = make_thumbnails(img, sizes=[size])[size]
+    except Exception as e:
+        raise ThumbnailError(f"Could not render a thumbnail of {name}: {e}")
+
+    storage.save_variant(thumbnail_name, thumbnail)
+    media_metadata.add_thumbnail(name, size)
+    logger.info(f"Rendered {thumbnail_name}")
+    return thumbnail_name
+
+
+def source_for(obj, name, box):
+    """Smallest stored thumbnail of `name` (MediaObject `obj`) that still fills `box`, else the original."""
+    for size in sorted(obj.thumbnails if obj else []):
+        if size >= max(box):
+            return thumbnail_name_for(name, size)
+    return name
+
+
+def open_scaled(storage, name, box):
+    """
+    `name` decoded straight down to fit `box`, as RGB, or None if it can't be read. Only
+    talks to storage, never to the database, so it is safe to run in a thread pool.
+    """
+    try:
+        with storage.open(name, 'rb') as f, PILImage.open(f) as img:
+            if img.format == 'JPEG':
+                img.draft('RGB', box)
+            img = ImageOps.exif_transpose(img)
+            if img.mode in ('RGBA', 'LA', 'P'):
+                # Transparent areas (signatures) go white, not black
+                img = img.convert('RGBA')
+                background = PILImage.new('RGB', img.size, 'white')
+                background.paste(img, mask=img.getchannel('A'))
+                img = background
+            img = img.convert('RGB')
+            img.thumbnail(box)
+            return img
+    except Exception as e:
+        logger.warning(f"Could not load {name}: {e}")
+        return None
@@ -28,3 +28,18 @@ def get_signature_from_user_id(user_id):
         return None
     except (User.DoesNotExist, UserProfile.DoesNotExist):
         return None
+
+
+def accessible_location_ids(user):
+    """
+    IDs of the locations whose reports `user` may access, or None when the user is not
+    restricted (superusers and admins).
+    """
+    if user.is_superuser:
+        return None
+    profile = getattr(user, 'profile', None)
+    if profile is None:
+        return set()
+    if profile.role == 'admin':
+        return None
+    return set(profile.locations.values_list('id', flat=True))
@@ -0,0 +1,106 @@
+import logging
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _ZipSink:
+    """Write-only target for ZipFile. Being unseekable makes ZipFile emit data descriptors."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _fetch(arcname, open_file):
+    """
+    Copy one object into a temporary buffer that stays in memory up to MEMORY_PER_FILE and
+    spills to disk beyond that. Returns (arcname, buffer, size), or None if it can't be read.
+    """
+    config = settings.MEDIA_ARCHIVE
+    buffer = tempfile.SpooledTemporaryFile(max_size=config['MEMORY_PER_FILE'])
+    try:
+        with open_file() as source:
+            shutil.copyfileobj(source, buffer, config['CHUNK_SIZE'])
+    except Exception as e:
+        logger.error(f"Could not fetch {arcname} for the archive: {e}")
+        buffer.close()
+        return None
+    size = buffer.tell()
+    buffer.seek(0)
+    return arcname, buffer, size
+
+
+def _fetch_concurrently(entries):
+    """
+    Yield fetched entries in the order they arrive. At most MAX_BUFFERED_FILES are fetched
+    ahead of the writer, so a slow client holds back the downloads instead of piling them up.
+    """
+    config = settings.MEDIA_ARCHIVE
+    entries = iter(entries)
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=config['FETCH_WORKERS']) as executor:
+        try:
+            while True:
+                while len(in_flight) < config['MAX_BUFFERED_FILES']:
+                    entry = next(entries, None)
+                    if entry is None:
+                        break
+                    in_flight.add(executor.submit(_fetch, *entry))
+                if not in_flight:
+                    return
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    fetched = future.result()
+                    if fetched is not None:
+                        yield fetched
+        finally:
+            # The client went away: don't start the downloads that haven't begun
+            for future in in_flight:
+                future.cancel()
+
+
+def stream_zip(entries):
+    """
+    Generate a ZIP archive of `entries`, (arcname, open_file) pairs where `open_file()` returns
+    a readable binary file. Objects are fetched concurrently and each is written out as soon
+    as it is complete; nothing is compressed since the media is already JPEG/PNG/PDF/XLSX.
+    """
+    chunk_size = settings.MEDIA_ARCHIVE['CHUNK_SIZE']
+    sink = _ZipSink()
+    archive = zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED)
+
+    for arcname, buffer, size in _fetch_concurrently(entries):
+        info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        # A known size lets ZipFile switch to ZIP64 for large files up front
+        info.file_size = size
+        with buffer, archive.open(info, 'w') as target:
+            while chunk := buffer.read(chunk_size):
+                target.write(chunk)
+                data = sink.drain()
+                if data:
+                    yield data
+        data = sink.drain()
+        if data:
+            yield data
+
+    archive.close()
+    yield sink.drain()
@@ -4,46 +4,233 @@ import os
 import tempfile
 import mimetypes
 
-from django.core.files.storage import default_storage
-from django.http import FileResponse, Http404, JsonResponse
+from django.conf import settings
+from django.db import transaction
+from django.core import signing
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, HttpResponseRedirect, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date
 from django.views.generic import TemplateView
 from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiExample, OpenApiParameter, inline_serializer
 from rest_framework import serializers
 from rest_framework import status
 from rest_framework import viewsets
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.generics import ListAPIView, ListCreateAPIView
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import DeliveryReport, Item, Location, Supplier
-from .pagination import ReportsResultsSetPagination
+from .models import DeliveryReport, Item, Location, Supplier, ChunkedUpload
+from .pagination import ReportsPagination, ReportsResultsSetPagination
 from .serializers import (
     DeliveryReportSerializer,
     ItemSerializer,
     ItemAutocompleteFilterSerializer,
-    SupplierAutocompleteSerializer
+    SupplierAutocompleteSerializer,
+    ChunkedUploadSerializer,
+    DeliveryReportSummarySerializer,
+    ReportListViewSerializer,
+    MediaPresignSerializer,
+    ReportBulkRetrieveSerializer,
+    ReportFilterSerializer,
+    ReportExportSerializer,
+    ReportTableExportSerializer,
+    ArtifactDownloadSerializer,
+    MediaThumbnailSerializer,
+    ReportMediaArchiveSerializer,
+    ReportSearchSerializer,
+    LocationDigestSerializer,
+    is_read_request,
 )
-from .services import ReportFileService, ReportDataService, ReportUpdateService
+from .services import (
+    ReportGenerationPending,
+    ReportGenerationService,
+    ReportExportService,
+    ReportSyncService,
+    SyncCursorError,
+    ReportMediaService,
+    ReportDigestService,
+    ReportPreviewService,
+)
+from .utils.chunked_upload_utils import (
+    ChunkedUploadError,
+    UploadOffsetMismatch,
+    parse_content_range,
+    write_chunk,
+    open_spooled_file,
+    discard_spooled_file,
+    is_expired,
+)
+from .utils.conditional_utils import collect_report_stats, page_of, report_validators
+from .utils.download_utils import proxy_object, redirect_to_object
+from .utils.file_validators import FileValidationError, validate_image_file
 from .utils.plate_recognition_utils import recognize_plate, PlateRecognitionError
+from .utils.search_utils import search_reports, SearchNotSupported
+from .utils.user_utils import accessible_location_ids
+from .utils.zip_stream import stream_zip
+from .utils import media_spool, media_keys, table_export, thumbnails
+from .utils.private_storage import PrivateMediaStorage, PRESIGNED_URL_EXPIRY
 
 logger = logging.getLogger(__name__)
 
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+REPORT_READ_PARAMETERS = [
+    OpenApiParameter(
+        name='fields',
+        description="Comma separated fields to return. Image URLs and items are left out "
+                    "unless listed here or in `expand`.",
+        required=False,
+        type=str,
+    ),
+    OpenApiParameter(
+        name='expand',
+        description="Comma separated heavy fields to include: items, *_urls lists and image fields.",
+        required=False,
+        type=str,
+    ),
+    OpenApiParameter(
+        name='media',
+        description="'keys' renders opaque media keys instead of presigned URLs; "
+                    "exchange them at /api/media/presign/ when an image is opened.",
+        required=False,
+        type=str,
+        enum=['urls', 'keys'],
+    ),
+]
+
+REPORT_LIST_PARAMETERS = REPORT_READ_PARAMETERS + [
+    OpenApiParameter(name='created_from', description="Created on or after (YYYY-MM-DD)", required=False, type=str),
+    OpenApiParameter(name='created_to', description="Created on or before (YYYY-MM-DD)", required=False, type=str),
+    OpenApiParameter(name='supplier', description="Supplier ID", required=False, type=int),
+    OpenApiParameter(name='licence_plate', description="Truck or trailer plate (case-insensitive)",
+                     required=False, type=str),
+    OpenApiParameter(name='container_number', description="Container number (case-insensitive)",
+                     required=False, type=str),
+    OpenApiParameter(name='delivery_slip_number', description="Delivery slip number (case-insensitive)",
+                     required=False, type=str),
+    OpenApiParameter(name='checking_company', description="Checking company (case-insensitive)",
+                     required=False, type=str),
+    OpenApiParameter(name='logistic_company', description="Logistic company (case-insensitive)",
+                     required=False, type=str),
+    OpenApiParameter(name='has_damages', description="Only reports with (true) or without (false) damages",
+                     required=False, type=bool),
+    OpenApiParameter(
+        name='view',
+        description="'summary' returns DeliveryReportSummary rows (id, slip number, supplier, "
+                    "location, date, damage flag) instead of full reports.",
+        required=False,
+        type=str,
+        enum=['full', 'summary'],
+    ),
+]
+
+
+class ReportFilterMixin:
+    """Applies the ReportFilterSerializer query parameters to report list endpoints."""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        params = ReportFilterSerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        return params.filter(queryset)
+
+
+class ReportSummaryListMixin:
+    """
+    Lets report list endpoints answer `?view=summary` from a values() projection instead of
+    running the full serializer (nested images, presigned URLs) for every row.
+    """
+
+    def is_summary_view(self):
+        params = ReportListViewSerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        return params.validated_data['view'] == 'summary'
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_summary_view():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset()).summary()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = DeliveryReportSummarySerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = DeliveryReportSummarySerializer(queryset, many=True)
+        return Response(serializer.data)
 
-class DeliveryReportViewSet(viewsets.ModelViewSet):
-    queryset = DeliveryReport.objects.all().order_by('-created_at')
+
+def report_relations(request):
+    """Relations DeliveryReportSerializer will need for this request's `?fields=`/`?expand=`."""
+    if not is_read_request(request):
+        return None
+    return DeliveryReportSerializer.relations_for(DeliveryReportSerializer.selected_fields(request.query_params))
+
+
+class ConditionalReportMixin:
+    """
+    ETag / Last-Modified for report reads. The validators come from a single aggregate query over
+    the rows of the page being returned, so an unchanged resource is answered with 304 before
+    anything is serialized or presigned.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        rows, total = queryset, None
+        if self.paginator is not None:
+            rows, total = self.paginator.page_rows(queryset, request, self)
+        stats = collect_report_stats(rows, total)
+
+        def render():
+            if self.paginator is not None:
+                # The stats already hold the page's ids and count, so neither query runs twice
+                self.paginator.reuse_page(*page_of(stats))
+            return super(ConditionalReportMixin, self).list(request, *args, **kwargs)
+
+        return self._conditional(stats, 'list', render)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        queryset = self.filter_queryset(self.get_queryset()).filter(**{self.lookup_field: lookup})
+        return self._conditional(collect_report_stats(queryset), f'report-{lookup}',
+                                 lambda: super(ConditionalReportMixin, self).retrieve(request, *args, **kwargs))
+
+    def _conditional(self, stats, scope, render):
+        etag, last_modified = report_validators(self.request, stats, f'{self.request.path}:{scope}')
+        # Only the ETag is compared: a report leaving the page (deleted, or no longer matching the
+        # filters) changes it without moving Last-Modified forward
+        not_modified = get_conditional_response(self.request, etag=etag)
+        response = not_modified or render()
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+            # Let clients keep the copy but always revalidate it
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class DeliveryReportViewSet(ConditionalReportMixin, ReportSummaryListMixin, ReportFilterMixin, viewsets.ModelViewSet):
+    queryset = DeliveryReport.objects.with_related().order_by('-created_at', '-id')
     serializer_class = DeliveryReportSerializer
     parser_classes = (MultiPartParser, FormParser)
     permission_classes = [IsAuthenticated]
-    pagination_class = ReportsResultsSetPagination
+    pagination_class = ReportsPagination
+    cursor_ordering = ('-created_at', '-id')
     http_method_names = ['get', 'post', 'put', 'patch']
 
+    def get_queryset(self):
+        return DeliveryReport.objects.with_related(report_relations(self.request)).order_by(*self.cursor_ordering)
+
     @extend_schema(
         tags=["Delivery Reports"],
-        description="List all delivery reports.",
+        description="List all delivery reports. Pass `view=summary` for lightweight rows.",
+        parameters=REPORT_LIST_PARAMETERS,
         responses={200: DeliveryReportSerializer(many=True)}
     )
     def list(self, request, *args, **kwargs):
@@ -58,7 +245,8 @@ class DeliveryReportViewSet(viewsets.ModelViewSet):
     def create(self, request, *args, **kwargs):
         response = super().create(request, *args, **kwargs)
 
-        if response.status_code == 201:
+        # Lazy locations get their files on first download (see serve_report_artifact)
+        if response.status_code == 201 and not ReportGenerationService.is_lazy(response.data.get('location')):
             try:
                 self._handle_file_generation(response.data)
             except Exception as e:
@@ -70,39 +258,218 @@ class DeliveryReportViewSet(viewsets.ModelViewSet):
 
         return response
 
+    def perform_create(self, serializer):
+        report = serializer.save()
+        # Render the response from a prefetched copy rather than one query per item and image
+        serializer.instance = self.get_queryset().get(pk=report.pk)
+
     def _handle_file_generation(self, report_data):
         """Handle the complete file generation workflow"""
-        report_id = report_data.get('id')
+        ReportGenerationService.generate(report_data)
 
-        # Initialize services
-        file_service = ReportFileService()
-        data_service = ReportDataService()
-        update_service = ReportUpdateService()
+    @extend_schema(
+        tags=["Delivery Reports"],
+        description="Retrieve a specific delivery report.",
+        parameters=REPORT_READ_PARAMETERS,
+        responses={200: DeliveryReportSerializer}
+    )
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
-        # Generate filenames and paths
-        filenames = file_service.generate_filenames()
-        excel_path = file_service.generate_excel_path(filenames['excel'])
+    @extend_schema(
+        tags=["Delivery Reports"],
+        description="Retrieve several delivery reports at once, e.g. after a client was offline. "
+                    "Reports that do not exist or are outside the user's locations are listed in "
+                    "`missing`.",
+        parameters=[
+            OpenApiParameter(name='ids', description="Comma separated report ids (GET)", required=False, type=str),
+            *REPORT_READ_PARAMETERS,
+        ],
+        request=ReportBulkRetrieveSerializer,
+        responses={200: inline_serializer(
+            name='DeliveryReportBulkResponse',
+            fields={
+                'results': DeliveryReportSerializer(many=True),
+                'missing': serializers.ListField(child=serializers.IntegerField()),
+            }
+        )},
+    )
+    @action(detail=False, methods=['get', 'post'], url_path='bulk', parser_classes=[JSONParser, FormParser])
+    def bulk_retrieve(self, request):
+        params = ReportBulkRetrieveSerializer(data=request.data if request.method == 'POST' else request.query_params)
+        params.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(params.validated_data['ids']))
+
+        queryset = self.get_queryset().filter(id__in=ids)
+        location_ids = accessible_location_ids(request.user)
+        if location_ids is not None:
+            queryset = queryset.filter(location_id__in=location_ids)
+        reports = {report.id: report for report in queryset}
+
+        context = self.get_serializer_context()
+        # One storage client signs every image of the batch, without per-object HEAD requests
+        context['presigned_urls'] = media_keys.PresignedUrlCache()
+        serializer = DeliveryReportSerializer(
+            [reports[report_id] for report_id in ids if report_id in reports], many=True, context=context
+        )
+        return Response({
+            'results': serializer.data,
+            'missing': [report_id for report_id in ids if report_id not in reports],
+        })
 
-        # Prepare report data
-        prepared_data = data_service.prepare_report_data(report_data.copy())
+    @extend_schema(
+        tags=["Delivery Reports"],
+        description="Incremental sync. Returns the reports created or updated since `cursor` and the "
+                    "ids of reports deleted since then, limited to the user's locations. Store the "
+                    "returned cursor for the next call and repeat while `has_more` is true. Omit the "
+                    "cursor for a first full sync.",
+        parameters=[
+            OpenApiParameter(name='cursor', description="Cursor from the previous sync", required=False, type=str),
+            OpenApiParameter(name='limit', description="Maximum changes per stream", required=False, type=int),
+            *REPORT_READ_PARAMETERS,
+        ],
+        responses={200: inline_serializer(
+            name='DeliveryReportSyncResponse',
+            fields={
+                'changed': DeliveryReportSerializer(many=True),
+                'deleted': serializers.ListField(child=serializers.IntegerField()),
+                'cursor': serializers.CharField(),
+                'has_more': serializers.BooleanField(),
+            }
+        ), 400: OpenApiResponse(description="Invalid cursor")},
+    )
+    @action(detail=False, methods=['get'], url_path='sync')
+    def sync(self, request):
+        try:
+            limit = int(request.query_params['limit']) if 'limit' in request.query_params else None
+        except ValueError:
+            return Response({"error": "limit must be a number."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Generate files
-        file_service.generate_files(prepared_data, excel_path)
+        try:
+            reports, deleted, cursor, has_more = ReportSyncService(request.user).changes(
+                self.get_queryset().order_by(), request.query_params.get('cursor'), limit
+            )
+        except SyncCursorError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Update database
-        update_service.update_report_files(
-            report_id,
-            filenames['excel'],
-            filenames['pdf']
-        )
+        return Response({
+            'changed': self.get_serializer(reports, many=True).data,
+            'deleted': deleted,
+            'cursor': cursor,
+            'has_more': has_more,
+        })
 
     @extend_schema(
         tags=["Delivery Reports"],
-        description="Retrieve a specific delivery report.",
-        responses={200: DeliveryReportSerializer}
+        description="Full-text search over container and slip numbers, plates, damage description and "
+                    "comments, best matches first. Words match as prefixes, so fragments work. "
+                    "Limited to the user's locations.",
+        parameters=[
+            OpenApiParameter(name='q', description="Search text", required=True, type=str),
+            *REPORT_LIST_PARAMETERS,
+        ],
+        responses={200: DeliveryReportSerializer(many=True), 501: OpenApiResponse(description="Not PostgreSQL")},
     )
-    def retrieve(self, request, *args, **kwargs):
-        return super().retrieve(request, *args, **kwargs)
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request):
+        params = ReportSearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        location_ids = accessible_location_ids(request.user)
+        if location_ids is not None:
+            queryset = queryset.filter(location_id__in=location_ids)
+        try:
+            queryset = search_reports(queryset, params.validated_data['q'])
+        except SearchNotSupported as e:
+            return Response({"error": str(e)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        # Ranked results cannot be keyset-paginated, so always use page numbers
+        paginator = ReportsResultsSetPagination()
+        summary = self.is_summary_view()
+        page = paginator.paginate_queryset(queryset.summary() if summary else queryset, request, view=self)
+        serializer = DeliveryReportSummarySerializer(page, many=True) if summary else self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @extend_schema(
+        tags=["Download Reports"],
+        description="Stream a ZIP of the PDF reports (and with include_excel=true the Excel files) of one "
+                    "location over a date range. Files are fetched concurrently and written out as they arrive, "
+                    "in constant memory. Reports without a generated file are skipped and listed in MISSING.txt. "
+                    "The list filters apply as well.",
+        parameters=[
+            OpenApiParameter(name='location', description="Location ID", required=True, type=int),
+            OpenApiParameter(name='created_from', description="Created on or after (YYYY-MM-DD)", required=True, type=str),
+            OpenApiParameter(name='created_to', description="Created on or before (YYYY-MM-DD)", required=True, type=str),
+            OpenApiParameter(name='include_excel', description="Add the Excel files", required=False, type=bool),
+            *[param for param in REPORT_LIST_PARAMETERS if param.name not in (
+                'fields', 'expand', 'media', 'view', 'created_from', 'created_to',
+            )],
+        ],
+        responses={
+            (200, "application/zip"): OpenApiResponse(response={"type": "string", "format": "binary"}),
+            400: OpenApiResponse(description="Invalid parameters"),
+            403: OpenApiResponse(description="Location not accessible"),
+        },
+    )
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        params = ReportExportSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+
+        location_ids = accessible_location_ids(request.user)
+        if location_ids is not None and data['location'] not in location_ids:
+            raise PermissionDenied("You do not have access to this location.")
+
+        queryset = params.filter(DeliveryReport.objects.filter(location_id=data['location']))
+        entries = ReportExportService.archive_entries(queryset, include_excel=data['include_excel'])
+        response = StreamingHttpResponse(stream_zip(entries), content_type="application/zip")
+        response["Content-Disposition"] = content_disposition_header(
+            as_attachment=True,
+            filename=ReportExportService.archive_filename(data['location'], data['created_from'], data['created_to']),
+        )
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    @extend_schema(
+        tags=["Download Reports"],
+        description="Download the data of the reports as CSV or XLSX: supplier, slip and container numbers, plates, "
+                    "statuses and comments, items and quantities. Rows are streamed from a server-side cursor, so "
+                    "any number of reports can be exported. Takes the list filters and an optional location.",
+        parameters=[
+            OpenApiParameter(name='file_type', description="csv (default) or xlsx", required=False, type=str,
+                             enum=ReportTableExportSerializer.FILE_TYPES),
+            OpenApiParameter(name='location', description="Location ID", required=False, type=int),
+            *[param for param in REPORT_LIST_PARAMETERS if param.name not in ('fields', 'expand', 'media', 'view')],
+        ],
+        responses={
+            (200, "text/csv"): OpenApiResponse(response={"type": "string", "format": "binary"}),
+            (200, XLSX_CONTENT_TYPE): OpenApiResponse(response={"type": "string", "format": "binary"}),
+            400: OpenApiResponse(description="Invalid parameters"),
+        },
+    )
+    @action(detail=False, methods=['get'], url_path='export-table')
+    def export_table(self, request):
+        params = ReportTableExportSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        queryset = params.filter(DeliveryReport.objects.all())
+        location_ids = accessible_location_ids(request.user)
+        if location_ids is not None:
+            queryset = queryset.filter(location_id__in=location_ids)
+
+        rows = table_export.export_rows(queryset)
+        filename = f"delivery_reports_{timezone.localdate():%Y%m%d}"
+        if params.validated_data['file_type'] == 'xlsx':
+            response = StreamingHttpResponse(table_export.stream_xlsx(rows), content_type=XLSX_CONTENT_TYPE)
+            filename += '.xlsx'
+        else:
+            response = StreamingHttpResponse(table_export.stream_csv(rows), content_type="text/csv; charset=utf-8")
+            filename += '.csv'
+        response["Content-Disposition"] = content_disposition_header(as_attachment=True, filename=filename)
+        response["X-Accel-Buffering"] = "no"
+        return response
 
     @extend_schema(
         tags=["Delivery Reports"],
@@ -164,48 +531,115 @@ class ItemAutocompleteView(ListAPIView):
         return queryset.order_by('name')[:10]
 
 
+ARTIFACT_DOWNLOAD_PARAMETERS = [
+    OpenApiParameter(
+        name="mode",
+        description="'redirect' (default): 302 to a short-lived presigned URL. "
+                    "'proxy': stream through the API, with Range and If-None-Match support.",
+        required=False,
+        type=str,
+        enum=list(ArtifactDownloadSerializer.MODES),
+    ),
+]
+
+
+def serve_report_artifact(request, report_id, field_name, label):
+    params = ArtifactDownloadSerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+
+    file_path = DeliveryReport.objects.filter(id=report_id).values_list(field_name, flat=True).first()
+    if file_path is None:
+        raise Http404("Report not found.")
+    if not file_path and settings.REPORT_GENERATION['LAZY']:
+        try:
+            file_path = ReportGenerationService.ensure_generated(report_id)[field_name]
+        except DeliveryReport.DoesNotExist:
+            raise Http404("Report not found.")
+        except ReportGenerationPending as e:
+            response = JsonResponse({"message": "Report files are being generated, retry shortly."}, status=202)
+            response['Retry-After'] = str(e.retry_after)
+            return response
+        except Exception as e:
+            logger.error(f"File generation failed for report {report_id}: {e}")
+            return JsonResponse({"error": "Failed to generate report files"}, status=500)
+    if not file_path:
+        raise Http404(f"{label} file not found.")
+
+    # Same bucket and keys as default_storage, but able to presign and read ranges
+    storage = PrivateMediaStorage()
+    filename = os.path.basename(file_path)
+    if params.validated_data['mode'] == 'proxy':
+        return proxy_object(request, storage, file_path, filename)
+    return redirect_to_object(storage, file_path, filename)
+
+
 @extend_schema(
     tags=["Download Reports"],
-    description="Download the Excel file for a specific delivery report.",
-    responses={200: {"type": "file"}, 404: {"description": "Report or file not found"}}
+    description="Download the Excel file for a specific delivery report. With lazy generation the "
+                "files are generated on the first download.",
+    parameters=ARTIFACT_DOWNLOAD_PARAMETERS,
+    responses={
+        200: {"type": "file"},
+        206: {"description": "Partial content (proxy mode)"},
+        202: {"description": "Files are being generated by another request, retry after Retry-After"},
+        302: {"description": "Redirect to a presigned download URL"},
+        304: {"description": "Not modified (proxy mode)"},
+        404: {"description": "Report or file not found"},
+        416: {"description": "Range not satisfiable (proxy mode)"},
+        500: {"description": "Generating the files failed"},
+    }
 )
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def download_excel_report(request, report_id):
-    try:
-        report = DeliveryReport.objects.get(id=report_id)
-    except DeliveryReport.DoesNotExist:
-        raise Http404("Report not found.")
-
-    file_path = str(report.excel_report_file)
-    if not file_path or not default_storage.exists(file_path):
-        raise Http404("Excel file not found.")
-
-    file = default_storage.open(file_path, 'rb')
-    filename = os.path.basename(file_path)
-    return FileResponse(file, as_attachment=True, filename=filename)
+    return serve_report_artifact(request, report_id, 'excel_report_file', "Excel")
 
 
 @extend_schema(
     tags=["Download Reports"],
-    description="Download the PDF file for a specific delivery report.",
-    responses={200: {"type": "file"}, 404: {"description": "Report or file not found"}}
+    description="Download the PDF file for a specific delivery report. With lazy generation the "
+                "files are generated on the first download.",
+    parameters=ARTIFACT_DOWNLOAD_PARAMETERS,
+    responses={
+        200: {"type": "file"},
+        206: {"description": "Partial content (proxy mode)"},
+        202: {"description": "Files are being generated by another request, retry after Retry-After"},
+        302: {"description": "Redirect to a presigned download URL"},
+        304: {"description": "Not modified (proxy mode)"},
+        404: {"description": "Report or file not found"},
+        416: {"description": "Range not satisfiable (proxy mode)"},
+        500: {"description": "Generating the files failed"},
+    }
 )
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def download_pdf_report(request, report_id):
+    return serve_report_artifact(request, report_id, 'pdf_report_file', "PDF")
+
+
+@extend_schema(exclude=True)
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def spooled_media(request, token):
+    """
+    Serve an object that is still in the write-behind spool. The signed, expiring token plays
+    the role of an S3 presigned URL.
+    """
     try:
-        report = DeliveryReport.objects.get(id=report_id)
-    except DeliveryReport.DoesNotExist:
-        raise Http404("Report not found.")
+        name = media_spool.name_from_token(token)
+    except signing.BadSignature:
+        raise Http404("Media not found.")
 
-    file_path = str(report.pdf_report_file)
-    if not file_path or not default_storage.exists(file_path):
-        raise Http404("PDF file not found.")
+    try:
+        file = media_spool.open_file(name)
+    except FileNotFoundError:
+        # Already replicated, hand out the real storage URL instead
+        url = PrivateMediaStorage().url(name)
+        if not url:
+            raise Http404("Media not found.")
+        return HttpResponseRedirect(url)
 
-    file = default_storage.open(file_path, 'rb')
-    filename = os.path.basename(file_path)
-    return FileResponse(file, as_attachment=True, filename=filename)
+    return FileResponse(file, content_type=guess_content_type(name))
 
 
 def encode_file(file_field, filename):
@@ -231,7 +665,9 @@ def guess_content_type(filename, default="image/jpeg"):
     operation_id="download_delivery_report_media_base64",
     summary="Download delivery report media as base64",
     tags=["Download Report Media"],
-    description="Download all media files (images) associated with a delivery report as base64-encoded data",
+    description="Download all media files (images) associated with a delivery report as base64-encoded data. "
+                "Deprecated: the whole payload is built in memory, use the ZIP download instead.",
+    deprecated=True,
     parameters=[
         OpenApiParameter(
             name="report_id",
@@ -392,6 +828,144 @@ def download_report_media(request, report_id):
     }, status=status.HTTP_200_OK)
 
 
+@extend_schema(
+    operation_id="download_delivery_report_media_zip",
+    summary="Download delivery report media as a ZIP archive",
+    tags=["Download Report Media"],
+    description="Stream all images of a delivery report as a ZIP archive, one folder per category "
+                "(license_plates, delivery_proof, cmr, gsc_proof, delivery_slips, damage_images, additional). "
+                "With include_reports=true the Excel and PDF reports are added under reports/.",
+    parameters=[
+        OpenApiParameter(
+            name="report_id",
+            description="ID of the delivery report",
+            required=True,
+            type=int,
+            location=OpenApiParameter.PATH,
+        ),
+        OpenApiParameter(name="include_reports", description="Add the Excel and PDF reports", required=False, type=bool),
+    ],
+    responses={
+        (200, "application/zip"): OpenApiResponse(response={"type": "string", "format": "binary"}),
+        404: OpenApiResponse(description="Delivery report not found"),
+    },
+)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def download_report_media_zip(request, report_id):
+    """
+    Stream the report media as a ZIP archive. Files are fetched concurrently and written out
+    as they arrive, so memory stays bounded and the first bytes go out right away.
+    """
+    params = ReportMediaArchiveSerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    try:
+        report = ReportMediaService.get_report(report_id, request.user)
+    except DeliveryReport.DoesNotExist:
+        return JsonResponse({"error": "Report not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    entries = ReportMediaService.archive_entries(report, include_reports=params.validated_data['include_reports'])
+    response = StreamingHttpResponse(stream_zip(entries), content_type="application/zip")
+    response["Content-Disposition"] = content_disposition_header(
+        as_attachment=True, filename=ReportMediaService.archive_filename(report)
+    )
+    # Let proxies pass chunks through instead of buffering the whole archive
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@extend_schema(
+    operation_id="delivery_report_media_manifest",
+    summary="List delivery report media with presigned URLs",
+    tags=["Download Report Media"],
+    description="Metadata of every media file of a delivery report with presigned full-size and thumbnail "
+                "URLs, so clients download straight from storage, in parallel. No file contents pass through "
+                "the API. Thumbnails are listed by long edge in pixels, for the sizes that exist.",
+    parameters=[
+        OpenApiParameter(
+            name="report_id",
+            description="ID of the delivery report",
+            required=True,
+            type=int,
+            location=OpenApiParameter.PATH,
+        ),
+        OpenApiParameter(name="include_reports", description="Add the Excel and PDF reports", required=False, type=bool),
+    ],
+    responses={
+        200: inline_serializer(
+            name='MediaManifestResponse',
+            fields={
+                'report_id': serializers.IntegerField(),
+                'expires_in': serializers.IntegerField(help_text="Seconds the URLs stay valid"),
+                'media': inline_serializer(
+                    name='MediaManifestEntry',
+                    many=True,
+                    fields={
+                        'category': serializers.CharField(),
+                        'filename': serializers.CharField(),
+                        'content_type': serializers.CharField(),
+                        'size': serializers.IntegerField(),
+                        'etag': serializers.CharField(),
+                        'url': serializers.URLField(),
+                        'thumbnails': serializers.DictField(child=serializers.URLField()),
+                    },
+                ),
+            },
+        ),
+        404: OpenApiResponse(description="Delivery report not found"),
+    },
+)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def report_media_manifest(request, report_id):
+    params = ReportMediaArchiveSerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    try:
+        report = ReportMediaService.get_report(report_id, request.user)
+    except DeliveryReport.DoesNotExist:
+        return JsonResponse({"error": "Report not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    media = ReportMediaService.manifest(report, include_reports=params.validated_data['include_reports'])
+    return Response({"report_id": report.id, "expires_in": PRESIGNED_URL_EXPIRY, "media": media})
+
+
+@extend_schema(
+    tags=["Download Reports"],
+    description="PNG preview of the first page of a report, drawn from the report data without LibreOffice, so "
+                "it is available right after submitting. Cached per report version; the ETag changes whenever "
+                "the report, its items or its images do.",
+    parameters=[
+        OpenApiParameter(name='report_id', description='Delivery report ID', required=True, type=int,
+                         location=OpenApiParameter.PATH),
+    ],
+    responses={
+        (200, "image/png"): OpenApiResponse(response={"type": "string", "format": "binary"}),
+        304: OpenApiResponse(description="Not modified"),
+        404: OpenApiResponse(description="Delivery report not found"),
+    },
+)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def report_preview(request, report_id):
+    try:
+        report = ReportMediaService.get_report(
+            report_id, request.user, relations=('location', 'supplier', 'items', 'gsc_proof_images'),
+        )
+    except DeliveryReport.DoesNotExist:
+        return JsonResponse({"error": "Report not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    version = ReportPreviewService.version(report.id)
+    etag = f'"{version}"'
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    response = HttpResponse(ReportPreviewService.get_preview(report, version), content_type="image/png")
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 @extend_schema(
     operation_id="download_single_media_file",  # Add unique operation_id
     tags=["Download Reports"],
@@ -423,15 +997,17 @@ def download_report_media(request, report_id):
                          location=OpenApiParameter.PATH,
                          required=True,
                          type=int,
-                         description="Location ID")
+                         description="Location ID"),
+        *REPORT_LIST_PARAMETERS,
     ],
     responses=DeliveryReportSerializer(many=True),
     tags=["Locations"]
 )
-class ReportsByLocationView(ListAPIView):
+class ReportsByLocationView(ConditionalReportMixin, ReportSummaryListMixin, ReportFilterMixin, ListAPIView):
     serializer_class = DeliveryReportSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = ReportsResultsSetPagination
+    pagination_class = ReportsPagination
+    cursor_ordering = ('-id',)
 
     def get_queryset(self):
         user = self.request.user
@@ -442,10 +1018,57 @@ class ReportsByLocationView(ListAPIView):
 
         location = get_object_or_404(Location, id=self.kwargs['location_id'])
 
-        if location not in profile.locations.all():
+        if not profile.locations.filter(id=location.id).exists():
             return DeliveryReport.objects.none()
 
-        return DeliveryReport.objects.filter(location=location).order_by('-id')
+        return DeliveryReport.objects.filter(location=location).with_related(
+            report_relations(self.request)
+        ).order_by('-id')
+
+
+class LocationDigestView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        tags=["Download Reports"],
+        description="Download the daily digest of a location as one PDF: a summary table of every delivery of the "
+                    "day (supplier, slip, container, plates, item totals, damage flag) followed by a compact page "
+                    "per report with its image thumbnails. Also available as the generate_daily_digest command.",
+        parameters=[
+            OpenApiParameter(name="location_id", location=OpenApiParameter.PATH, required=True, type=int,
+                             description="Location ID"),
+            OpenApiParameter(name="date", description="Day (YYYY-MM-DD), yesterday by default", required=False, type=str),
+        ],
+        responses={
+            (200, "application/pdf"): OpenApiResponse(response={"type": "string", "format": "binary"}),
+            400: OpenApiResponse(description="Invalid date"),
+            403: OpenApiResponse(description="Location not accessible"),
+            404: OpenApiResponse(description="Location not found"),
+        },
+    )
+    def get(self, request, location_id):
+        params = LocationDigestSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        day = params.validated_data['date']
+
+        location = get_object_or_404(Location, id=location_id)
+        location_ids = accessible_location_ids(request.user)
+        if location_ids is not None and location.id not in location_ids:
+            raise PermissionDenied("You do not have access to this location.")
+
+        f = tempfile.TemporaryFile()
+        try:
+            ReportDigestService.write(location, day, f)
+        except Exception:
+            f.close()
+            raise
+        f.seek(0)
+        return FileResponse(
+            f,
+            as_attachment=True,
+            filename=ReportDigestService.filename(location, day),
+            content_type="application/pdf",
+        )
 
 
 class RecognizePlatesView(APIView):
@@ -561,3 +1184,191 @@ class SupplierAutocompleteView(ListCreateAPIView):
         if q:
             qs = qs.filter(name__icontains=q)
         return qs.order_by('name')[:10]
+
+
+class ChunkedUploadCreateView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        tags=["Uploads"],
+        description="Start a resumable upload. Send the parts with PUT and a Content-Range header, "
+                    "then call complete. The returned id can be referenced from the report create "
+                    "payload through `upload_ids`.",
+        request=ChunkedUploadSerializer,
+        responses={201: ChunkedUploadSerializer},
+    )
+    def post(self, request):
+        serializer = ChunkedUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.save(user=request.user)
+        return Response(ChunkedUploadSerializer(upload).data, status=status.HTTP_201_CREATED)
+
+
+class ChunkedUploadDetailView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def _get_upload(self, request, upload_id):
+        return get_object_or_404(ChunkedUpload, id=upload_id, user=request.user)
+
+    @staticmethod
+    def _offset_response(upload, status_code=status.HTTP_200_OK):
+        response = Response(ChunkedUploadSerializer(upload).data, status=status_code)
+        response['Upload-Offset'] = str(upload.offset)
+        return response
+
+    @extend_schema(
+        tags=["Uploads"],
+        description="Return how many contiguous bytes of the upload the server has received "
+                    "(also sent as the Upload-Offset header). HEAD is supported.",
+        responses={200: ChunkedUploadSerializer},
+    )
+    def get(self, request, upload_id):
+        return self._offset_response(self._get_upload(request, upload_id))
+
+    @extend_schema(
+        tags=["Uploads"],
+        description="Upload one part of the file as the raw request body. The Content-Range header "
+                    "(`bytes <start>-<end>/<total>`) must not start after the current offset.",
+        request={'application/octet-stream': {'type': 'string', 'format': 'binary'}},
+        responses={
+            200: ChunkedUploadSerializer,
+            400: OpenApiResponse(description="Missing or invalid Content-Range"),
+            409: OpenApiResponse(description="Chunk starts after the received offset or upload is complete"),
+        },
+    )
+    def put(self, request, upload_id):
+        with transaction.atomic():
+            upload = get_object_or_404(
+                ChunkedUpload.objects.select_for_update(),
+                id=upload_id,
+                user=request.user,
+            )
+            if upload.status != ChunkedUpload.STATUS_PENDING or is_expired(upload):
+                return Response(
+                    {"error": "Upload is no longer accepting data."},
+                    status=status.HTTP_409_CONFLICT
+                )
+
+            try:
+                start, end = parse_content_range(request.headers.get('Content-Range'), upload.total_size)
+                upload.offset = write_chunk(upload, start, end, request.stream)
+            except UploadOffsetMismatch as e:
+                response = Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+                response['Upload-Offset'] = str(e.expected_offset)
+                return response
+            except ChunkedUploadError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            upload.save(update_fields=['offset', 'updated_at'])
+
+        return self._offset_response(upload)
+
+
+class ChunkedUploadCompleteView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        tags=["Uploads"],
+        description="Finalize an upload once every byte has been received. The assembled file is "
+                    "validated as an image.",
+        request=None,
+        responses={
+            200: ChunkedUploadSerializer,
+            400: OpenApiResponse(description="Assembled file is not a valid image"),
+            409: OpenApiResponse(description="Upload is incomplete"),
+        },
+    )
+    def post(self, request, upload_id):
+        with transaction.atomic():
+            upload = get_object_or_404(
+                ChunkedUpload.objects.select_for_update(),
+                id=upload_id,
+                user=request.user,
+            )
+            if upload.status == ChunkedUpload.STATUS_COMPLETE:
+                return Response(ChunkedUploadSerializer(upload).data)
+            if upload.status != ChunkedUpload.STATUS_PENDING:
+                return Response({"error": "Upload was already used."}, status=status.HTTP_409_CONFLICT)
+            if upload.offset < upload.total_size:
+                response = Response(
+                    {"error": f"Upload is incomplete: {upload.offset} of {upload.total_size} bytes received."},
+                    status=status.HTTP_409_CONFLICT
+                )
+                response['Upload-Offset'] = str(upload.offset)
+                return response
+
+            try:
+                with open_spooled_file(upload) as f:
+                    validate_image_file(f)
+            except (FileValidationError, OSError) as e:
+                logger.error(f"Chunked upload {upload.id} failed validation: {e}")
+                discard_spooled_file(upload)
+                upload.delete()
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            upload.status = ChunkedUpload.STATUS_COMPLETE
+            upload.save(update_fields=['status', 'updated_at'])
+
+        return Response(ChunkedUploadSerializer(upload).data)
+
+
+class MediaPresignView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        tags=["Download Report Media"],
+        description="Exchange media keys from a `media=keys` report response for presigned URLs. "
+                    "Keys that are invalid or belong to reports outside the user's locations map to null.",
+        request=MediaPresignSerializer,
+        responses={
+            200: inline_serializer(
+                name='MediaPresignResponse',
+                fields={
+                    'urls': serializers.DictField(child=serializers.URLField(allow_null=True)),
+                    'expires_in': serializers.IntegerField(help_text="Lifetime of the URLs in seconds"),
+                }
+            ),
+        },
+    )
+    def post(self, request):
+        serializer = MediaPresignSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        urls = media_keys.presign_keys(serializer.validated_data['keys'], request.user)
+        return Response({'urls': urls, 'expires_in': PRESIGNED_URL_EXPIRY})
+
+
+class MediaThumbnailView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        tags=["Download Report Media"],
+        description="Redirect to a presigned URL of a report image thumbnail. The thumbnail is rendered on "
+                    "first request and stored next to the image; later requests only sign a URL. "
+                    "Thumbnail links are included in report responses.",
+        parameters=[
+            OpenApiParameter(name="key", description="Media key of the image", required=True, type=str),
+            OpenApiParameter(name="size", description="Long edge in px", required=False, type=int),
+        ],
+        responses={
+            302: OpenApiResponse(description="Redirect to the thumbnail"),
+            400: OpenApiResponse(description="Unsupported size"),
+            404: OpenApiResponse(description="Unknown key, no access, or not an image"),
+        },
+    )
+    def get(self, request):
+        params = MediaThumbnailSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        name = media_keys.resolve_key(params.validated_data['key'], request.user)
+        if name is None:
+            raise Http404("Media not found.")
+
+        storage = PrivateMediaStorage()
+        try:
+            thumbnail_name = thumbnails.ensure_thumbnail(storage, name, params.validated_data['size'])
+        except thumbnails.ThumbnailError as e:
+            logger.warning(f"Thumbnail of {name} not available: {e}", exc_info=True)
+            raise Http404("Thumbnail not available.")
+
+        response = HttpResponseRedirect(storage.presign(thumbnail_name))
+        patch_cache_control(response, private=True, max_age=PRESIGNED_URL_EXPIRY // 2)
+        return response